@@ -8,6 +8,7 @@ from .video_capture_base import VideoCaptureBase, CaptureImage, CaptureDeviceTyp
 from enum import IntEnum
 
 from ..core.base_class import EvilEyeBase
+from ..utils import threading_events
 
 
 @EvilEyeBase.register("VideoCapture")
@@ -92,32 +93,29 @@ class VideoCapture(VideoCaptureBase):
     def reset_impl(self):
         self.release()
         self.init()
-        timestamp = datetime.datetime.now()
         if self.get_init_flag() and self.is_opened():
             print(f"Reconnected to a sources: {self.source_names}")
-            self.is_working = True
-            self.reconnects.append((self.params['camera'], timestamp, self.is_working))
+            self._set_connected(True)
         else:
             print(f"Could not connect to sources: {self.source_names}")
-        for sub in self.subscribers:
-            sub.update()
+            self._set_connected(False)
+            self._reconnect_failed()
 
     def _grab_frames(self):
         while self.run_flag:
             begin_it = timer()
             if not self.is_inited or self.capture is None:
-                time.sleep(0.1)
+                # Задержка между попытками переподключения растет экспоненциально
+                time.sleep(self.reconnect_delay)
                 if self.init():
-                    timestamp = datetime.datetime.now()
                     print(f"Reconnected to a sources: {self.source_names}")
-                    self.reconnects.append((self.params['camera'], timestamp, self.is_working))
-                    for sub in self.subscribers:
-                        sub.update()
+                    self._set_connected(True)
                 else:
+                    self._reconnect_failed()
                     continue
 
             if not self.is_opened():
-                time.sleep(0.1)
+                time.sleep(self.reconnect_delay)
                 self.reset()
 
             is_grabbed = False
@@ -125,11 +123,7 @@ class VideoCapture(VideoCaptureBase):
                 is_grabbed = self.capture.grab()
             if not is_grabbed:
                 if self.source_type != CaptureDeviceType.VideoFile or self.loop_play:
-                    self.is_working = False
-                    timestamp = datetime.datetime.now()
-                    self.disconnects.append((self.params['camera'], timestamp, self.is_working))
-                    for sub in self.subscribers:
-                        sub.update()
+                    self._set_connected(False)
                     self.reset()
                 else:
                     self.finished = True
@@ -216,14 +210,12 @@ class VideoCapture(VideoCaptureBase):
 
     def test_disconnect(self):
         with self.conn_mutex:
-            timestamp = datetime.datetime.now()
-            print(f'Disconnect: {timestamp}')
-            is_working = False
-            self.disconnects.append((self.source_address, timestamp, is_working))
+            state = self._add_connection_state(False)
+        print(f'Disconnect: {state.timestamp}')
+        threading_events.notify(VideoCaptureBase.connection_event, self, state)
 
     def test_reconnect(self):
         with self.conn_mutex:
-            timestamp = datetime.datetime.now()
-            print(f'Reconnect: {timestamp}')
-            is_working = True
-            self.reconnects.append((self.source_address, timestamp, is_working))
+            state = self._add_connection_state(True)
+        print(f'Reconnect: {state.timestamp}')
+        threading_events.notify(VideoCaptureBase.connection_event, self, state)
@@ -9,6 +9,7 @@ from threading import Lock
 from collections import deque
 from ..core.base_class import EvilEyeBase
 from ..core.frame import CaptureImage, Frame
+from ..utils import threading_events
 
 
 class CaptureDeviceType(Enum):
@@ -17,7 +18,24 @@ class CaptureDeviceType(Enum):
     Device = "Device"
     NotSet = "NotSet"
 
+
+class ConnectionState:
+    """Connection transition of a source published on the 'camera connection changed' event"""
+    __slots__ = ('address', 'timestamp', 'is_connected', 'reconnect_attempts', 'reconnect_delay')
+
+    def __init__(self, address: str, timestamp: datetime.datetime, is_connected: bool,
+                 reconnect_attempts: int = 0, reconnect_delay: float = 0.0):
+        self.address = address
+        self.timestamp = timestamp
+        self.is_connected = is_connected
+        self.reconnect_attempts = reconnect_attempts  # Число неудачных попыток переподключения до перехода
+        self.reconnect_delay = reconnect_delay  # Текущая задержка между попытками, сек
+
+
 class VideoCaptureBase(EvilEyeBase):
+    connection_event = 'camera connection changed'
+    max_connection_history = 100
+
     def __init__(self):
         super().__init__()
         self.source_address = None
@@ -42,10 +60,15 @@ class VideoCaptureBase(EvilEyeBase):
         self.video_current_frame = None
         self.video_current_position = None
         self.is_working = False
+        self.connected = False  # Последнее опубликованное состояние подключения
         self.conn_mutex = Lock()
-        self.disconnects = []
-        self.reconnects = []
+        self.disconnects = deque(maxlen=VideoCaptureBase.max_connection_history)
+        self.reconnects = deque(maxlen=VideoCaptureBase.max_connection_history)
         self.subscribers = []
+        self.reconnect_min_delay = 0.1
+        self.reconnect_max_delay = 10.0
+        self.reconnect_attempts = 0
+        self.reconnect_delay = self.reconnect_min_delay
 
         self.capture_thread = None
         self.grab_thread = None
@@ -73,6 +96,7 @@ class VideoCaptureBase(EvilEyeBase):
         if not self.is_inited:
             return
         self.run_flag = True
+        self.connected = self.is_working
         # self.capture_thread = threading.Thread(target=self._capture_frames)
         # self.capture_thread.start()
         self.grab_thread = threading.Thread(target=self._grab_frames)
@@ -104,6 +128,9 @@ class VideoCaptureBase(EvilEyeBase):
         self.desired_fps = self.params.get('desired_fps', None)
         self.source_names = self.params.get('source_names', self.source_ids)
         self.loop_play = self.params.get('loop_play', True)
+        self.reconnect_min_delay = self.params.get('reconnect_min_delay_secs', 0.1)
+        self.reconnect_max_delay = self.params.get('reconnect_max_delay_secs', 10.0)
+        self.reconnect_delay = self.reconnect_min_delay
         source_param = self.params.get('source', "")
         if source_param:
             self.source_type = CaptureDeviceType[source_param]
@@ -133,20 +160,65 @@ class VideoCaptureBase(EvilEyeBase):
         params['desired_fps'] = self.desired_fps
         params['source_names'] = self.source_names
         params['loop_play'] = self.loop_play
+        params['reconnect_min_delay_secs'] = self.reconnect_min_delay
+        params['reconnect_max_delay_secs'] = self.reconnect_max_delay
         params['source'] = self.source_type.name
         params['camera'] = self.source_address
         return params
 
+    def get_debug_info(self, debug_info: dict | None):
+        super().get_debug_info(debug_info)
+        debug_info['is_working'] = self.is_working
+        debug_info['reconnect_attempts'] = self.reconnect_attempts
+        debug_info['reconnect_delay'] = self.reconnect_delay
+
     def get_disconnects_info(self) -> list[tuple[str, datetime.datetime, bool]]:
-        disconnects = copy.deepcopy(self.disconnects)
-        self.disconnects = []
+        with self.conn_mutex:
+            disconnects = list(self.disconnects)
+            self.disconnects.clear()
         return disconnects
 
     def get_reconnects_info(self) -> list[tuple[str, datetime.datetime, bool]]:
-        reconnects = copy.deepcopy(self.reconnects)
-        self.reconnects = []
+        with self.conn_mutex:
+            reconnects = list(self.reconnects)
+            self.reconnects.clear()
         return reconnects
 
+    def _set_connected(self, is_connected: bool):
+        """
+        Changes the connection state of the source. Transitions are published immediately on the
+        'camera connection changed' event as (source, ConnectionState), repeated states are not published
+        """
+        state = None
+        with self.conn_mutex:
+            self.is_working = is_connected
+            if self.connected != is_connected:
+                self.connected = is_connected
+                state = self._add_connection_state(is_connected)
+            if is_connected:
+                self._reset_reconnect_backoff()
+        if state is not None:
+            threading_events.notify(VideoCaptureBase.connection_event, self, state)
+
+    def _add_connection_state(self, is_connected: bool) -> ConnectionState:
+        address = self.params.get('camera', self.source_address)
+        state = ConnectionState(address, datetime.datetime.now(), is_connected,
+                                self.reconnect_attempts, self.reconnect_delay)
+        if is_connected:
+            self.reconnects.append((address, state.timestamp, is_connected))
+        else:
+            self.disconnects.append((address, state.timestamp, is_connected))
+        return state
+
+    def _reconnect_failed(self):
+        """Exponential backoff of reconnection attempts"""
+        self.reconnect_attempts += 1
+        self.reconnect_delay = min(self.reconnect_delay * 2, self.reconnect_max_delay)
+
+    def _reset_reconnect_backoff(self):
+        self.reconnect_attempts = 0
+        self.reconnect_delay = self.reconnect_min_delay
+
     @staticmethod
     def reconstruct_url(url_parsed_info, username, password):
         processed_username = username if (username and username != "") else None
@@ -8,6 +8,8 @@ from evileye.object_detector import object_detection_yolo
 from evileye.object_tracker import object_tracking_botsort
 from evileye.object_tracker.trackers.onnx_encoder import OnnxEncoder
 from evileye.objects_handler import objects_handler
+from evileye.utils import image_writer
+from evileye.utils import frame_cache
 import time
 from timeit import default_timer as timer
 from evileye.visualization_modules.visualizer import Visualizer
@@ -15,12 +17,15 @@ from evileye.database_controller.db_adapter_objects import DatabaseAdapterObject
 from evileye.database_controller.db_adapter_cam_events import DatabaseAdapterCamEvents
 from evileye.database_controller.db_adapter_fov_events import DatabaseAdapterFieldOfViewEvents
 from evileye.database_controller.db_adapter_zone_events import DatabaseAdapterZoneEvents
+from evileye.database_controller.db_adapter_line_crossing_events import DatabaseAdapterLineCrossingEvents
 from evileye.events_control.events_processor import EventsProcessor
 from evileye.database_controller.database_controller_pg import DatabaseControllerPg
 from evileye.events_control.events_controller import EventsDetectorsController
 from evileye.events_detectors.cam_events_detector import CamEventsDetector
 from evileye.events_detectors.fov_events_detector import FieldOfViewEventsDetector
 from evileye.events_detectors.zone_events_detector import ZoneEventsDetector
+from evileye.events_detectors import line_crossing_events_detector
+from evileye.core.base_class import EvilEyeBase
 import json
 import datetime
 import pprint
@@ -70,12 +75,14 @@ class Controller:
         self.cam_events_detector = None
         self.fov_events_detector = None
         self.zone_events_detector = None
+        self.line_crossing_events_detector = None
 
         self.db_controller = None
         self.db_adapter_obj = None
         self.db_adapter_cam_events = None
         self.db_adapter_fov_events = None
         self.db_adapter_zone_events = None
+        self.db_adapter_line_crossing_events = None
         self.class_names = [
             "person",
             "bicycle",
@@ -284,6 +291,8 @@ class Controller:
                 self.db_adapter_zone_events.start()
                 self.db_adapter_fov_events.start()
                 self.db_adapter_cam_events.start()
+                if self.db_adapter_line_crossing_events:
+                    self.db_adapter_line_crossing_events.start()
             except Exception as e:
                 print(f"Warning: Database connection failed during start. Disabling database functionality. Reason: {e}")
                 self.use_database = False
@@ -292,6 +301,7 @@ class Controller:
         self.zone_events_detector.start()
         self.cam_events_detector.start()
         self.fov_events_detector.start()
+        self.line_crossing_events_detector.start()
         self.events_detectors_controller.start()
         self.events_processor.start()
         self.run_flag = True
@@ -307,6 +317,7 @@ class Controller:
         self.cam_events_detector.stop()
         self.fov_events_detector.stop()
         self.zone_events_detector.stop()
+        self.line_crossing_events_detector.stop()
         if self.visualizer:
             self.visualizer.stop()
         self.obj_handler.stop()
@@ -316,11 +327,14 @@ class Controller:
             self.db_adapter_cam_events.stop()
             self.db_adapter_fov_events.stop()
             self.db_adapter_zone_events.stop()
+            if self.db_adapter_line_crossing_events:
+                self.db_adapter_line_crossing_events.stop()
             self.db_adapter_obj.stop()
             self.db_controller.disconnect()
         
         # Stop pipeline components
         self.pipeline.stop()
+        image_writer.stop_image_writer()
         print('Everything in controller stopped')
 
     def init(self, params):
@@ -477,9 +491,11 @@ class Controller:
         self.params['objects_handler'] = self.obj_handler.get_params()
 
         self.params['events_detectors'] = dict()
+        self.params['events_detectors']['EventsDetectorsController'] = self.events_detectors_controller.get_params()
         self.params['events_detectors']['CamEventsDetector'] = self.cam_events_detector.get_params()
         self.params['events_detectors']['FieldOfViewEventsDetector'] = self.fov_events_detector.get_params()
         self.params['events_detectors']['ZoneEventsDetector'] = self.zone_events_detector.get_params()
+        self.params['events_detectors']['LineCrossingEventsDetector'] = self.line_crossing_events_detector.get_params()
 
         self.params['events_processor'] = self.events_processor.get_params()
         
@@ -563,6 +579,12 @@ class Controller:
         self.db_adapter_zone_events.set_params(**params['DatabaseAdapterZoneEvents'])
         self.db_adapter_zone_events.init()
 
+        # Адаптер пересечений линий создается, если он задан в конфигурации базы данных
+        if 'DatabaseAdapterLineCrossingEvents' in params:
+            self.db_adapter_line_crossing_events = DatabaseAdapterLineCrossingEvents(self.db_controller)
+            self.db_adapter_line_crossing_events.set_params(**params['DatabaseAdapterLineCrossingEvents'])
+            self.db_adapter_line_crossing_events.init()
+
     def _init_sources(self, params):
         num_sources = len(params)
         self.sources_proc = ProcessorSource(class_name="VideoCapture", num_processors=num_sources, order=0)
@@ -625,9 +647,12 @@ class Controller:
         self.zone_events_detector.set_params(**params.get('ZoneEventsDetector', dict()))
         self.zone_events_detector.init()
 
-        self.obj_handler.subscribe(self.fov_events_detector, self.zone_events_detector)
-        for source in self.pipeline.get_sources():
-            source.subscribe(self.cam_events_detector)
+        self.line_crossing_events_detector = EvilEyeBase.create_instance('LineCrossingEventsDetector', self.obj_handler)
+        self.line_crossing_events_detector.set_params(**params.get('LineCrossingEventsDetector', dict()))
+        self.line_crossing_events_detector.init()
+
+        self.obj_handler.subscribe(self.fov_events_detector, self.zone_events_detector,
+                                   self.line_crossing_events_detector)
 
     def _init_events_detectors_without_db(self, params):
         """Initialize events detectors without database connection."""
@@ -644,18 +669,24 @@ class Controller:
         self.zone_events_detector.set_params(**params.get('ZoneEventsDetector', dict()))
         self.zone_events_detector.init()
 
-        self.obj_handler.subscribe(self.fov_events_detector, self.zone_events_detector)
-        for source in self.pipeline.get_sources():
-            source.subscribe(self.cam_events_detector)
+        self.line_crossing_events_detector = EvilEyeBase.create_instance('LineCrossingEventsDetector', self.obj_handler)
+        self.line_crossing_events_detector.set_params(**params.get('LineCrossingEventsDetector', dict()))
+        self.line_crossing_events_detector.init()
+
+        self.obj_handler.subscribe(self.fov_events_detector, self.zone_events_detector,
+                                   self.line_crossing_events_detector)
 
     def _init_events_detectors_controller(self, params):
-        detectors = [self.cam_events_detector, self.fov_events_detector, self.zone_events_detector]
+        detectors = [self.cam_events_detector, self.fov_events_detector, self.zone_events_detector,
+                     self.line_crossing_events_detector]
         self.events_detectors_controller = EventsDetectorsController(detectors)
-        self.events_detectors_controller.set_params(**params)
+        self.events_detectors_controller.set_params(**params.get('EventsDetectorsController', dict()))
         self.events_detectors_controller.init()
 
     def _init_events_processor(self, params):
         db_adapters = [self.db_adapter_fov_events, self.db_adapter_cam_events, self.db_adapter_zone_events]
+        if self.db_adapter_line_crossing_events:
+            db_adapters.append(self.db_adapter_line_crossing_events)
         self.events_processor = EventsProcessor(db_adapters, self.db_controller)
         self.events_processor.set_params(**params)
         self.events_processor.init()
@@ -705,6 +736,10 @@ class Controller:
         comp_debug_info = self.zone_events_detector.insert_debug_info_by_id(self.debug_info.setdefault("zone_events_detector", {}))
         total_memory_usage += comp_debug_info["memory_measure_results"]
 
+        self.line_crossing_events_detector.calc_memory_consumption()
+        comp_debug_info = self.line_crossing_events_detector.insert_debug_info_by_id(self.debug_info.setdefault("line_crossing_events_detector", {}))
+        total_memory_usage += comp_debug_info["memory_measure_results"]
+
         self.visualizer.calc_memory_consumption()
         comp_debug_info = self.visualizer.insert_debug_info_by_id(self.debug_info.setdefault("visualizer", {}))
         total_memory_usage += comp_debug_info["memory_measure_results"]
@@ -731,6 +766,14 @@ class Controller:
             comp_debug_info = self.db_adapter_zone_events.insert_debug_info_by_id(self.debug_info.setdefault("db_adapter_zone_events", {}))
             total_memory_usage += comp_debug_info["memory_measure_results"]
 
+            if self.db_adapter_line_crossing_events:
+                self.db_adapter_line_crossing_events.calc_memory_consumption()
+                comp_debug_info = self.db_adapter_line_crossing_events.insert_debug_info_by_id(self.debug_info.setdefault("db_adapter_line_crossing_events", {}))
+                total_memory_usage += comp_debug_info["memory_measure_results"]
+
+        self.debug_info["image_writer"] = image_writer.get_image_writer().get_debug_info()
+        self.debug_info["frame_cache"] = frame_cache.get_frame_cache().get_debug_info()
+
         self.debug_info["controller"] = dict()
         self.debug_info["controller"]["timestamp"] = datetime.datetime.now()
         self.debug_info["controller"]["total_memory_usage_mb"] = total_memory_usage/(1024.0*1024.0)
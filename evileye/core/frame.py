@@ -1,5 +1,8 @@
 
 class Frame:
+    __slots__ = ('source_id', 'frame_id', 'current_video_frame', 'current_video_position', 'time_stamp',
+                 'image', 'subscribers')
+
     def __init__(self):
         self.source_id = None
         self.frame_id = None
@@ -14,6 +14,7 @@ class ProcessorBase(ABC):
             processor = EvilEyeBase.create_instance(class_name)
             processor.set_id(i)
             self.processors.append(processor)
+        self._source_index = None  # source_id -> processor, rebuilt on set_params
 
     def get_processors(self):
         return self.processors
@@ -27,6 +28,23 @@ class ProcessorBase(ABC):
             print(f"Failed to initialize processors {self.class_name}[{self.num_processors}]. Wrong params list.")
         for i in range(0, self.num_processors):
             self.processors[i].set_params(**params[i])
+        self._source_index = None
+        self._get_source_index()
+
+    def get_processor_by_source(self, source_id):
+        return self._get_source_index().get(source_id)
+
+    def _get_source_index(self) -> dict:
+        if self._source_index is None:
+            source_index = dict()
+            for processor in self.processors:
+                if not hasattr(processor, 'get_source_ids'):
+                    continue
+                for source_id in processor.get_source_ids() or []:
+                    # First processor listing the source wins, same as the former linear scan
+                    source_index.setdefault(source_id, processor)
+            self._source_index = source_index
+        return self._source_index
 
     def get_params(self):
         processors_params = list()
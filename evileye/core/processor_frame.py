@@ -8,18 +8,12 @@ class ProcessorFrame(ProcessorBase):
     def process(self, frames_list=None):
         processing_results = []
         if frames_list is not None:
+            source_index = self._get_source_index()
             for frame in frames_list:
-                is_processor_found = False
-                for processor in self.processors:
-                    source_ids = processor.get_source_ids()
-                    if frame.source_id in source_ids:
-                        processor.put(frame)
-                        is_processor_found = True
-
-                    if is_processor_found:
-                        break
-
-                if not is_processor_found:
+                processor = source_index.get(frame.source_id)
+                if processor is not None:
+                    processor.put(frame)
+                else:
                     processing_results.append(frame)
 
         for processor in self.processors:
@@ -27,4 +21,4 @@ class ProcessorFrame(ProcessorBase):
             if result:
                 processing_results.append(result)
 
-        return processing_results
\ No newline at end of file
+        return processing_results
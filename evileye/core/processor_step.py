@@ -9,8 +9,9 @@ class ProcessorStep(ProcessorBase):
     def process(self, input_list=None):
         processing_results = []
         if input_list is not None:
+            source_index = self._get_source_index()
+            unmatched = []
             for input in input_list:
-                is_processor_found = False
                 if (type(input) == list or type(input) == tuple) and len(input) >= 2:
                     data = input[0]
                     frame = input[1]
@@ -20,32 +21,42 @@ class ProcessorStep(ProcessorBase):
                 else:
                     raise RuntimeError(f"Wrong type for input data in processor: {self.class_name}")
 
-                for processor in self.processors:
-                    source_ids = processor.get_source_ids()
-                    if frame.source_id in source_ids:
-                        processor.put(input)
-                        is_processor_found = True
-
-                    if is_processor_found:
-                        break
-
-                if not is_processor_found:
-                    res = self.dummy_processor.ResultType()
-                    if res is not None:
-                        if hasattr(res, "source_id"):
-                            setattr(res, "source_id", frame.source_id)
-                        if hasattr(res, "frame_id"):
-                            setattr(res, "frame_id", frame.frame_id)
-                        if hasattr(res, "time_stamp"):
-                            setattr(res, "time_stamp", frame.time_stamp)
-                        if hasattr(res, "generate_from"):
-                            res.generate_from(data)
-
-                    processing_results.append([res, frame])
+                processor = source_index.get(frame.source_id)
+                if processor is not None:
+                    processor.put(input)
+                else:
+                    unmatched.append((data, frame))
+
+            if unmatched:
+                processing_results.extend(self._generate_pass_through(unmatched))
 
         for processor in self.processors:
             result = processor.get()
             if result:
                 processing_results.append(result)
 
-        return processing_results
\ No newline at end of file
+        return processing_results
+
+    def _generate_pass_through(self, unmatched: list) -> list:
+        """Builds results for frames no processor is configured for, resolving the result type once per batch"""
+        result_type = self.dummy_processor.ResultType
+        if result_type is None:
+            return [[None, frame] for _, frame in unmatched]
+
+        results = [[result_type(), frame] for _, frame in unmatched]
+        sample = results[0][0]
+        has_source_id = hasattr(sample, "source_id")
+        has_frame_id = hasattr(sample, "frame_id")
+        has_time_stamp = hasattr(sample, "time_stamp")
+        has_generate_from = hasattr(sample, "generate_from")
+
+        for (data, frame), (res, _) in zip(unmatched, results):
+            if has_source_id:
+                res.source_id = frame.source_id
+            if has_frame_id:
+                res.frame_id = frame.frame_id
+            if has_time_stamp:
+                res.time_stamp = frame.time_stamp
+            if has_generate_from:
+                res.generate_from(data)
+        return results
@@ -45,6 +45,12 @@ class DatabaseControllerBase(EvilEyeBase):
         else:
             raise Exception('init function has not been called')
 
+    def query_batch(self, operations):
+        if self.get_init_flag():
+            return self.query_batch_impl(operations)
+        else:
+            raise Exception('init function has not been called')
+
     def start(self):
         if self.query_thread:
             print('Started writer db')
@@ -71,6 +77,10 @@ class DatabaseControllerBase(EvilEyeBase):
     def query_impl(self, query_string, data=None):
         pass
 
+    @abstractmethod
+    def query_batch_impl(self, operations):
+        pass
+
     @abstractmethod
     def _insert_impl(self):
         pass
@@ -10,14 +10,21 @@ from ..utils import utils
 from .database_controller_base import DatabaseControllerBase
 from psycopg2 import sql
 from psycopg2 import pool
+from psycopg2 import extras
 import copy
 from ..utils import threading_events
+from ..utils import image_writer
+from ..utils.preview_renderer import PreviewRenderer
 
 from timeit import default_timer as timer
 # see https://ru.hexlet.io/blog/posts/python-postgresql
 
 
 class DatabaseControllerPg(DatabaseControllerBase):
+    # Поля, по которым фильтруют журналы, для них при создании таблиц создаются индексы
+    indexed_fields = ('time_stamp', 'time_entered', 'source_id', 'object_id', 'job_id')
+    # Последовательность, из которой выделяются айди событий всех таблиц событий
+    event_id_sequence = 'event_id_seq'
     new_project_created = False
     new_job_created = False
     cur_project_id = 0
@@ -41,6 +48,9 @@ class DatabaseControllerPg(DatabaseControllerBase):
         self.preview_height = 0
         self.preview_width = 0
         self.preview_size = (0, 0)
+        self.preview_crop_margin = None
+        self.object_data_trajectory_len = None
+        self.preview_renderer = PreviewRenderer()
 
     def set_params_impl(self):
         self.user_name = self.params['user_name']
@@ -56,6 +66,9 @@ class DatabaseControllerPg(DatabaseControllerBase):
         self.preview_width = self.params.get('preview_width', 150)
         self.preview_height = self.params.get('preview_height', 100)
         self.preview_size = (self.preview_width, self.preview_height)
+        self.preview_crop_margin = self.params.get('preview_crop_margin', None)
+        self.object_data_trajectory_len = self.params.get('object_data_trajectory_len', None)
+        self.preview_renderer = PreviewRenderer(self.preview_width, self.preview_height, self.preview_crop_margin)
 
     def get_params_impl(self):
         params = dict()
@@ -71,6 +84,8 @@ class DatabaseControllerPg(DatabaseControllerBase):
         params['tables'] = copy.deepcopy(self.tables)
         params['preview_width'] = self.preview_width
         params['preview_height'] = self.preview_height
+        params['preview_crop_margin'] = self.preview_crop_margin
+        params['object_data_trajectory_len'] = self.object_data_trajectory_len
         return params
 
     def get_cameras_params(self):
@@ -110,6 +125,7 @@ class DatabaseControllerPg(DatabaseControllerBase):
 
         for table_name in self.tables.keys():
             self.create_table(table_name)
+        self._create_event_id_sequence()
 
         project_id = 0
         if not DatabaseControllerPg.new_project_created:
@@ -152,6 +168,37 @@ class DatabaseControllerPg(DatabaseControllerBase):
             if connection:
                 self.conn_pool.putconn(connection)
 
+    def query_batch_impl(self, operations):
+        """
+        Executes operations in one transaction
+        :param operations: list of (query_string, data, many). If many is True, query_string must contain a single
+         VALUES %s placeholder and data is the list of rows inserted by one multi-row INSERT
+        :return: list of rows returned by each operation (None if operation returns nothing)
+         or None if the transaction is not committed
+        """
+        if self.conn_pool is None:
+            return None
+
+        connection = None
+        try:
+            connection = self.conn_pool.getconn()
+            results = []
+            with connection:
+                with connection.cursor() as curs:
+                    for query_string, data, many in operations:
+                        if many:
+                            extras.execute_values(curs, query_string, data, page_size=len(data))
+                        else:
+                            curs.execute(query_string, data)
+                        results.append(curs.fetchall() if curs.description is not None else None)
+            return results
+        except psycopg2.Error as ex:
+            print(f'Transaction of {len(operations)} queries is not committed: {ex}')
+            return None
+        finally:
+            if connection:
+                self.conn_pool.putconn(connection)
+
     def _insert_impl(self):
         while self.run_flag:
             time.sleep(0.01)
@@ -204,13 +251,9 @@ class DatabaseControllerPg(DatabaseControllerBase):
         
         preview_save_dir = os.path.join(image_dir_resolved, preview_path)
         frame_save_dir = os.path.join(image_dir_resolved, frame_path)
-        preview = cv2.resize(copy.deepcopy(image.image), self.preview_size, cv2.INTER_NEAREST)
-        preview_boxes = utils.utils.draw_preview_boxes(preview,
-                                                       self.preview_width, self.preview_height, box)
-        preview_saved = cv2.imwrite(preview_save_dir, preview_boxes)
-        frame_saved = cv2.imwrite(frame_save_dir, image.image)
-        if not preview_saved or not frame_saved:
-            print(f'ERROR: can\'t save image file {frame_save_dir}')
+        writer = image_writer.get_image_writer()
+        writer.write(preview_save_dir, lambda: self.preview_renderer.render(image, box))
+        writer.write_frame(frame_save_dir, image)
 
     def get_fields_names(self, table_name):
         if self.conn_pool is None:
@@ -239,6 +282,38 @@ class DatabaseControllerPg(DatabaseControllerBase):
             if conn:
                 conn.close()
 
+    def _create_event_id_sequence(self):
+        """
+        Creates the sequence of event ids. On creation it continues after the largest id of existing event tables,
+        the creation is serialized by an advisory lock, so pipelines started together don't collide
+        """
+        event_tables = [table_name for table_name, fields in self.tables.items() if 'event_id' in fields]
+        if not event_tables:
+            return
+        max_ids = [sql.SQL('(SELECT MAX(event_id) FROM {table})').format(table=sql.Identifier(table_name))
+                   for table_name in event_tables]
+        query = sql.SQL('''DO $$ BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext({name}));
+            IF to_regclass({name}) IS NULL THEN
+                CREATE SEQUENCE {sequence} MINVALUE 0;
+                PERFORM setval({name}, COALESCE(GREATEST({max_ids}), -1) + 1, false);
+            END IF;
+        END $$''').format(name=sql.Literal(DatabaseControllerPg.event_id_sequence),
+                           sequence=sql.Identifier(DatabaseControllerPg.event_id_sequence),
+                           max_ids=sql.SQL(', ').join(max_ids))
+        self.query(query)
+
+    def reserve_event_ids(self, count: int) -> list[int]:
+        """
+        Takes count ids from the event ids sequence. Ids are unique for all pipelines writing to the database
+        """
+        query = sql.SQL('SELECT nextval({name}) FROM generate_series(1, %s)').format(
+            name=sql.Literal(DatabaseControllerPg.event_id_sequence))
+        record = self.query(query, (count,))
+        if not record:
+            return []
+        return [row[0] for row in record]
+
     def create_table(self, table_name):
         if self.conn_pool is None:
             return
@@ -259,6 +334,15 @@ class DatabaseControllerPg(DatabaseControllerBase):
             fields=sql.SQL(',').join(fields))
         self.query(create_table)
 
+        for field in DatabaseControllerPg.indexed_fields:
+            if field not in self.tables[table_name]:
+                continue
+            create_index = sql.SQL("CREATE INDEX IF NOT EXISTS {index} ON {table} ({field})").format(
+                index=sql.Identifier(f'{table_name}_{field}_idx'),
+                table=sql.Identifier(table_name),
+                field=sql.Identifier(field))
+            self.query(create_index)
+
     def insert(self, table_name, fields, data, preview_path, frame_path, image):
         if self.conn_pool is None:
             return
@@ -1,30 +1,96 @@
+import os
 from ..core.base_class import EvilEyeBase
 from .database_controller_pg import DatabaseControllerPg
-from threading import Thread
-from queue import Queue
+from threading import Thread, Lock
+from queue import Empty
+from timeit import default_timer as timer
 from abc import abstractmethod, ABC
+from ..utils.path_resolver import get_path_resolver
+from ..utils.bounded_queue import create_queue
 
 
 class DatabaseAdapterBase(EvilEyeBase, ABC):
+    """
+    Base of adapters saving objects and events to a database table.
+
+    Queries are put to queue_in as tuples (query_type, query_string, data, payload) and executed by the query thread
+    in batches: a batch is collected until batch_size queries are taken or batch_max_latency_secs passed since
+    its first query, and then executed in one transaction. If the transaction fails, the batch is executed again
+    split in halves down to single queries, so only the queries failing on their own are discarded.
+    Consecutive inserts with the same query string are sent as one multi-row INSERT, so their query string must
+    have a single VALUES %s placeholder.
+    payload is not sent to the database, it is passed to _process_results together with the result of the query
+    or to _discard_payload if the query failed or was dropped by the overflow policy of the queue.
+    queue_in holds at most queue_size queries, queue_overflow_policy (block, drop_oldest or spill) is applied when
+    it is full. Spilled queries are journaled in queue_spill_dir (image_dir/queues by default), queries left in
+    the journal when the process was interrupted are executed by the adapter of the same table on the next start.
+    """
     def __init__(self, db_controller):
         super().__init__()
         self.db_controller = db_controller
         self.db_params = self.db_controller.get_params()
         self.cameras_params = self.db_controller.get_cameras_params()
+        self.path_resolver = get_path_resolver(self.db_params.get('image_dir') or 'EvilEyeData', self.cameras_params)
         self.query_thread = Thread(target=self._execute_query)
         self.run_flag = False
-        self.queue_in = Queue()
+        self.queue_size = 10000
+        self.queue_overflow_policy = 'block'
+        self.queue_spill_dir = os.path.join(self.db_params.get('image_dir') or 'EvilEyeData', 'queues')
+        self.queue_in = None
         self.table_name = None
         self.event_name = None
+        self.batch_size = 100
+        self.batch_max_latency_secs = 0.1
+
+        self._stats_lock = Lock()
+        self.num_batches = 0
+        self.num_queries = 0
+        self.num_failed_batches = 0
+        self.num_failed_queries = 0  # Запросы пакетов, транзакция которых не была выполнена
+        self.num_discarded_queries = 0  # Запросы, не выполненные и при повторе по частям
+        self.max_queue_size_reached = 0
+        self.max_batch_size_reached = 0
+        self.batches_time_secs = 0.0
 
     def set_params_impl(self):
         self.table_name = self.params['table_name']
+        self.batch_size = self.params.get('batch_size', self.batch_size)
+        self.batch_max_latency_secs = self.params.get('batch_max_latency_secs', self.batch_max_latency_secs)
+        self.queue_size = self.params.get('queue_size', self.queue_size)
+        self.queue_overflow_policy = self.params.get('queue_overflow_policy', self.queue_overflow_policy)
+        self.queue_spill_dir = self.params.get('queue_spill_dir', self.queue_spill_dir)
+        # Журнал очереди привязан к таблице, поэтому очередь создается после получения ее имени
+        if self.queue_in is not None:
+            self.queue_in.close()
+        self.queue_in = create_queue(f'db_adapter_{self.table_name}', self.queue_size, self.queue_overflow_policy,
+                                     self.queue_spill_dir, on_drop=self._on_query_dropped)
 
     def get_params_impl(self):
         params = dict()
         params['table_name'] = self.table_name
+        params['batch_size'] = self.batch_size
+        params['batch_max_latency_secs'] = self.batch_max_latency_secs
+        params['queue_size'] = self.queue_size
+        params['queue_overflow_policy'] = self.queue_overflow_policy
+        params['queue_spill_dir'] = self.queue_spill_dir
         return params
 
+    def get_debug_info(self, debug_info: dict | None):
+        super().get_debug_info(debug_info)
+        with self._stats_lock:
+            debug_info['queue_size'] = self.queue_in.qsize()
+            debug_info['max_queue_size_reached'] = self.max_queue_size_reached
+            debug_info['batches'] = self.num_batches
+            debug_info['queries'] = self.num_queries
+            debug_info['failed_batches'] = self.num_failed_batches
+            debug_info['failed_queries'] = self.num_failed_queries
+            debug_info['discarded_queries'] = self.num_discarded_queries
+            debug_info['max_batch_size_reached'] = self.max_batch_size_reached
+            debug_info['avg_batch_size'] = self.num_queries / self.num_batches if self.num_batches else 0.0
+            debug_info['avg_batch_time_ms'] = (1000.0 * self.batches_time_secs / self.num_batches
+                                               if self.num_batches else 0.0)
+        debug_info['queue'] = self.queue_in.get_debug_info()
+
     def init_impl(self):
         pass
 
@@ -42,6 +108,7 @@ class DatabaseAdapterBase(EvilEyeBase, ABC):
         self.run_flag = False
         if self.query_thread.is_alive():
             self.query_thread.join()
+        self.queue_in.close()
 
     def default(self):
         pass
@@ -64,8 +131,114 @@ class DatabaseAdapterBase(EvilEyeBase, ABC):
     def get_cameras_params(self):
         return self.cameras_params
 
-    @abstractmethod
     def _execute_query(self):
+        # После остановки дописываем то, что уже попало в очередь
+        while self.run_flag or not self.queue_in.empty():
+            batch = self._get_batch()
+            if not batch:
+                continue
+
+            begin_it = timer()
+            committed = self._execute_batch(batch)
+            num_discarded = 0 if committed else self._retry_batch(batch)
+            with self._stats_lock:
+                self.num_batches += 1
+                self.num_queries += len(batch)
+                self.max_batch_size_reached = max(self.max_batch_size_reached, len(batch))
+                self.batches_time_secs += timer() - begin_it
+                if not committed:
+                    self.num_failed_batches += 1
+                    self.num_failed_queries += len(batch)
+                    self.num_discarded_queries += num_discarded
+
+    def _execute_batch(self, batch) -> bool:
+        """
+        Executes queries of the batch in one transaction and processes their results
+        :return: False if the transaction is not committed
+        """
+        operations = self._group_batch(batch)
+        results = self.db_controller.query_batch(operations)
+        if results is None:
+            return False
+
+        records = []
+        for (query_string, data, many), result in zip(operations, results):
+            if many:
+                # RETURNING многострочного INSERT возвращает строки в порядке VALUES
+                records.extend([row] for row in (result or [None] * len(data)))
+            else:
+                records.append(result)
+        for (query_type, query_string, data, payload), record in zip(batch, records):
+            self._process_results(query_type, record, payload)
+        return True
+
+    def _retry_batch(self, batch) -> int:
+        """
+        Executes queries of a failed batch again split in halves, so only the queries that fail on their own
+        are discarded and the order of queries is kept
+        :return: number of discarded queries
+        """
+        if len(batch) == 1:
+            query_type, _, _, payload = batch[0]
+            self._discard_payload(query_type, payload)
+            return 1
+        middle = len(batch) // 2
+        num_discarded = 0
+        for half in (batch[:middle], batch[middle:]):
+            if not self._execute_batch(half):
+                num_discarded += self._retry_batch(half)
+        return num_discarded
+
+    def _get_batch(self) -> list:
+        try:
+            batch = [self.queue_in.get(timeout=0.1)]
+        except Empty:
+            return []
+        with self._stats_lock:
+            self.max_queue_size_reached = max(self.max_queue_size_reached, self.queue_in.qsize() + 1)
+
+        deadline = timer() + self.batch_max_latency_secs
+        while len(batch) < self.batch_size:
+            timeout = deadline - timer()
+            try:
+                if timeout > 0:
+                    batch.append(self.queue_in.get(timeout=timeout))
+                else:
+                    batch.append(self.queue_in.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _group_batch(batch) -> list:
+        """
+        :return: list of (query_string, data, many) for DatabaseControllerPg.query_batch, consecutive inserts
+         with the same query string are joined to one operation with the list of rows as data
+        """
+        operations = []
+        for query_type, query_string, data, _ in batch:
+            if query_type == 'insert':
+                if operations and operations[-1][2] and operations[-1][0] == query_string:
+                    operations[-1][1].append(data)
+                else:
+                    operations.append((query_string, [data], True))
+            else:
+                operations.append((query_string, data, False))
+        return operations
+
+    def _on_query_dropped(self, item):
+        query_type, _, _, payload = item
+        self._discard_payload(query_type, payload)
+
+    def _process_results(self, query_type, record, payload):
+        """Called on the query thread for each executed query with rows returned by it"""
+        pass
+
+    def _discard_payload(self, query_type, payload):
+        """
+        Called on the query thread for each query that failed on its own and on the producer thread for each query
+        dropped from the queue to free resources held by payload
+        """
         pass
 
     @abstractmethod
@@ -20,34 +20,17 @@ class DatabaseAdapterCamEvents(DatabaseAdapterBase):
 
     def _insert_impl(self, obj):
         fields, data = self._prepare_for_saving(obj)
-        insert_query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
+        insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
             sql.Identifier(self.table_name),
-            sql.SQL(",").join(map(sql.Identifier, fields)),
-            sql.SQL(', ').join(sql.Placeholder() * len(fields))
+            sql.SQL(",").join(map(sql.Identifier, fields))
         )
-        self.queue_in.put((insert_query, data))
+        self.queue_in.put(('insert', insert_query, data, None))
 
     def _update_impl(self, obj):
         pass
 
-    def _execute_query(self):
-        while self.run_flag:
-            time.sleep(0.01)
-            try:
-                if not self.queue_in.empty():
-                    query_string, data = self.queue_in.get()
-                    if query_string is not None:
-                        pass
-                else:
-                    query_string = data = None
-            except ValueError:
-                break
-
-            if query_string is None:
-                continue
-
-            self.db_controller.query(query_string, data)
-            threading_events.notify('new event')
+    def _process_results(self, query_type, record, payload):
+        threading_events.notify('new event')
 
     def _prepare_for_saving(self, event) -> tuple[list, list]:
         fields_for_saving = {'camera_full_address': event.camera_address,
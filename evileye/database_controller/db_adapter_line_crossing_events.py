@@ -0,0 +1,86 @@
+import os
+from .db_adapter import DatabaseAdapterBase
+from ..utils import threading_events
+from ..utils import image_writer
+from ..utils.preview_renderer import PreviewRenderer
+from ..utils.frame_cache import get_frame_cache
+from psycopg2 import sql
+
+
+class DatabaseAdapterLineCrossingEvents(DatabaseAdapterBase):
+    def __init__(self, db_controller):
+        super().__init__(db_controller)
+        self.image_dir = self.db_params['image_dir']
+        self.preview_width = self.db_params['preview_width']
+        self.preview_height = self.db_params['preview_height']
+        self.preview_size = (self.preview_width, self.preview_height)
+        self.preview_renderer = PreviewRenderer(self.preview_width, self.preview_height,
+                                                self.db_params.get('preview_crop_margin', None))
+
+    def set_params_impl(self):
+        super().set_params_impl()
+        self.event_name = self.params['event_name']
+
+    def _insert_impl(self, event):
+        fields, data, preview_path, frame_path = self._prepare_for_saving(event)
+        insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s RETURNING box, line_coords").format(
+            sql.Identifier(self.table_name),
+            sql.SQL(",").join(map(sql.Identifier, fields))
+        )
+        self.queue_in.put(('insert', insert_query, data, (preview_path, frame_path, event.frame)))
+
+    def _update_impl(self, event):
+        # События пересечения линии кратковременные и не обновляются
+        pass
+
+    def _process_results(self, query_type, record, payload):
+        preview_path, frame_path, frame = payload
+        # Кадр события берется из кэша только для сохранения и сразу освобождается
+        frame_cache = get_frame_cache()
+        image = frame_cache.get(frame)
+        frame_cache.release(frame)
+        if not record or record[0] is None:
+            return
+        box = record[0][0]
+        line_coords = record[0][1]
+        if image is not None:
+            self._save_image(preview_path, frame_path, image, box, line_coords)
+        threading_events.notify('new event')
+
+    def _discard_payload(self, query_type, payload):
+        get_frame_cache().release(payload[2])
+
+    def _save_image(self, preview_path, frame_path, image, box, line_coords):
+        preview_save_dir = os.path.join(self.image_dir, preview_path)
+        frame_save_dir = os.path.join(self.image_dir, frame_path)
+        writer = image_writer.get_image_writer()
+        writer.write(preview_save_dir, lambda: self.preview_renderer.render(image, box, line_coords))
+        writer.write_frame(frame_save_dir, image)
+
+    def _prepare_for_saving(self, event) -> tuple[list, list, str, str]:
+        image_width, image_height = (event.frame.width, event.frame.height) if event.frame is not None else (1, 1)
+        box = [event.box[0] / image_width, event.box[1] / image_height,
+               event.box[2] / image_width, event.box[3] / image_height]
+        fields_for_saving = {'event_id': event.event_id,
+                             'source_id': event.source_id,
+                             'time_stamp': event.time_crossed,
+                             'object_id': event.object_id,
+                             'line_id': event.line.get_line_id(),
+                             'line_name': event.line.get_name(),
+                             'line_coords': [list(point) for point in event.line.get_coords()],
+                             'direction': event.direction.value,
+                             'count_forward': event.count_forward,
+                             'count_backward': event.count_backward,
+                             'box': box,
+                             'frame_path': self._get_img_path('frame', event),
+                             'preview_path': self._get_img_path('preview', event),
+                             'project_id': self.db_controller.get_project_id(),
+                             'job_id': self.db_controller.get_job_id()}
+        return (list(fields_for_saving.keys()), list(fields_for_saving.values()),
+                fields_for_saving['preview_path'], fields_for_saving['frame_path'])
+
+    def _get_img_path(self, image_type, event):
+        timestamp = event.time_crossed.strftime('%Y_%m_%d_%H_%M_%S.%f')
+        line_id = event.line.get_line_id()
+        return self.path_resolver.get_image_path('line_crossing', image_type,
+                                                 f'{timestamp}_line{line_id}_obj{event.object_id}_{image_type}.jpeg')
@@ -1,4 +1,5 @@
 import time
+import threading
 
 from .database_controller_pg import DatabaseControllerPg
 from .db_adapter import DatabaseAdapterBase
@@ -10,6 +11,9 @@ import os
 from timeit import default_timer as timer
 import cv2
 from ..utils import threading_events
+from ..utils import image_writer
+from ..utils import object_data
+from ..utils.preview_renderer import PreviewRenderer
 from ..utils import utils
 from psycopg2 import sql
 
@@ -21,16 +25,23 @@ class DatabaseAdapterObjects(DatabaseAdapterBase):
         self.preview_width = self.db_params['preview_width']
         self.preview_height = self.db_params['preview_height']
         self.preview_size = (self.preview_width, self.preview_height)
+        self.preview_renderer = PreviewRenderer(self.preview_width, self.preview_height,
+                                                self.db_params.get('preview_crop_margin', None))
+        self.object_data_trajectory_len = self.db_params.get('object_data_trajectory_len', None)
+        # record_id записей объектов, сохраненных в этом запуске, по object_id
+        self.record_ids = dict()
+        self.record_ids_lock = threading.Lock()
+        # Объекты, потерянные до выполнения вставки их записей
+        self.lost_before_saved = set()
 
     def _insert_impl(self, obj):
         fields, data, preview_path, frame_path = self._prepare_for_saving(obj)
         query_type = 'insert'
-        insert_query = sql.SQL("INSERT INTO {} ({}) VALUES ({}) RETURNING record_id, bounding_box").format(
+        insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s RETURNING record_id, bounding_box").format(
             sql.Identifier('objects'),
-            sql.SQL(",").join(map(sql.Identifier, fields)),
-            sql.SQL(', ').join(sql.Placeholder() * len(fields))
+            sql.SQL(",").join(map(sql.Identifier, fields))
         )
-        self.queue_in.put((query_type, insert_query, data, preview_path, frame_path, obj.last_image))
+        self.queue_in.put((query_type, insert_query, data, (preview_path, frame_path, obj.last_image, obj.object_id)))
 
     def _update_impl(self, obj):
         fields, data, preview_path, frame_path = self._prepare_for_updating(obj)
@@ -40,70 +51,59 @@ class DatabaseAdapterObjects(DatabaseAdapterBase):
         data.append(obj.object_id)
         data = tuple(data)
         table_name = 'objects'
-        last_obj_query = sql.SQL('''SELECT distinct on (object_id) record_id FROM {table} WHERE object_id = {id} 
-                                    ORDER BY object_id, record_id DESC''').format(
-            id=sql.Placeholder(),
-            fields=sql.SQL(",").join(map(sql.Identifier, fields)),
-            table=sql.Identifier(table_name))
+        with self.record_ids_lock:
+            record_id = self.record_ids.pop(obj.object_id, None)
+            if record_id is None:
+                self.lost_before_saved.add(obj.object_id)
+        if record_id is not None:
+            selected = sql.Placeholder()
+            data = data[:-1] + (record_id,)
+        else:
+            # Вставка объекта еще не выполнена, ищем последнюю запись объекта по индексу object_id
+            selected = sql.SQL('SELECT record_id FROM {table} WHERE object_id = {id} '
+                               'ORDER BY record_id DESC LIMIT 1').format(
+                id=sql.Placeholder(),
+                table=sql.Identifier(table_name))
         update_query = sql.SQL('UPDATE {table} SET {data} WHERE record_id=({selected}) '
                                'RETURNING record_id, lost_bounding_box').format(
             table=sql.Identifier(table_name),
             data=sql.SQL(', ').join(
                 sql.Composed([sql.Identifier(field), sql.SQL(" = "), sql.Placeholder()]) for field in fields),
-            selected=sql.Composed(last_obj_query),
-            fields=sql.SQL(",").join(map(sql.Identifier, fields)))
-        self.queue_in.put((query_type, update_query, data, preview_path, frame_path, obj.last_image))
-
-    def _execute_query(self):
-        while self.run_flag:
-            time.sleep(0.01)
-            try:
-                if not self.queue_in.empty():
-                    query_type, query_string, data, preview_path, frame_path, image = self.queue_in.get()
-                    if query_string is not None:
-                        pass
+            selected=selected)
+        self.queue_in.put((query_type, update_query, data, (preview_path, frame_path, obj.last_image, obj.object_id)))
+
+    def _process_results(self, query_type, record, payload):
+        if not record or record[0] is None:
+            return
+        preview_path, frame_path, image, object_id = payload
+        if query_type == 'insert':
+            with self.record_ids_lock:
+                if object_id in self.lost_before_saved:
+                    self.lost_before_saved.discard(object_id)
                 else:
-                    query_type = query_string = data = preview_path = frame_path = image = None
-            except ValueError:
-                break
-
-            if query_string is None:
-                continue
-
-            record = self.db_controller.query(query_string, data)
-            row_num = record[0][0]
-            box = record[0][1]
-            start_save_it = timer()
-            self._save_image(preview_path, frame_path, image, box)
-            end_save_it = timer()
-            if query_type == 'insert':
-                threading_events.notify('handler new object')
-            elif query_type == 'update':
-                threading_events.notify('handler update object')
+                    self.record_ids[object_id] = record[0][0]
+        box = record[0][1]
+        self._save_image(preview_path, frame_path, image, box)
+        if query_type == 'insert':
+            threading_events.notify('handler new object')
+        elif query_type == 'update':
+            threading_events.notify('handler update object')
 
     def _save_image(self, preview_path, frame_path, image, box):
         preview_save_dir = os.path.join(self.image_dir, preview_path)
         frame_save_dir = os.path.join(self.image_dir, frame_path)
-        preview = cv2.resize(copy.deepcopy(image.image), self.preview_size, cv2.INTER_NEAREST)
-        preview_boxes = utils.draw_preview_boxes(preview, self.preview_width, self.preview_height, box)
-        preview_saved = cv2.imwrite(preview_save_dir, preview_boxes)
-        frame_saved = cv2.imwrite(frame_save_dir, image.image)
-        if not preview_saved or not frame_saved:
-            print(f'ERROR: can\'t save image file {frame_save_dir}')
+        writer = image_writer.get_image_writer()
+        writer.write(preview_save_dir, lambda: self.preview_renderer.render(image, box))
+        writer.write_frame(frame_save_dir, image)
 
     def _prepare_for_updating(self, obj):
         fields_for_updating = {'lost_bounding_box': obj.track.bounding_box,
                                'time_lost': obj.time_lost,
                                'lost_preview_path': '',
                                'lost_frame_path': '',
-                               'object_data': json.dumps(obj.__dict__, cls=ObjectResultEncoder)}
+                               'object_data': object_data.encode_object_data(obj, self.object_data_trajectory_len)}
 
-        src_name = ''
-        for camera in self.cameras_params:
-            if obj.source_id in camera['source_ids']:
-                id_idx = camera['source_ids'].index(obj.source_id)
-                src_name = camera['source_names'][id_idx]
-                break
+        src_name = self.path_resolver.get_source_name(obj.source_id)
         fields_for_updating['lost_preview_path'] = self._get_img_path('preview', 'lost',
                                                                       src_name, obj)
         fields_for_updating['lost_frame_path'] = self._get_img_path('frame', 'lost',
@@ -132,17 +132,13 @@ class DatabaseAdapterObjects(DatabaseAdapterBase):
                              'lost_preview_path': None,
                              'frame_path': '',
                              'lost_frame_path': None,
-                             'object_data': json.dumps(obj.__dict__, cls=ObjectResultEncoder),
+                             'object_data': object_data.encode_object_data(obj, self.object_data_trajectory_len),
                              'project_id': self.db_controller.get_project_id(),
                              'job_id': self.db_controller.get_job_id(),
                              'camera_full_address': ''}
 
-        for camera in self.cameras_params:
-            if obj.source_id in camera['source_ids']:
-                id_idx = camera['source_ids'].index(obj.source_id)
-                fields_for_saving['source_name'] = camera['source_names'][id_idx]
-                fields_for_saving['camera_full_address'] = camera['camera']
-                break
+        fields_for_saving['source_name'] = self.path_resolver.get_source_name(obj.source_id)
+        fields_for_saving['camera_full_address'] = self.path_resolver.get_camera_address(obj.source_id)
         fields_for_saving['preview_path'] = self._get_img_path('preview', 'detected',
                                                                fields_for_saving['source_name'], obj)
         fields_for_saving['frame_path'] = self._get_img_path('frame', 'detected',
@@ -158,24 +154,9 @@ class DatabaseAdapterObjects(DatabaseAdapterBase):
                 fields_for_saving['preview_path'], fields_for_saving['frame_path'])
 
     def _get_img_path(self, image_type, obj_event_type, src_name, obj):
-        save_dir = self.db_params['image_dir']
-        img_dir = os.path.join(save_dir, 'images')
-        cur_date = datetime.date.today()
-        cur_date_str = cur_date.strftime('%Y_%m_%d')
-
-        current_day_path = os.path.join(img_dir, cur_date_str)
-        obj_type_path = os.path.join(current_day_path, obj_event_type + '_' + image_type + 's')
-        # obj_event_path = os.path.join(current_day_path, obj_event_type)
-        os.makedirs(img_dir, exist_ok=True)
-        os.makedirs(current_day_path, exist_ok=True)
-        os.makedirs(obj_type_path, exist_ok=True)
-        # if not os.path.exists(obj_event_path):
-        #     os.mkdir(obj_event_path)
-
         if obj_event_type == 'detected':
             timestamp = obj.time_detected.strftime('%Y_%m_%d_%H_%M_%S.%f')
-            img_path = os.path.join(obj_type_path, f'{timestamp}_{src_name}_{image_type}.jpeg')
-        elif obj_event_type == 'lost':
+        else:
             timestamp = obj.time_lost.strftime('%Y_%m_%d_%H_%M_%S_%f')
-            img_path = os.path.join(obj_type_path, f'{timestamp}_{src_name}_{image_type}.jpeg')
-        return os.path.relpath(img_path, save_dir)
+        return self.path_resolver.get_image_path(obj_event_type, image_type,
+                                                 f'{timestamp}_{src_name}_{image_type}.jpeg')
@@ -7,6 +7,9 @@ import os
 from timeit import default_timer as timer
 import cv2
 from ..utils import threading_events
+from ..utils import image_writer
+from ..utils.preview_renderer import PreviewRenderer
+from ..utils.frame_cache import get_frame_cache
 from ..utils import utils
 from psycopg2 import sql
 
@@ -18,6 +21,8 @@ class DatabaseAdapterZoneEvents(DatabaseAdapterBase):
         self.preview_width = self.db_params['preview_width']
         self.preview_height = self.db_params['preview_height']
         self.preview_size = (self.preview_width, self.preview_height)
+        self.preview_renderer = PreviewRenderer(self.preview_width, self.preview_height,
+                                                self.db_params.get('preview_crop_margin', None))
 
     def set_params_impl(self):
         super().set_params_impl()
@@ -26,12 +31,11 @@ class DatabaseAdapterZoneEvents(DatabaseAdapterBase):
     def _insert_impl(self, event):
         fields, data, preview_path, frame_path = self._prepare_for_saving(event)
         query_type = 'insert'
-        insert_query = sql.SQL("INSERT INTO {} ({}) VALUES ({}) RETURNING box_entered, zone_coords").format(
+        insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s RETURNING box_entered, zone_coords").format(
             sql.Identifier(self.table_name),
-            sql.SQL(",").join(map(sql.Identifier, fields)),
-            sql.SQL(', ').join(sql.Placeholder() * len(fields))
+            sql.SQL(",").join(map(sql.Identifier, fields))
         )
-        self.queue_in.put((query_type, insert_query, data, preview_path, frame_path, event.img_entered))
+        self.queue_in.put((query_type, insert_query, data, (preview_path, frame_path, event.frame_entered)))
 
     def _update_impl(self, event):
         fields, data, preview_path, frame_path = self._prepare_for_updating(event)
@@ -45,43 +49,35 @@ class DatabaseAdapterZoneEvents(DatabaseAdapterBase):
                 sql.Composed([sql.Identifier(field), sql.SQL(" = "), sql.Placeholder()]) for field in fields),
             selected=sql.Placeholder(),
             fields=sql.SQL(",").join(map(sql.Identifier, fields)))
-        self.queue_in.put((query_type, update_query, data, preview_path, frame_path, event.img_left))
-
-    def _execute_query(self):
-        while self.run_flag:
-            time.sleep(0.01)
-            try:
-                if not self.queue_in.empty():
-                    query_type, query_string, data, preview_path, frame_path, image = self.queue_in.get()
-                    if query_string is not None:
-                        pass
-                else:
-                    query_type = query_string = data = preview_path = frame_path = image = None
-            except ValueError:
-                break
-
-            if query_string is None:
-                continue
-
-            record = self.db_controller.query(query_string, data)
-            box = record[0][0]
-            zone_coords = record[0][1]
+        self.queue_in.put((query_type, update_query, data, (preview_path, frame_path, event.frame_left)))
+
+    def _process_results(self, query_type, record, payload):
+        preview_path, frame_path, frame = payload
+        # Кадр события берется из кэша только для сохранения и сразу освобождается
+        frame_cache = get_frame_cache()
+        image = frame_cache.get(frame)
+        frame_cache.release(frame)
+        if not record or record[0] is None:
+            return
+        box = record[0][0]
+        zone_coords = record[0][1]
+        if image is not None:
             self._save_image(preview_path, frame_path, image, box, zone_coords)
 
-            if query_type == 'insert':
-                threading_events.notify('new event')
-            elif query_type == 'update':
-                threading_events.notify('update event')
+        if query_type == 'insert':
+            threading_events.notify('new event')
+        elif query_type == 'update':
+            threading_events.notify('update event')
+
+    def _discard_payload(self, query_type, payload):
+        get_frame_cache().release(payload[2])
 
     def _save_image(self, preview_path, frame_path, image, box, zone_coords):
         preview_save_dir = os.path.join(self.image_dir, preview_path)
         frame_save_dir = os.path.join(self.image_dir, frame_path)
-        preview = cv2.resize(copy.deepcopy(image.image), self.preview_size, cv2.INTER_NEAREST)
-        preview_boxes = utils.draw_preview_boxes_zones(preview, self.preview_width, self.preview_height, box, zone_coords)
-        preview_saved = cv2.imwrite(preview_save_dir, preview_boxes)
-        frame_saved = cv2.imwrite(frame_save_dir, image.image)
-        if not preview_saved or not frame_saved:
-            print(f'ERROR: can\'t save image file {frame_save_dir}')
+        writer = image_writer.get_image_writer()
+        writer.write(preview_save_dir, lambda: self.preview_renderer.render(image, box, zone_coords))
+        writer.write_frame(frame_save_dir, image)
 
     def _prepare_for_updating(self, event):
         fields_for_updating = {'time_left': event.time_left,
@@ -89,7 +85,7 @@ class DatabaseAdapterZoneEvents(DatabaseAdapterBase):
                                'frame_path_left': self._get_img_path('frame', 'zone_left', event, time_lost=event.time_left),
                                'preview_path_left': self._get_img_path('preview', 'zone_left', event, time_lost=event.time_left)}
 
-        image_height, image_width, _ = event.img_left.image.shape
+        image_width, image_height = self._get_frame_size(event.frame_left)
         fields_for_updating['box_left'] = copy.deepcopy(fields_for_updating['box_left'])
         fields_for_updating['box_left'][0] /= image_width
         fields_for_updating['box_left'][1] /= image_height
@@ -117,7 +113,7 @@ class DatabaseAdapterZoneEvents(DatabaseAdapterBase):
         coords = [list(point) for point in event.zone.get_coords()]
         fields_for_saving['zone_coords'] = coords
 
-        image_height, image_width, _ = event.img_entered.image.shape
+        image_width, image_height = self._get_frame_size(event.frame_entered)
         fields_for_saving['box_entered'] = copy.deepcopy(fields_for_saving['box_entered'])
         fields_for_saving['box_entered'][0] /= image_width
         fields_for_saving['box_entered'][1] /= image_height
@@ -126,28 +122,17 @@ class DatabaseAdapterZoneEvents(DatabaseAdapterBase):
         return (list(fields_for_saving.keys()), list(fields_for_saving.values()),
                 fields_for_saving['preview_path_entered'], fields_for_saving['frame_path_entered'])
 
-    def _get_img_path(self, image_type, obj_event_type, event, time_stamp=None, time_lost=None):
-        save_dir = self.db_params['image_dir']
-        img_dir = os.path.join(save_dir, 'images')
-        cur_date = datetime.date.today()
-        cur_date_str = cur_date.strftime('%Y_%m_%d')
-
-        current_day_path = os.path.join(img_dir, cur_date_str)
-        obj_type_path = os.path.join(current_day_path, obj_event_type + '_' + image_type + 's')
-
-        if not os.path.exists(img_dir):
-            os.mkdir(img_dir)
-        if not os.path.exists(current_day_path):
-            os.mkdir(current_day_path)
-        if not os.path.exists(obj_type_path):
-            os.mkdir(obj_type_path)
+    @staticmethod
+    def _get_frame_size(frame) -> tuple[int, int]:
+        # Без кадра рамка остается в пикселях
+        return (frame.width, frame.height) if frame is not None else (1, 1)
 
+    def _get_img_path(self, image_type, obj_event_type, event, time_stamp=None, time_lost=None):
         zone_id = event.zone.get_zone_id()
         obj_id = event.object_id
         if obj_event_type == 'zone_entered':
             timestamp = time_stamp.strftime('%Y_%m_%d_%H_%M_%S.%f')
-            img_path = os.path.join(obj_type_path, f'{timestamp}_zone{zone_id}_obj{obj_id}_{image_type}.jpeg')
-        elif obj_event_type == 'zone_left':
+        else:
             timestamp = time_lost.strftime('%Y_%m_%d_%H_%M_%S_%f')
-            img_path = os.path.join(obj_type_path, f'{timestamp}_zone{zone_id}_obj{obj_id}_{image_type}.jpeg')
-        return os.path.relpath(img_path, save_dir)
+        return self.path_resolver.get_image_path(obj_event_type, image_type,
+                                                 f'{timestamp}_zone{zone_id}_obj{obj_id}_{image_type}.jpeg')
@@ -0,0 +1,70 @@
+from collections import deque
+from time import monotonic
+
+
+class EventIdAllocator:
+    """
+    Allocates ids of events. With a database controller ids are reserved from the database sequence
+    in blocks of block_size, so taking an id doesn't query the database and pipelines sharing the database
+    get different ids. Without database ids are counted locally from start_id.
+
+    Ids are never handed out without reservation: if a block can't be reserved, next_id() returns None and
+    the reservation is retried not more often than every retry_interval_secs, the caller holds its events meanwhile.
+    """
+
+    def __init__(self, db_controller=None, block_size: int = 100, start_id: int = 0,
+                 retry_interval_secs: float = 1.0):
+        self.db_controller = db_controller
+        self.block_size = max(int(block_size), 1)
+        self.retry_interval_secs = retry_interval_secs
+        self.reserved = deque()
+        self.last_id = start_id - 1
+        self.next_retry_time = 0.0
+        self.num_reserved_blocks = 0
+        self.num_failed_reservations = 0
+        self.is_available = True  # Последнее резервирование айди в БД выполнено успешно
+
+    def next_id(self) -> int | None:
+        """
+        :return: next id or None if no ids are reserved and the reservation failed or may not be retried yet
+        """
+        if self.db_controller is None:
+            self.last_id += 1
+            return self.last_id
+
+        if not self.reserved and monotonic() >= self.next_retry_time:
+            self._reserve_block()
+        if not self.reserved:
+            return None
+        self.last_id = self.reserved.popleft()
+        return self.last_id
+
+    def get_retry_delay(self) -> float:
+        """Seconds until the next reservation attempt"""
+        return max(self.next_retry_time - monotonic(), 0.0)
+
+    def get_debug_info(self) -> dict:
+        return {'reserved': len(self.reserved),
+                'reserved_blocks': self.num_reserved_blocks,
+                'failed_reservations': self.num_failed_reservations,
+                'is_available': self.is_available}
+
+    def _reserve_block(self):
+        try:
+            ids = self.db_controller.reserve_event_ids(self.block_size)
+        except Exception as ex:
+            ids = []
+            print(f"Can't reserve event ids: {ex}")
+        if ids:
+            self.reserved.extend(ids)
+            self.num_reserved_blocks += 1
+            if not self.is_available:
+                print('Event ids are reserved in database again')
+            self.is_available = True
+            return
+        self.num_failed_reservations += 1
+        self.next_retry_time = monotonic() + self.retry_interval_secs
+        if self.is_available:
+            self.is_available = False
+            print(f'Event ids are not reserved in database, new events are held until the reservation succeeds '
+                  f'(retried every {self.retry_interval_secs} s)')
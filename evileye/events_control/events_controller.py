@@ -1,16 +1,21 @@
 from threading import Thread
-from queue import Queue
-from timeit import default_timer as timer
-import time
-import copy
+from queue import Empty
 from ..core.base_class import EvilEyeBase
+from ..utils.bounded_queue import create_queue
+from ..utils.frame_cache import release_event_frames
 
 
 class EventsDetectorsController(EvilEyeBase):
     def __init__(self, events_detectors: list):
         super().__init__()
         self.control_thread = Thread(target=self.run)
-        self.queue_out = Queue()
+        # Очереди ограничены, при переполнении применяется queue_overflow_policy
+        self.queue_size = 1000
+        self.queue_overflow_policy = 'block'
+        self.queue_spill_dir = None
+        self.queue_in = None  # События от детекторов: (имя детектора, список событий)
+        self.queue_out = None
+        self._create_queues()
         self.detectors = events_detectors
         self.run_flag = False
 
@@ -20,41 +25,58 @@ class EventsDetectorsController(EvilEyeBase):
         self.any_events = False
 
     def set_params_impl(self):
-        pass
+        self.queue_size = self.params.get('queue_size', self.queue_size)
+        self.queue_overflow_policy = self.params.get('queue_overflow_policy', self.queue_overflow_policy)
+        self.queue_spill_dir = self.params.get('queue_spill_dir', self.queue_spill_dir)
+        self.queue_in.close()
+        self.queue_out.close()
+        self._create_queues()
 
     def get_params_impl(self):
-        return dict()
+        params = dict()
+        params['queue_size'] = self.queue_size
+        params['queue_overflow_policy'] = self.queue_overflow_policy
+        params['queue_spill_dir'] = self.queue_spill_dir
+        return params
+
+    def get_debug_info(self, debug_info: dict | None):
+        super().get_debug_info(debug_info)
+        debug_info['queue_in'] = self.queue_in.get_debug_info()
+        debug_info['queue_out'] = self.queue_out.get_debug_info()
 
     def init_impl(self):
         self.events_detectors = {detector.get_name(): [] for detector in self.detectors}
+        for detector in self.detectors:
+            detector.set_output_queue(self.queue_in)
 
     def is_running(self):
         return self.run_flag
 
     def get(self):
-        if self.queue_out.empty():
+        # empty() учитывает элементы журнала, которые могут оказаться нечитаемыми, поэтому get() не блокируется
+        try:
+            return self.queue_out.get_nowait()
+        except Empty:
             return {}
-        else:
-            return self.queue_out.get()
 
     def run(self):
         while self.run_flag:
-            time.sleep(0.01)
-            self.any_events = False  # Для отслеживания, были ли обнаружены события
-            begin_it = timer()
-
-            # Получаем от детекторов события
-            for detector in self.detectors:
-                events = detector.get()
-                if events:
-                    self.events_detectors[detector.get_name()] = events
-                    self.any_events = True
-                else:
-                    self.events_detectors[detector.get_name()] = []
-
-            if self.any_events:
-                self.queue_out.put(copy.deepcopy(self.events_detectors))
-            end_it = timer()
+            # Ждем события от любого из детекторов, затем забираем все уже поступившие
+            detector_name, events = self.queue_in.get()
+            if detector_name is None:
+                continue
+            # События не изменяются после создания и передаются обработчику без копирования
+            events_detectors = {name: [] for name in self.events_detectors}
+            events_detectors.setdefault(detector_name, []).extend(events)
+            while True:
+                try:
+                    detector_name, events = self.queue_in.get_nowait()
+                except Empty:
+                    break
+                if detector_name is not None:
+                    events_detectors.setdefault(detector_name, []).extend(events)
+            self.any_events = True
+            self.queue_out.put(events_detectors)
 
     def start(self):
         self.run_flag = True
@@ -62,10 +84,31 @@ class EventsDetectorsController(EvilEyeBase):
 
     def stop(self):
         self.run_flag = False
+        self.queue_in.put((None, None))
         if self.control_thread.is_alive():
             self.control_thread.join()
+        # Детекторы и главный контроллер не должны ждать места в очередях остановленного контроллера
+        self.queue_in.close()
+        self.queue_out.close()
         print('Everything in controller stopped')
 
+    def _create_queues(self):
+        self.queue_in = create_queue('events_detectors_in', self.queue_size, self.queue_overflow_policy,
+                                     self.queue_spill_dir, on_drop=self._on_detector_events_dropped)
+        self.queue_out = create_queue('events_detectors_out', self.queue_size, self.queue_overflow_policy,
+                                      self.queue_spill_dir, on_drop=self._on_events_dropped)
+
+    @staticmethod
+    def _on_detector_events_dropped(item):
+        detector_name, events = item
+        if detector_name is not None:
+            release_event_frames(events)
+
+    @staticmethod
+    def _on_events_dropped(events_detectors):
+        for events in events_detectors.values():
+            release_event_frames(events)
+
     def default(self):
         pass
 
@@ -1,67 +1,84 @@
 import time
-from queue import Queue
-from threading import Thread
+from collections import deque
+from threading import Thread, Event
+from queue import Full
 from ..core.base_class import EvilEyeBase
-from psycopg2 import sql
+from .event_id_allocator import EventIdAllocator
+from ..utils.frame_cache import get_frame_cache, release_event_frames
+from ..utils.bounded_queue import create_queue
 import datetime
 
 
 class EventsProcessor(EvilEyeBase):
     def __init__(self, db_adapters: list, db_controller):
         super().__init__()
-        self.id_counter = 0
-
-        self.queue = Queue()
+        self.id_allocator = None
+        self.event_id_block_size = 100
+        self.event_id_retry_interval_secs = 1.0
+
+        # Очередь событий от контроллера детекторов, при переполнении применяется queue_overflow_policy
+        self.queue_size = 1000
+        self.queue_overflow_policy = 'block'
+        self.queue_spill_dir = None
+        self.queue = self._create_queue()
         self.processing_thread = Thread(target=self.process)
         self.run_flag = False
+        self.wake_event = Event()  # Прерывает ожидание резервирования айди событий при остановке
         self.db_adapters = db_adapters
         self.db_controller = db_controller
         self.events_adapters = {}  # Сопоставляет имена событий с соответствующими им адаптерами
         self.events_tables = {}  # Сопоставляет имена событий с именами таблиц БД
         self.lost_store_time_secs = 10
+        self.max_finished_events = 1000
+        self.frame_cache_size = get_frame_cache().max_frames  # Число кадров событий, ожидающих сохранения
 
-        self.long_term_events = {}
-        self.finished_events = {}
+        self.long_term_events = {}  # Тип события: {ключ события: активное долгосрочное событие}
+        self.finished_events = {}  # Тип события: очередь завершенных событий в порядке завершения
+        self.num_orphan_finished_events = 0  # Завершения долгосрочных событий, начала которых не было
+        # (тип событий, событие), ожидающие резервирования айди в БД, события обрабатываются строго по порядку
+        self.held_events = deque()
 
     def set_params_impl(self):
-        pass
+        self.lost_store_time_secs = self.params.get('lost_store_time_secs', self.lost_store_time_secs)
+        self.max_finished_events = self.params.get('max_finished_events', self.max_finished_events)
+        self.event_id_block_size = self.params.get('event_id_block_size', self.event_id_block_size)
+        self.event_id_retry_interval_secs = self.params.get('event_id_retry_interval_secs',
+                                                            self.event_id_retry_interval_secs)
+        self.frame_cache_size = self.params.get('frame_cache_size', self.frame_cache_size)
+        get_frame_cache().set_max_frames(self.frame_cache_size)
+        self.queue_size = self.params.get('queue_size', self.queue_size)
+        self.queue_overflow_policy = self.params.get('queue_overflow_policy', self.queue_overflow_policy)
+        self.queue_spill_dir = self.params.get('queue_spill_dir', self.queue_spill_dir)
+        self.queue.close()
+        self.queue = self._create_queue()
 
     def get_params_impl(self):
-        return dict()
+        params = dict()
+        params['lost_store_time_secs'] = self.lost_store_time_secs
+        params['max_finished_events'] = self.max_finished_events
+        params['event_id_block_size'] = self.event_id_block_size
+        params['event_id_retry_interval_secs'] = self.event_id_retry_interval_secs
+        params['frame_cache_size'] = self.frame_cache_size
+        params['queue_size'] = self.queue_size
+        params['queue_overflow_policy'] = self.queue_overflow_policy
+        params['queue_spill_dir'] = self.queue_spill_dir
+        return params
+
+    def get_debug_info(self, debug_info: dict | None):
+        super().get_debug_info(debug_info)
+        debug_info['long_term_events'] = {name: len(events) for name, events in self.long_term_events.items()}
+        debug_info['finished_events'] = {name: len(events) for name, events in self.finished_events.items()}
+        debug_info['orphan_finished_events'] = self.num_orphan_finished_events
+        debug_info['held_events'] = len(self.held_events)
+        debug_info['queue'] = self.queue.get_debug_info()
+        if self.id_allocator is not None:
+            debug_info['event_ids'] = self.id_allocator.get_debug_info()
 
     def init_impl(self):
         self.events_adapters = {adapter.get_event_name(): adapter for adapter in self.db_adapters}
         self.events_tables = {adapter.get_event_name(): adapter.get_table_name() for adapter in self.db_adapters}
         # print(self.events_adapters)
 
-    def get_last_id(self):  # Функция для получения последнего id события из БД
-        # Return 0 if no database controller is available
-        if self.db_controller is None:
-            return 0
-            
-        table_names = list(self.events_tables.values())
-        if not table_names:  # No tables available
-            return 0
-            
-        subqueries = []
-        # Объединяем результаты из всех таблиц событий, выбираем максимальный id
-        for i in range(len(table_names) - 1):
-            subquery = sql.SQL('SELECT MAX(event_id) as event_id FROM {table} UNION').format(
-                table=sql.Identifier(table_names[i]))
-            subqueries.append(subquery)
-        subquery = sql.SQL('SELECT MAX(event_id) as event_id FROM {table}').format(
-            table=sql.Identifier(table_names[-1]))
-        subqueries.append(subquery)
-
-        query = sql.SQL('SELECT MAX(event_id) FROM ({subqueries}) AS temp').format(
-            subqueries=sql.SQL(' ').join(subqueries))
-        record = self.db_controller.query(query)
-
-        # Check if record is None or empty
-        if record is None or len(record) == 0 or len(record[0]) == 0 or record[0][0] is None:
-            return 0
-        return record[0][0] + 1
-
     def default(self):
         pass
 
@@ -75,85 +92,111 @@ class EventsProcessor(EvilEyeBase):
         self.queue.put(events)
 
     def start(self):
-        self.id_counter = self.get_last_id()
+        self.id_allocator = EventIdAllocator(self.db_controller, self.event_id_block_size,
+                                             retry_interval_secs=self.event_id_retry_interval_secs)
         self.run_flag = True
         self.processing_thread.start()
 
     def stop(self):
         self.run_flag = False
-        self.queue.put(None)
+        self.wake_event.set()
+        try:
+            self.queue.put(None, block=False)
+        except Full:
+            pass  # Очередь заполнена, поэтому обработчик не ждет в ней и сам увидит сброшенный флаг
         if self.processing_thread.is_alive():
             self.processing_thread.join()
+        self.queue.close()
 
     def process(self):
-        filtered_long_term = {key: None for key in self.long_term_events}
         while self.run_flag:
-            time.sleep(0.01)
-            new_events = self.queue.get()
-            if new_events is None:
-                continue
-            # print(new_events)
-
-            finished_idxs = set()
-            for events in new_events:
-                long_term = self.long_term_events.get(events,
-                                                      None)  # Получаем список долгосрочных событий, которые сейчас активны
-                if long_term:
-                    for event in new_events[events]:  # Проходим по всем событиям одного типа
-                        for i in range(len(long_term)):
-                            if event == long_term[i]:  # Проверяем, есть ли это событие в долгосрочных
-                                if event.is_finished():  # Обновляем запись о долгосрочном событии, если оно закончилось
-                                    long_term[i].update_on_finished(
-                                        event)  # Обновляем информацию о событии по его завершении
-                                    if event.get_name() in self.events_adapters:
-                                        self.events_adapters[event.get_name()].update(long_term[i])  # Получаем адаптер по имени события, отправляем в него завершенное
-                                    if events not in self.finished_events:
-                                        self.finished_events[events] = []
-                                    self.finished_events[events].append(event)
-                                    finished_idxs.add(i)
-                                break
-                        else:  # no break. Если событие новое, добавляем его в долгосрочные
-                            event.set_id(self.id_counter)
-                            self.id_counter += 1
-                            self.long_term_events[events].append(event)
-                            if event.get_name() in self.events_adapters:
-                                self.events_adapters[event.get_name()].insert(event)
-                else:  # Если нет активных долгосрочных событий, анализируем новые
-                    for event in new_events[events]:
-                        event.set_id(self.id_counter)
-                        self.id_counter += 1
-                        if event.is_long_term():  # Если событие долгосрочное и не завершено, делаем его активным
-                            if events not in self.long_term_events:
-                                self.long_term_events[events] = []
-                            if event.is_finished():  # Если новое долгосрочное событие уже пришло завершенным (на случай поиска в истории)
-                                if events not in self.finished_events:
-                                    self.finished_events[events] = []
-                                self.finished_events[events].append(event)
-                                if event.get_name() in self.events_adapters:
-                                    self.events_adapters[event.get_name()].insert(event)
-                            else:
-                                self.long_term_events[events].append(event)
-                        else:  # Иначе отправляем в завершенные
-                            if events not in self.finished_events:
-                                self.finished_events[events] = []
-                            self.finished_events[events].append(event)
-                        if event.get_name() in self.events_adapters:
-                            self.events_adapters[event.get_name()].insert(event)
-                # Удаляем завершенные долгосрочные события
-                if events in self.long_term_events:
-                    filtered_long_term[events] = [self.long_term_events[events][i] for i
-                                                  in range(len(self.long_term_events[events])) if i not in finished_idxs]
-                    self.long_term_events[events] = filtered_long_term[events]
-
-            for events in self.finished_events:
-                start_index_for_remove = None
-                for i in reversed(range(len(self.finished_events[events]))):
-                    if (datetime.datetime.now() - self.finished_events[events][i].get_time_finished()).total_seconds() > self.lost_store_time_secs:
-                        start_index_for_remove = i
-                        break
-                if start_index_for_remove is not None:
-                    if start_index_for_remove == 0:
-                        self.finished_events[events] = []
-                    else:
-                        self.finished_events[events] = self.finished_events[events][start_index_for_remove:]
-                # print(self.finished_events[events])
+            if not self.held_events:
+                new_events = self.queue.get()
+                if new_events is None:
+                    continue
+                self.held_events.extend((events_type, event) for events_type, events in new_events.items()
+                                        for event in events)
+
+            while self.held_events:
+                events_type, event = self.held_events[0]
+                if not self._process_event(events_type, event):
+                    break
+                self.held_events.popleft()
+            if self.held_events:
+                # Айди не получены из БД: события ждут резервирования, новые события копятся в очереди,
+                # при ее переполнении применяется queue_overflow_policy
+                self.wake_event.wait(max(self.id_allocator.get_retry_delay(), 0.01))
+
+            self._remove_expired_finished()
+
+        release_event_frames(event for _, event in self.held_events)
+        self.held_events.clear()
+
+    def _process_event(self, events_type, event) -> bool:
+        """
+        :return: False if the event needs an id and ids are not reserved, the event is not changed then
+        """
+        long_term = self.long_term_events.setdefault(events_type, {})  # Активные долгосрочные события
+        key = event.get_key()
+        active_event = long_term.get(key) if event.is_long_term() else None
+        # Начало события вытеснено из очереди или обработано до перезапуска, завершение без начала не сохраняется
+        is_orphan = active_event is None and event.is_long_term() and event.is_finished()
+        event_id = None
+        if active_event is None and not is_orphan:
+            event_id = self.id_allocator.next_id()
+            if event_id is None:
+                return False
+
+        adapter = self.events_adapters.get(event.get_name())
+        if adapter is None:
+            # Кадры события нужны только адаптеру, без него они сразу освобождаются
+            release_event_frames((event,))
+        if active_event is not None:
+            if event.is_finished():
+                # Обновляем информацию о долгосрочном событии по его завершении
+                active_event.update_on_finished(event)
+                del long_term[key]
+                self._add_finished(events_type, event)
+                if adapter is not None:
+                    adapter.update(active_event)
+            return True
+        if is_orphan:
+            self.num_orphan_finished_events += 1
+            if adapter is not None:
+                release_event_frames((event,))
+            return True
+
+        event.set_id(event_id)
+        if event.is_long_term():
+            long_term[key] = event
+        else:
+            self._add_finished(events_type, event)
+        if adapter is not None:
+            adapter.insert(event)
+        return True
+
+    def _create_queue(self):
+        return create_queue('events_processor', self.queue_size, self.queue_overflow_policy, self.queue_spill_dir,
+                            on_drop=self._on_events_dropped)
+
+    @staticmethod
+    def _on_events_dropped(new_events):
+        if new_events is not None:
+            for events in new_events.values():
+                release_event_frames(events)
+
+    def _add_finished(self, events_type, event):
+        finished = self.finished_events.get(events_type)
+        if finished is None:
+            finished = self.finished_events[events_type] = deque(maxlen=self.max_finished_events)
+        finished.append(event)
+
+    def _remove_expired_finished(self):
+        now = datetime.datetime.now()
+        for finished in self.finished_events.values():
+            # События добавляются в порядке завершения, устаревшие находятся в начале очереди
+            while finished:
+                time_finished = finished[0].get_time_finished()
+                if time_finished is not None and (now - time_finished).total_seconds() <= self.lost_store_time_secs:
+                    break
+                finished.popleft()
@@ -1,47 +1,55 @@
-import time
-from .event import Event
-from threading import Thread
-from queue import Queue
+from queue import Empty
 from .events_detector import EventsDetector
 from .event_cameras import CameraEvent
-import itertools
+from ..capture.video_capture_base import VideoCaptureBase
+from ..utils import threading_events
+from ..utils.bounded_queue import BoundedQueue, OverflowPolicy
 
 
 class CamEventsDetector(EventsDetector):
     def __init__(self, sources):
         super().__init__()
         self.sources = sources
+        # Источники публикуют переходы состояния в момент изменения, поток захвата кадров не должен ждать,
+        # поэтому при переполнении вытесняются самые старые переходы
+        self.queue_in = BoundedQueue(1000, OverflowPolicy.DropOldest)
+        self.camera_states = dict()  # Адрес камеры: последнее полученное состояние подключения
+
+    def on_connection_changed(self, source, state):
+        if self.run_flag and any(source is camera for camera in self.sources):
+            self.queue_in.put(state)
 
     def process(self):
         while self.run_flag:
-            time.sleep(0.2)
-            events = []
-            discon_iter, recon_iter = self.queue_in.get()
-            if discon_iter is None or recon_iter is None:
-                continue
-            # По каждому отключению получаем адрес камеры, время и состояние камеры
-            for disconnect in discon_iter:
-                address, timestamp, is_connected = disconnect
-                event = CameraEvent(address, is_connected, timestamp, 'Warning')
-                events.append(event)
-
-            for reconnect in recon_iter:
-                address, timestamp, is_connected = reconnect
-                event = CameraEvent(address, is_connected, timestamp, 'Warning')
-                events.append(event)
+            # Ждем перехода состояния любой камеры, затем забираем все уже поступившие
+            states = [self.queue_in.get()]
+            while True:
+                try:
+                    states.append(self.queue_in.get_nowait())
+                except Empty:
+                    break
 
+            events = []
+            for state in states:
+                if state is None:
+                    continue
+                self.camera_states[state.address] = state
+                events.append(CameraEvent(state.address, state.is_connected, state.timestamp, 'Warning'))
             if events:
-                self.queue_out.put(events)
+                self._put_events(events)
 
     def update(self):
-        disconnects_iter = iter([])
-        reconnects_iter = iter([])
-        # Получаем информацию об отключениях и переподключениях от всех источников и отправляем в детектор
-        for source in self.sources:
-            disconnects_iter = itertools.chain(disconnects_iter, source.get_disconnects_info())
-            reconnects_iter = itertools.chain(reconnects_iter, source.get_reconnects_info())
+        # Состояния камер приходят через threading_events, опрос источников не нужен
+        pass
 
-        self.queue_in.put((disconnects_iter, reconnects_iter))
+    def get_debug_info(self, debug_info: dict | None):
+        super().get_debug_info(debug_info)
+        debug_info['cameras'] = {address: {'is_connected': state.is_connected,
+                                           'timestamp': state.timestamp,
+                                           'reconnect_attempts': state.reconnect_attempts,
+                                           'reconnect_delay': state.reconnect_delay}
+                                 for address, state in list(self.camera_states.items())}
+        debug_info['queue'] = self.queue_in.get_debug_info()
 
     def set_params_impl(self):
         pass
@@ -61,8 +69,13 @@ class CamEventsDetector(EventsDetector):
     def init_impl(self):
         pass
 
+    def start(self):
+        super().start()
+        threading_events.subscribe(VideoCaptureBase.connection_event, self.on_connection_changed)
+
     def stop(self):
+        threading_events.unsubscribe(VideoCaptureBase.connection_event, self.on_connection_changed)
         self.run_flag = False
-        self.queue_in.put((None, None))
+        self.queue_in.put(None)
         if self.processing_thread.is_alive():
             self.processing_thread.join()
@@ -1,4 +1,10 @@
 class Event:
+    """
+    Small record of an event: ids, time stamps and boxes. Frames are not kept in events, events keep FrameRef
+    to frames in the shared FrameCache, images are materialized by consumers that need them
+    """
+    __slots__ = ('event_id', 'timestamp', 'alarm_type', 'finished', 'long_term')
+
     def __init__(self, timestamp, alarm_type, is_finished=False):
         self.event_id = None
         self.timestamp = timestamp
@@ -15,6 +21,14 @@ class Event:
     def get_name(self):
         return self.__class__.__name__
 
+    def get_key(self):
+        """Stable key of the event, start and finish of a long-term event have equal keys"""
+        return self.event_id
+
+    def get_frames(self) -> tuple:
+        """References to frames in FrameCache held by the event, they are released by the consumer of the event"""
+        return ()
+
     def set_id(self, global_id):
         self.event_id = global_id
 
@@ -2,6 +2,8 @@ from .event import Event
 
 
 class CameraEvent(Event):
+    __slots__ = ('camera_address', 'con_status')
+
     def __init__(self, address, is_connected, timestamp, alarm_type, is_finished=True):
         super().__init__(timestamp, alarm_type, is_finished)
         self.camera_address = address
@@ -14,5 +16,8 @@ class CameraEvent(Event):
     def __eq__(self, other):
         return self.camera_address == other.camera_address and self.timestamp == self.timestamp
 
+    def get_key(self):
+        return self.camera_address
+
     def is_connected(self):
         return self.con_status
@@ -2,6 +2,8 @@ from .event import Event
 
 
 class FieldOfViewEvent(Event):
+    __slots__ = ('source_id', 'object_id', 'time_obj_detected', 'time_lost')
+
     def __init__(self, timestamp, alarm_type, obj, is_finished=False):
         super().__init__(timestamp, alarm_type, is_finished)
         self.source_id = obj.source_id
@@ -16,6 +18,9 @@ class FieldOfViewEvent(Event):
     def __eq__(self, other):
         return self.source_id == other.source_id and self.object_id == other.object_id
 
+    def get_key(self):
+        return self.object_id, self.source_id
+
     def update_on_finished(self, finished_event):
         self.time_lost = finished_event.time_lost
 
@@ -0,0 +1,40 @@
+from .event import Event
+
+
+class LineCrossingEvent(Event):
+    __slots__ = ('source_id', 'object_id', 'line', 'direction', 'frame', 'box', 'time_crossed',
+                 'count_forward', 'count_backward')
+
+    def __init__(self, timestamp, alarm_type, obj, line, direction, frame=None, count_forward=0, count_backward=0):
+        """
+        :param obj: history element of the object at the end of the trajectory segment crossing the line
+        :param direction: CrossingDirection
+        :param frame: FrameRef of the frame of the event acquired in FrameCache
+        :param count_forward: number of crossings of the line in forward direction in the counter window,
+         including this one
+        """
+        super().__init__(timestamp, alarm_type, is_finished=True)
+        self.source_id = obj.source_id
+        self.object_id = obj.object_id
+        self.line = line
+        self.direction = direction
+        self.frame = frame
+        self.box = list(obj.track.bounding_box)
+        self.time_crossed = obj.time_stamp
+        self.count_forward = count_forward
+        self.count_backward = count_backward
+        self.long_term = False
+
+    def __str__(self):
+        return (f'Id: {self.event_id}, Source: {self.source_id}, Obj_id: {self.object_id}, '
+                f'Line: {self.line.get_name()}, Direction: {self.direction.value}, Time: {self.time_crossed}')
+
+    def __eq__(self, other):
+        return (self.source_id == other.source_id and self.object_id == other.object_id and
+                self.line == other.line and self.time_crossed == other.time_crossed)
+
+    def get_frames(self) -> tuple:
+        return (self.frame,) if self.frame is not None else ()
+
+    def get_time_finished(self):
+        return self.time_crossed
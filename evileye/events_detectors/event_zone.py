@@ -1,25 +1,32 @@
 from .event import Event
-import copy
 
 
 class ZoneEvent(Event):
-    def __init__(self, timestamp, alarm_type, obj, zone, is_finished=False):
+    __slots__ = ('source_id', 'zone', 'object_id', 'frame_entered', 'frame_left', 'box_entered', 'box_left',
+                 'time_entered', 'time_left')
+
+    def __init__(self, timestamp, alarm_type, obj, zone, is_finished=False, frame=None):
+        """
+        :param obj: object or its history element at the moment of entering or leaving the zone
+        :param frame: FrameRef of the frame of the event acquired in FrameCache
+        """
         super().__init__(timestamp, alarm_type, is_finished)
         self.source_id = obj.source_id
         self.zone = zone
         self.object_id = obj.object_id
+        box = list(obj.track.bounding_box)
         if not is_finished:
-            self.img_entered = copy.deepcopy(obj.last_image)
-            self.img_left = None
-            self.box_entered = obj.track.bounding_box
+            self.frame_entered = frame
+            self.frame_left = None
+            self.box_entered = box
             self.box_left = None
             self.time_entered = obj.time_stamp
             self.time_left = None
         else:
-            self.img_entered = None
-            self.img_left = copy.deepcopy(obj.last_image)
+            self.frame_entered = None
+            self.frame_left = frame
             self.box_entered = None
-            self.box_left = obj.track.bounding_box
+            self.box_left = box
             self.time_entered = None
             self.time_left = obj.time_stamp
 
@@ -34,10 +41,16 @@ class ZoneEvent(Event):
         return (self.source_id == other.source_id and self.object_id == other.object_id and
                 self.zone == other.zone)
 
+    def get_key(self):
+        return self.object_id, self.zone.get_zone_id()
+
     def update_on_finished(self, finished_event):
         self.time_left = finished_event.time_left
-        self.img_left = finished_event.img_left
+        self.frame_left = finished_event.frame_left
         self.box_left = finished_event.box_left
 
+    def get_frames(self) -> tuple:
+        return tuple(frame for frame in (self.frame_entered, self.frame_left) if frame is not None)
+
     def get_time_finished(self):
         return self.time_left
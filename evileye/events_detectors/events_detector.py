@@ -1,8 +1,10 @@
 from .event import Event
 from threading import Thread
-from queue import Queue
+from queue import Queue, Empty
 from abc import ABC, abstractmethod
 from ..core.base_class import EvilEyeBase
+from ..utils.bounded_queue import BoundedQueue, OverflowPolicy
+from ..utils.frame_cache import release_event_frames
 
 
 class EventsDetector(EvilEyeBase):
@@ -10,7 +12,9 @@ class EventsDetector(EvilEyeBase):
         super().__init__()
         self.processing_thread = Thread(target=self.process)
         self.queue_in = Queue(maxsize=2)
-        self.queue_out = Queue()
+        # Используется только без общей очереди контроллера, непрочитанные события вытесняются новыми
+        self.queue_out = BoundedQueue(100, OverflowPolicy.DropOldest, on_drop=release_event_frames)
+        self.output_queue = None  # Общая очередь контроллера детекторов, в которую передаются события
         self.run_flag = False
 
     def put(self, data):
@@ -25,10 +29,21 @@ class EventsDetector(EvilEyeBase):
         self.queue_in.put(None)
         self.processing_thread.join()
 
+    def set_output_queue(self, output_queue: Queue | None):
+        """Events are put to output_queue as (detector name, events) instead of queue_out"""
+        self.output_queue = output_queue
+
+    def _put_events(self, events: list):
+        if self.output_queue is not None:
+            self.output_queue.put((self.get_name(), events))
+        else:
+            self.queue_out.put(events)
+
     def get(self):
-        if self.queue_out.empty():
+        try:
+            return self.queue_out.get_nowait()
+        except Empty:
             return []
-        return self.queue_out.get()
 
     def get_name(self):
         return self.__class__.__name__
@@ -1,9 +1,9 @@
 import datetime
-import time
 from threading import Event
 from .event_fov import FieldOfViewEvent
 from .events_detector import EventsDetector
 from datetime import datetime
+from .objects_delta import ObjectsDeltaReader
 
 
 class FieldOfViewEventsDetector(EventsDetector):
@@ -14,101 +14,63 @@ class FieldOfViewEventsDetector(EventsDetector):
         self.sources_periods = dict()  # Айди источника: периоды времени
         self.periods = None
         self.obj_handler = objects_handler
+        self.objects_reader = ObjectsDeltaReader(objects_handler)
         self.event = Event()
 
         self.active_obj_ids = dict()  # Словарь для хранения айди активных объектов
-        self.lost_obj_ids = dict()
 
     def process(self):
         while self.run_flag:
-            time.sleep(0.01)
             self.event.wait()
             if not self.run_flag:
                 break
+            self.event.clear()
             events = []
-            objects = []
-            lost_objects = []
-            for source_id in self.sources:
-                objects.append((source_id, self.obj_handler.get('active', source_id)))
-                lost_objects.append((source_id, self.obj_handler.get('lost', source_id)))
-            # objects, lost_objects = self.queue_in.get()
-            # if objects is None or lost_objects is None:
-            #     continue
-            for source_id, source_objects in objects:  # Проходим по объектам от каждого источника в отдельности
-                if source_id not in self.sources:
-                    continue
-                if not source_objects.objects:
-                    continue
-
-                for obj in source_objects.objects:  # Для каждого объекта
-                    if obj.object_id not in self.active_obj_ids[source_id]:  # Если объект ранее не появлялся в зоне
-                        idx = self._check_event_in_history(source_id, obj)
-                        if idx == -1:
-                            continue
-                        hist_obj = obj.history[idx]
-                        timestamp = datetime.now()
-                        self.active_obj_ids[source_id].add(obj.object_id)
-                        event = FieldOfViewEvent(timestamp, 'Alarm', hist_obj)
-                        # print(f'New event: {obj.last_image.frame_id}, Event: {event}')
-                        events.append(event)
-
-            for source_id, source_objects in lost_objects:  # Определяем завершившиеся события
-                lost_obj_ids = set()
-                if source_id not in self.sources:
-                    continue
-                if not source_objects.objects:
-                    continue
-                for obj in source_objects.objects:  # Для каждого объекта
+            for source_id in self.sources:  # Проходим по объектам от каждого источника в отдельности
+                # Проверяются только новые точки истории обновленных объектов и новые потерянные объекты
+                updated, lost = self.objects_reader.read(source_id)
+                for obj, first_idx in updated:
+                    if obj.object_id in self.active_obj_ids[source_id]:  # Событие по объекту уже создано
+                        continue
+                    idx = self._check_event_in_history(source_id, obj, first_idx)
+                    if idx == -1:
+                        continue
+                    hist_obj = obj.history[idx]
+                    timestamp = datetime.now()
+                    self.active_obj_ids[source_id].add(obj.object_id)
+                    event = FieldOfViewEvent(timestamp, 'Alarm', hist_obj)
+                    events.append(event)
+
+                for obj, first_idx in lost:  # Определяем завершившиеся события
+                    timestamp = datetime.now()
                     if obj.object_id in self.active_obj_ids[source_id]:  # Если объект был активен в запрещенный период
-                        timestamp = datetime.now()
                         self.active_obj_ids[source_id].remove(obj.object_id)
-                        lost_obj_ids.add(obj.object_id)
                         event = FieldOfViewEvent(timestamp, 'Alarm', obj, is_finished=True)
-                        # print(f'Finished event: {obj.last_image.frame_id}, Event: {event}')
                         events.append(event)
-                    else:  # Проверяем по истории потерянных объектов, если потеряли объект, до того как он был
-                        # обработан детектором
-                        if obj.object_id in self.lost_obj_ids[source_id]:
-                            lost_obj_ids.add(obj.object_id)
-                            continue
-                        idx = self._check_event_in_history(source_id, obj)
+                    # Проверяем непрочитанную историю, если объект потерян до того, как был обработан детектором
+                    else:
+                        idx = self._check_event_in_history(source_id, obj, first_idx)
                         if idx == -1:
                             continue
-                        hist_obj = obj.history[idx]
-                        timestamp = datetime.now()
-                        # Сразу же создаем завершенное событие, так как данный объект уже потерян
-                        event = FieldOfViewEvent(timestamp, 'Alarm', obj, is_finished=True)
-                        events.append(event)
-                        lost_obj_ids.add(obj.object_id)
-                self.lost_obj_ids[source_id] = lost_obj_ids
+                        # Объект уже потерян: начало и завершение события передаются в одном пакете,
+                        # обработчик событий сохраняет только завершения известных ему событий
+                        events.append(FieldOfViewEvent(timestamp, 'Alarm', obj.history[idx]))
+                        events.append(FieldOfViewEvent(timestamp, 'Alarm', obj, is_finished=True))
             if events:
-                self.queue_out.put(events)
-            self.event.clear()
+                self._put_events(events)
 
-    def _check_event_in_history(self, src_id, obj) -> int:
-        time_periods = self.sources_periods[src_id]
+    def _check_event_in_history(self, src_id, obj, first_idx: int = 0) -> int:
+        """
+        :return: index of the first history element since first_idx that falls into a period of the source or -1
+        """
+        time_periods = self.sources_periods.get(src_id, [])
         history = obj.history
-        end = len(history) - 1
-        beg = 0
-        idx = None
-        for i in range(len(time_periods)):  # Проходим по периодам, в которые запрещено появляться
-            start_time = time_periods[i][0]
-            end_time = time_periods[i][1]
-            while beg <= end:
-                mid = (beg + end) // 2
-                history_obj = history[mid]
-                if start_time <= history_obj.time_stamp.time() <= end_time:
-                    idx = mid
-                    end = mid - 1
-                else:
-                    if history_obj.time_stamp.time() > end_time:
-                        end = mid - 1
-                    elif history_obj.time_stamp.time() < start_time:
-                        beg = mid + 1
-            if idx is not None:
-                return idx
-        if idx is None:
-            return -1
+        for idx in range(first_idx, len(history)):
+            time_stamp = history[idx].time_stamp.time()
+            for start_time, end_time in time_periods:
+                if start_time <= time_stamp <= end_time:
+                    return idx
+        return -1
 
     def update(self):
         if not self.event.is_set():
@@ -124,7 +86,6 @@ class FieldOfViewEventsDetector(EventsDetector):
         self.sources_list = self.params.get('sources', dict())
         self.sources = {int(key) for key in self.sources_list.keys()}
         self.active_obj_ids = {source: set() for source in self.sources}
-        self.lost_obj_ids = {source: set() for source in self.sources}
 
         sources_periods = {int(key): value for key, value in self.sources_list.items()}
         for source in sources_periods:  # Перевод периодов времени из строк к типу datetime
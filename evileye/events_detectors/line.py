@@ -0,0 +1,38 @@
+from enum import Enum
+
+
+class CrossingDirection(Enum):
+    # Направление считается относительно линии от первой точки ко второй так, как она видна на кадре:
+    # Forward - переход с левой стороны линии на правую, Backward - с правой на левую
+    Forward = 'forward'
+    Backward = 'backward'
+
+
+class Line:
+    def __init__(self, source: int, coords: tuple, name: str | None = None, line_id=None):
+        """
+        :param coords: two points of the line normalized to frame size
+        """
+        self.id = line_id
+        self.source_id = source
+        self.norm_coords = tuple(tuple(point) for point in coords)
+        self.name = name
+
+    def __eq__(self, other):
+        return self.source_id == other.source_id and self.norm_coords == other.norm_coords
+
+    def set_id(self, line_id):
+        if self.id is None:
+            self.id = line_id
+
+    def get_coords(self):
+        return self.norm_coords
+
+    def get_src_id(self):
+        return self.source_id
+
+    def get_line_id(self):
+        return self.id
+
+    def get_name(self) -> str:
+        return self.name if self.name else f'line{self.id}'
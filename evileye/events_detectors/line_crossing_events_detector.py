@@ -0,0 +1,257 @@
+from collections import deque
+from threading import Event
+import numpy as np
+from .events_detector import EventsDetector
+from .event_line_crossing import LineCrossingEvent
+from .line import Line, CrossingDirection
+from .objects_delta import ObjectsDeltaReader
+from ..core.base_class import EvilEyeBase
+from ..utils.frame_cache import get_frame_cache
+
+
+def line_sides(points: np.ndarray, line_starts: np.ndarray, line_ends: np.ndarray) -> np.ndarray:
+    """
+    Sides of points relative to lines by the sign of the cross product
+    :param points: N x 2 points or N x L x 2 points, one for every line
+    :return: N x L matrix: 1 - right side of the line from its first point to the second one, -1 - left side,
+     0 - the point is on the line or is unknown (NaN)
+    """
+    if points.ndim == 2:
+        points = points[:, np.newaxis, :]
+    dx = line_ends[:, 0] - line_starts[:, 0]
+    dy = line_ends[:, 1] - line_starts[:, 1]
+    cross = dx * (points[..., 1] - line_starts[:, 1]) - dy * (points[..., 0] - line_starts[:, 0])
+    return (cross > 0).astype(np.int8) - (cross < 0).astype(np.int8)
+
+
+def find_crossings(starts: np.ndarray, ends: np.ndarray, line_starts: np.ndarray, line_ends: np.ndarray) -> tuple:
+    """
+    Intersections of all trajectory segments with all lines in one numpy call. A segment crosses a line only if
+    its ends are strictly on different sides of the line, segments touching the line or lying on it don't cross it
+    :param starts: M x 2 start points of segments or M x L x 2 start points, one for every line
+    :param ends: M x 2 end points of segments
+    :param line_starts: L x 2 first points of lines
+    :param line_ends: L x 2 second points of lines
+    :return: M x L boolean matrices of crossings and of crossings in forward direction
+    """
+    if starts.ndim == 2:
+        starts = starts[:, np.newaxis, :]
+    start_sides = line_sides(starts, line_starts, line_ends)
+    end_sides = line_sides(ends, line_starts, line_ends)
+    # Концы линии должны лежать по разные стороны от отрезка траектории, иначе отрезок проходит мимо линии
+    sx, sy = starts[..., 0], starts[..., 1]
+    seg_x, seg_y = ends[:, 0:1] - sx, ends[:, 1:2] - sy
+    side_a = seg_x * (line_starts[:, 1] - sy) - seg_y * (line_starts[:, 0] - sx)
+    side_b = seg_x * (line_ends[:, 1] - sy) - seg_y * (line_ends[:, 0] - sx)
+    crossed = (start_sides * end_sides < 0) & (side_a * side_b <= 0)
+    return crossed, crossed & (end_sides > 0)
+
+
+class _LineCounter:
+    """Crossings of a line in the rolling window of window_secs and in total"""
+    __slots__ = ('window_secs', 'crossings', 'forward', 'backward', 'total_forward', 'total_backward')
+
+    def __init__(self, window_secs: float):
+        self.window_secs = window_secs
+        self.crossings = deque()  # (время пересечения, направление вперед)
+        self.forward = 0
+        self.backward = 0
+        self.total_forward = 0
+        self.total_backward = 0
+
+    def add(self, time_stamp: float, is_forward: bool):
+        self.crossings.append((time_stamp, is_forward))
+        if is_forward:
+            self.forward += 1
+            self.total_forward += 1
+        else:
+            self.backward += 1
+            self.total_backward += 1
+        self.expire(time_stamp)
+
+    def expire(self, time_stamp: float):
+        while self.crossings and time_stamp - self.crossings[0][0] > self.window_secs:
+            _, is_forward = self.crossings.popleft()
+            if is_forward:
+                self.forward -= 1
+            else:
+                self.backward -= 1
+
+
+@EvilEyeBase.register("LineCrossingEventsDetector")
+class LineCrossingEventsDetector(EventsDetector):
+    def __init__(self, objects_handler):
+        super().__init__()
+        self.sources = set()
+        self.sources_list = dict()
+        self.sources_lines = dict()  # Айди источника: список линий
+        self.sources_line_points = dict()  # Айди источника: (первые точки линий L x 2, вторые точки линий L x 2)
+        self.line_counters = dict()  # Айди линии: _LineCounter
+        self.obj_anchors = dict()  # Айди объекта: L x 2 последние точки объекта не на линиях источника
+        self.objects_reader = ObjectsDeltaReader(objects_handler)
+        self.obj_handler = objects_handler
+        self.counter_window_secs = 60.0
+        self.line_counter = 0
+        self.event = Event()
+
+    def process(self):
+        while self.run_flag:
+            self.event.wait()
+            if not self.run_flag:
+                break
+            self.event.clear()
+
+            events = []
+            for source_id in self.sources:
+                # Обрабатываются только новые точки истории обновленных объектов
+                updated, lost = self.objects_reader.read(source_id)
+                if updated:
+                    self._process_updated(source_id, updated, events)
+                for obj, _ in lost:
+                    self.obj_anchors.pop(obj.object_id, None)
+            if events:
+                self._put_events(events)
+
+    def _process_updated(self, source_id, updated, events):
+        img_height, img_width = updated[0][0].last_image.image.shape[:2]
+        scale = np.array((img_width, img_height), dtype=np.float64)
+        line_starts, line_ends = self.sources_line_points[source_id]
+        num_lines = len(line_starts)
+        # Строки блока объекта: сохраненные опорные точки по линиям, затем новые точки истории
+        blocks = []
+        block_objs = []
+        block_indices = []
+        for obj_idx, (obj, first_idx) in enumerate(updated):
+            # Пересечение определяется по средней точке нижней границы рамки, координаты нормируются как у линий
+            points = obj.history.bottom_centers()[first_idx:] / scale
+            anchors = self.obj_anchors.get(obj.object_id)
+            if anchors is None or len(anchors) != num_lines:
+                anchors = np.full((num_lines, 2), np.nan)
+            block = np.empty((len(points) + 1, num_lines, 2))
+            block[0] = anchors
+            block[1:] = points[:, np.newaxis, :]
+            blocks.append(block)
+            block_objs.append(np.full(len(points) + 1, obj_idx))
+            block_indices.append(np.arange(first_idx - 1, first_idx + len(points)))
+        rows_points = np.concatenate(blocks)
+        row_objs = np.concatenate(block_objs)
+        row_indices = np.concatenate(block_indices)
+        is_anchor_row = np.zeros(len(rows_points), dtype=bool)
+        is_anchor_row[np.cumsum([0] + [len(block) for block in blocks[:-1]])] = True
+
+        # Опорная точка для линии - последняя точка объекта не на линии, по ней определяется сторона объекта.
+        # Для каждой строки находится последняя такая строка не позже нее, строки опорных точек отделяют объекты
+        keep = (line_sides(rows_points, line_starts, line_ends) != 0) | is_anchor_row[:, np.newaxis]
+        last_rows = np.maximum.accumulate(np.where(keep, np.arange(len(rows_points))[:, np.newaxis], 0), axis=0)
+        line_columns = np.arange(num_lines)
+        block_ends = np.append(np.flatnonzero(is_anchor_row)[1:], len(rows_points)) - 1
+        for (obj, _), block_end in zip(updated, block_ends.tolist()):
+            self.obj_anchors[obj.object_id] = rows_points[last_rows[block_end], line_columns]
+
+        new_rows = np.flatnonzero(~is_anchor_row)
+        if len(new_rows) == 0:
+            return
+        prev_anchors = rows_points[last_rows[new_rows - 1], line_columns]
+        crossed, forward = find_crossings(prev_anchors, rows_points[new_rows, 0], line_starts, line_ends)
+        rows, columns = np.nonzero(crossed)
+        if len(rows):
+            segment_objs = row_objs[new_rows[rows]]
+            segment_indices = row_indices[new_rows[rows]]
+            segment_times = np.array([updated[obj_idx][0].history.time_stamps[idx]
+                                      for obj_idx, idx in zip(segment_objs.tolist(), segment_indices.tolist())])
+            # Счетчики и события ведутся в порядке времени пересечений
+            order = np.argsort(segment_times, kind='stable')
+            lines = self.sources_lines[source_id]
+            for crossing, column, time_stamp in zip(order.tolist(), columns[order].tolist(),
+                                                    segment_times[order].tolist()):
+                obj = updated[segment_objs[crossing]][0]
+                hist_obj = obj.history[int(segment_indices[crossing])]
+                line = lines[column]
+                is_forward = bool(forward[rows[crossing], column])
+                counter = self.line_counters[line.get_line_id()]
+                counter.add(time_stamp, is_forward)
+                direction = CrossingDirection.Forward if is_forward else CrossingDirection.Backward
+                # Рамка события берется из точки пересечения, поэтому нужен кадр именно этой точки.
+                # Если его нет, событие сохраняется без изображения
+                events.append(LineCrossingEvent(hist_obj.time_stamp, 'Alarm', hist_obj, line, direction,
+                                                frame=get_frame_cache().acquire_history_frame(obj, hist_obj),
+                                                count_forward=counter.forward, count_backward=counter.backward))
+
+        last_time_stamp = max(float(obj.history.time_stamps[-1]) for obj, _ in updated)
+        for line in self.sources_lines[source_id]:
+            self.line_counters[line.get_line_id()].expire(last_time_stamp)
+
+    def get_counters(self) -> dict:
+        """
+        :return: line id: crossings of the line in the counter window and in total by directions
+        """
+        counters = dict()
+        for source_id, lines in self.sources_lines.items():
+            for line in lines:
+                counter = self.line_counters[line.get_line_id()]
+                counters[line.get_line_id()] = {'source_id': source_id,
+                                                'name': line.get_name(),
+                                                'forward': counter.forward,
+                                                'backward': counter.backward,
+                                                'total_forward': counter.total_forward,
+                                                'total_backward': counter.total_backward}
+        return counters
+
+    def get_debug_info(self, debug_info: dict | None):
+        super().get_debug_info(debug_info)
+        debug_info['tracked_objects'] = len(self.obj_anchors)
+        debug_info['counters'] = self.get_counters()
+
+    def update(self):
+        if not self.event.is_set():
+            self.event.set()
+
+    def set_params_impl(self):
+        self.sources_list = self.params.get('sources', dict())
+        self.counter_window_secs = self.params.get('counter_window_secs', self.counter_window_secs)
+        self.sources = {int(key) for key in self.sources_list.keys()}
+        self.sources_lines = dict()
+        self.sources_line_points = dict()
+        self.line_counters = dict()
+        for key, lines_params in self.sources_list.items():
+            lines = []
+            for line_params in lines_params:
+                # Линия задается двумя нормированными точками или словарем с полями coords и name
+                if isinstance(line_params, dict):
+                    line = Line(int(key), line_params['coords'], line_params.get('name'))
+                else:
+                    line = Line(int(key), line_params)
+                line.set_id(self.line_counter)
+                self.line_counter += 1
+                self.line_counters[line.get_line_id()] = _LineCounter(self.counter_window_secs)
+                lines.append(line)
+            self.sources_lines[int(key)] = lines
+            coords = np.array([line.get_coords() for line in lines], dtype=np.float64).reshape(-1, 2, 2)
+            self.sources_line_points[int(key)] = (coords[:, 0], coords[:, 1])
+        # Источники без линий не обрабатываются
+        self.sources = {source_id for source_id in self.sources if self.sources_lines[source_id]}
+
+    def get_params_impl(self):
+        params = dict()
+        params['sources'] = self.sources_list
+        params['counter_window_secs'] = self.counter_window_secs
+        return params
+
+    def reset_impl(self):
+        pass
+
+    def release_impl(self):
+        pass
+
+    def default(self):
+        pass
+
+    def init_impl(self):
+        pass
+
+    def stop(self):
+        self.run_flag = False
+        self.event.set()
+        self.queue_in.put((None, None))
+        if self.processing_thread.is_alive():
+            self.processing_thread.join()
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+import numpy as np
+
+
+class ObjectsDeltaReader:
+    """
+    Reads changes of objects of sources from ObjectsHandler snapshots since the previous read.
+
+    For every updated object the index of its first history element not seen by the reader is returned, so
+    a detector processes only new history points. Newly lost objects are reported once, the reader remembers
+    last max_reported_lost of them in case the snapshot chain is cut and the handler reports all objects again.
+    """
+
+    def __init__(self, objects_handler, max_reported_lost: int = 1000):
+        self.obj_handler = objects_handler
+        self.max_reported_lost = max_reported_lost
+        self.versions = dict()  # Айди источника: последняя прочитанная версия снимка
+        self.last_frame_ids = dict()  # Айди объекта: айди кадра последней прочитанной точки истории
+        self.reported_lost = OrderedDict()
+
+    def read(self, source_id) -> tuple[list, list]:
+        """
+        :return: list of (object, first new history index) of updated active objects and the same list
+         of newly lost objects
+        """
+        snapshot, updated_ids, lost_ids = self.obj_handler.get_changes(source_id, self.versions.get(source_id, 0))
+        if snapshot is None:
+            return [], []
+        self.versions[source_id] = snapshot.version
+
+        updated = []
+        if updated_ids:
+            for obj in snapshot.active:
+                if obj.object_id in updated_ids:
+                    first_idx = self._get_first_new_idx(obj)
+                    if first_idx < len(obj.history):
+                        updated.append((obj, first_idx))
+        lost = []
+        lost_ids = {object_id for object_id in lost_ids if object_id not in self.reported_lost}
+        if lost_ids:
+            for obj in snapshot.lost:
+                if obj.object_id in lost_ids:
+                    lost.append((obj, self._get_first_new_idx(obj)))
+                    self.last_frame_ids.pop(obj.object_id, None)
+                    self.reported_lost[obj.object_id] = None
+            while len(self.reported_lost) > self.max_reported_lost:
+                self.reported_lost.popitem(last=False)
+        return updated, lost
+
+    def _get_first_new_idx(self, obj) -> int:
+        frame_ids = obj.history.frame_ids
+        last_frame_id = self.last_frame_ids.get(obj.object_id)
+        if len(frame_ids):
+            self.last_frame_ids[obj.object_id] = int(frame_ids[-1])
+        if last_frame_id is None:
+            return 0
+        # Айди кадров в истории возрастают
+        return int(np.searchsorted(frame_ids, last_frame_id, side='right'))
@@ -0,0 +1,180 @@
+import numpy as np
+from .zone import Zone, ZoneForm
+
+
+class ZoneEngine:
+    """
+    Membership of points in all zones of one source.
+
+    Zones are converted to pixel space once per frame resolution: rectangles to bounds, polygons to edge arrays
+    padded to the same number of edges with degenerate edges that are never crossed. contains() evaluates all
+    points against all zones in one numpy call and returns points x zones boolean matrix, columns follow
+    the order of zones. The engine is immutable, a new one is created when the zones of the source change.
+
+    If grid_size is set, the frame is divided into grid_size x grid_size cells and every cell keeps the zones whose
+    bounding boxes overlap it. A point is then tested only against the zones of its cell, first by the bounding box
+    and then, for polygons, by ray-casting, so the cost grows with the number of points rather than points x zones.
+    """
+    block_elements = 16384
+
+    def __init__(self, zones: list[Zone], grid_size: int | None = None):
+        self.zones = list(zones)
+        self.zone_ids = [zone.get_zone_id() for zone in self.zones]
+        self._columns = {zone_id: column for column, zone_id in enumerate(self.zone_ids)}
+        self._pixel_zones: dict[tuple[int, int], tuple] = dict()
+        self.grid_size = grid_size if grid_size and grid_size > 0 else None
+        self._grid = self._build_grid() if self.grid_size and self.zones else None
+
+    def __len__(self):
+        return len(self.zones)
+
+    def get_column(self, zone_id) -> int:
+        return self._columns[zone_id]
+
+    def contains(self, points: np.ndarray, img_width: int, img_height: int) -> np.ndarray:
+        """
+        :param points: N x 2 points in pixels
+        :return: N x Z boolean matrix, True if the point is inside the zone
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        result = np.zeros((len(points), len(self.zones)), dtype=bool)
+        if len(points) == 0 or not self.zones:
+            return result
+
+        if self._grid is not None:
+            self._contains_grid(points, img_width, img_height, result)
+            return result
+
+        rect_columns, rect_bounds, poly_columns, edges, _, _ = self._get_pixel_zones(img_width, img_height)
+        x_obj = points[:, 0:1]
+        y_obj = points[:, 1:2]
+        if len(rect_columns):
+            x_min, x_max, y_min, y_max = rect_bounds.T
+            result[:, rect_columns] = (x_min <= x_obj) & (x_obj <= x_max) & (y_min <= y_obj) & (y_obj <= y_max)
+        if len(poly_columns):
+            # Ray-casting для всех точек, зон и ребер сразу: N x Z x E, точки берутся блоками,
+            # чтобы промежуточные массивы помещались в кэш процессора
+            x1, y1, y2, inv_slope = edges
+            block_size = max(1, ZoneEngine.block_elements // x1.size)
+            for begin in range(0, len(points), block_size):
+                block_x = x_obj[begin:begin + block_size, :, np.newaxis]
+                block_y = y_obj[begin:begin + block_size, :, np.newaxis]
+                crosses = (block_y < y1) != (block_y < y2)
+                with np.errstate(invalid='ignore'):
+                    crosses &= block_x < x1 + (block_y - y1) * inv_slope
+                result[begin:begin + block_size, poly_columns] = np.count_nonzero(crosses, axis=2) % 2 == 1
+        return result
+
+    def _contains_grid(self, points: np.ndarray, img_width: int, img_height: int, result: np.ndarray):
+        _, _, _, edges, bounds, poly_rows = self._get_pixel_zones(img_width, img_height)
+        cell_offsets, cell_columns = self._grid
+        grid_size = self.grid_size
+        cells_x = np.clip(np.floor(points[:, 0] / img_width * grid_size), 0, grid_size - 1).astype(np.int64)
+        cells_y = np.clip(np.floor(points[:, 1] / img_height * grid_size), 0, grid_size - 1).astype(np.int64)
+        cells = cells_y * grid_size + cells_x
+
+        # Пары (точка, зона ячейки точки): для каждой точки перебираются только зоны ее ячейки
+        begins = cell_offsets[cells]
+        counts = cell_offsets[cells + 1] - begins
+        num_pairs = int(counts.sum())
+        if num_pairs == 0:
+            return
+        pair_points = np.repeat(np.arange(len(points)), counts)
+        pair_positions = np.arange(num_pairs) - np.repeat(np.cumsum(counts) - counts - begins, counts)
+        pair_columns = cell_columns[pair_positions]
+
+        x_obj = points[pair_points, 0]
+        y_obj = points[pair_points, 1]
+        pair_bounds = bounds[pair_columns]
+        inside = ((pair_bounds[:, 0] <= x_obj) & (x_obj <= pair_bounds[:, 1]) &
+                  (pair_bounds[:, 2] <= y_obj) & (y_obj <= pair_bounds[:, 3]))
+        # Для прямоугольников проверки рамки достаточно, полигоны проверяются ray-casting внутри своей рамки
+        pair_rows = poly_rows[pair_columns]
+        poly_pairs = np.flatnonzero(inside & (pair_rows >= 0))
+        if len(poly_pairs):
+            x1, y1, y2, inv_slope = edges
+            block_size = max(1, ZoneEngine.block_elements // max(1, x1.shape[1]))
+            for begin in range(0, len(poly_pairs), block_size):
+                block = poly_pairs[begin:begin + block_size]
+                rows = pair_rows[block]
+                block_x = x_obj[block, np.newaxis]
+                block_y = y_obj[block, np.newaxis]
+                crosses = (block_y < y1[rows]) != (block_y < y2[rows])
+                with np.errstate(invalid='ignore'):
+                    crosses &= block_x < x1[rows] + (block_y - y1[rows]) * inv_slope[rows]
+                inside[block] = np.count_nonzero(crosses, axis=1) % 2 == 1
+        result[pair_points[inside], pair_columns[inside]] = True
+
+    def _build_grid(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Zones of cells in CSR form: zones of the cell c are cell_columns[cell_offsets[c]:cell_offsets[c + 1]]
+        """
+        grid_size = self.grid_size
+        # Рамки расширяются на небольшую величину, чтобы точки на границе ячейки не терялись из-за округления
+        eps = 1e-9
+        cells_zones = [[] for _ in range(grid_size * grid_size)]
+        for column, zone in enumerate(self.zones):
+            coords = np.asarray(zone.get_coords(), dtype=np.float64).reshape(-1, 2)
+            if zone.get_zone_form() == ZoneForm.Rectangle:
+                x_min, x_max, y_min, y_max = coords[0][0], coords[1][0], coords[0][1], coords[2][1]
+            else:
+                x_min, y_min = coords.min(axis=0)
+                x_max, y_max = coords.max(axis=0)
+            if x_min > x_max or y_min > y_max:
+                continue
+            first_x, last_x = np.clip(np.floor(np.array((x_min - eps, x_max + eps)) * grid_size), 0, grid_size - 1)
+            first_y, last_y = np.clip(np.floor(np.array((y_min - eps, y_max + eps)) * grid_size), 0, grid_size - 1)
+            for cell_y in range(int(first_y), int(last_y) + 1):
+                for cell_x in range(int(first_x), int(last_x) + 1):
+                    cells_zones[cell_y * grid_size + cell_x].append(column)
+        cell_offsets = np.zeros(len(cells_zones) + 1, dtype=np.int64)
+        cell_offsets[1:] = np.cumsum([len(columns) for columns in cells_zones])
+        cell_columns = np.fromiter((column for columns in cells_zones for column in columns),
+                                   dtype=np.int64, count=int(cell_offsets[-1]))
+        return cell_offsets, cell_columns
+
+    def _get_pixel_zones(self, img_width: int, img_height: int) -> tuple:
+        key = (img_width, img_height)
+        pixel_zones = self._pixel_zones.get(key)
+        if pixel_zones is None:
+            pixel_zones = self._pixel_zones[key] = self._build_pixel_zones(img_width, img_height)
+        return pixel_zones
+
+    def _build_pixel_zones(self, img_width: int, img_height: int) -> tuple:
+        rect_columns = []
+        rect_bounds = []
+        poly_columns = []
+        polygons = []
+        # Рамки всех зон и номера полигонов зон для проверки по сетке, у зон без формы рамка пустая
+        bounds = np.tile((np.inf, -np.inf, np.inf, -np.inf), (len(self.zones), 1))
+        poly_rows = np.full(len(self.zones), -1, dtype=np.int64)
+        for column, zone in enumerate(self.zones):
+            coords = np.asarray(zone.get_coords(), dtype=np.float64).reshape(-1, 2) * (img_width, img_height)
+            if zone.get_zone_form() == ZoneForm.Rectangle:
+                rect_columns.append(column)
+                rect_bounds.append((coords[0][0], coords[1][0], coords[0][1], coords[2][1]))
+                bounds[column] = rect_bounds[-1]
+            elif zone.get_zone_form() == ZoneForm.Polygon:
+                poly_columns.append(column)
+                poly_rows[column] = len(polygons)
+                polygons.append(coords)
+                bounds[column] = (coords[:, 0].min(), coords[:, 0].max(), coords[:, 1].min(), coords[:, 1].max())
+
+        num_edges = max((len(polygon) for polygon in polygons), default=0)
+        # Дополнительные ребра вырожденные (y1 == y2), луч их никогда не пересекает
+        x1 = np.zeros((len(polygons), num_edges), dtype=np.float64)
+        y1 = np.zeros_like(x1)
+        x2 = np.zeros_like(x1)
+        y2 = np.zeros_like(x1)
+        for idx, polygon in enumerate(polygons):
+            num = len(polygon)
+            x1[idx, :num] = polygon[:, 0]
+            y1[idx, :num] = polygon[:, 1]
+            x2[idx, :num] = np.roll(polygon[:, 0], -1)
+            y2[idx, :num] = np.roll(polygon[:, 1], -1)
+        # Обратный наклон ребер считается один раз, для горизонтальных ребер он не используется
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_slope = (x2 - x1) / (y2 - y1)
+        edges = (x1, y1, y2, inv_slope)
+        return (np.asarray(rect_columns, dtype=np.int64), np.asarray(rect_bounds, dtype=np.float64).reshape(-1, 4),
+                np.asarray(poly_columns, dtype=np.int64), edges, bounds, poly_rows)
@@ -1,14 +1,53 @@
 import datetime
-import time
 from threading import Lock, Event
 from .event_fov import FieldOfViewEvent
 from .events_detector import EventsDetector
 from datetime import datetime
 from .zone import Zone, ZoneForm
 from ..utils import threading_events
+from ..utils.frame_cache import FrameCache, get_frame_cache
 from queue import Queue
 from .event_zone import ZoneEvent
+from .zone_engine import ZoneEngine
+from .objects_delta import ObjectsDeltaReader
 import math
+import numpy as np
+
+
+class _ZoneState:
+    """
+    State of an object relative to a zone. Outside the zone candidate is the first point inside the zone,
+    the object enters when it stays in the zone for event_threshold. Inside the zone candidate is the first point
+    outside the zone, the object leaves when it doesn't return for longer than zone_left_threshold.
+    The frame of the candidate is held in the candidate frames cache of the detector until it is moved to
+    the shared FrameCache as the frame of an event or is discarded
+    """
+    __slots__ = ('is_inside', 'candidate', 'candidate_frame', 'candidate_time', 'last_in_zone_time')
+
+    def __init__(self):
+        self.is_inside = False
+        self.candidate = None
+        self.candidate_frame = None
+        self.candidate_time = None
+        self.last_in_zone_time = None
+
+    def set_candidate(self, obj, idx: int, time_stamp: float, candidate_frames: FrameCache):
+        self.candidate = obj.history[idx]
+        # Рамка события берется из точки-кандидата, поэтому нужен кадр именно этой точки, а не последний кадр объекта
+        self.candidate_frame = candidate_frames.acquire_history_frame(obj, self.candidate)
+        self.candidate_time = time_stamp
+
+    def take_candidate(self, candidate_frames: FrameCache) -> tuple:
+        """:return: candidate and its frame acquired in the shared FrameCache, the frame is passed to the caller"""
+        image = candidate_frames.get(self.candidate_frame)
+        candidate = self.candidate, get_frame_cache().acquire(image)
+        self.discard_candidate(candidate_frames)
+        return candidate
+
+    def discard_candidate(self, candidate_frames: FrameCache):
+        candidate_frames.release(self.candidate_frame)
+        self.candidate = None
+        self.candidate_frame = None
 
 
 class ZoneEventsDetector(EventsDetector):
@@ -17,9 +56,10 @@ class ZoneEventsDetector(EventsDetector):
         self.sources = set()
         self.sources_list = dict()
         self.sources_zones = {}  # Айди источника: список зон
+        self.zone_engines = {}  # Айди источника: ZoneEngine для зон источника
         self.zone_id_people = {}
-        self.left_frame_id = {}  # Для отслеживания в истории айди кадров, на которых объект вышел из зоны
-        self.entered_frame_id = {}  # Для отслеживания в истории айди кадров, на которых объект зашел в зону
+        self.obj_zone_states = {}  # Айди объекта: {айди зоны: _ZoneState}
+        self.objects_reader = ObjectsDeltaReader(objects_handler)
         self.zones = None
         self.new_zones = Queue()
         self.deleted_zones = Queue()
@@ -27,6 +67,11 @@ class ZoneEventsDetector(EventsDetector):
         self.zone_counter = 0
         self.event_threshold = 0
         self.zone_left_threshold = 0
+        self.zone_grid_size = None  # Размер сетки индекса зон, None - каждая точка проверяется по всем зонам источника
+        # Кадры точек-кандидатов входа и выхода хранятся отдельно от кадров событий, поэтому число объектов
+        # у зон не вытесняет кадры событий, ожидающих сохранения
+        self.candidate_frames_size = 128
+        self.candidate_frames = FrameCache(self.candidate_frames_size)
 
         self.obj_ids_zone = dict()  # Словарь для хранения айди активных объектов
         threading_events.subscribe('new zone', self.add_zone)
@@ -43,231 +88,114 @@ class ZoneEventsDetector(EventsDetector):
 
     def process(self):
         while self.run_flag:
-            time.sleep(0.01)
             self.event.wait()
             if not self.run_flag:
                 break
-            events = []
-            objects = []
-            lost_objects = []
-            for source_id in self.sources:
-                objects.append((source_id, self.obj_handler.get('active', source_id)))
-                lost_objects.append((source_id, self.obj_handler.get('lost', source_id)))
-
+            self.event.clear()
             self._update_zones()
 
-            for source_id, source_objects in objects:  # Проходим по объектам от каждого источника в отдельности
-                if source_id not in self.sources or not source_objects.objects:
-                    continue
-
-                zones = self.sources_zones[source_id]
-                timestamp = datetime.now()
-                img_height, img_width, _ = source_objects.objects[0].last_image.image.shape
-                for cur_zone in zones:
-                    for obj in source_objects.objects:
-                        timestamp = datetime.now()
-                        # Если объект ранее не появлялся в зоне
-                        if (obj.object_id not in self.obj_ids_zone or
-                                cur_zone.get_zone_id() not in self.obj_ids_zone[obj.object_id]):
-                            # Находим в истории объекта момент попадания в зону
-                            zone_id = cur_zone.get_zone_id()
-                            idx = self._check_event_in_history(obj, cur_zone, img_width, img_height)
-                            if idx == -1:
-                                continue
-                            hist_obj = obj.history[idx]
-                            # Если айди кадра нового попадания в зону меньше айди выхода из этой зоны в первый раз, пропускаем
-                            if (hist_obj.object_id in self.left_frame_id[source_id] and
-                                    zone_id in self.left_frame_id[source_id][hist_obj.object_id] and
-                                    hist_obj.frame_id <= self.left_frame_id[source_id][hist_obj.object_id][zone_id]):
-                                continue
-                            # Проверяем, находится ли объект в зоне дольше указанного времени
-                            if not self._is_threshold_passed(idx, obj, cur_zone, img_width, img_height):
-                                continue
-                            if obj.object_id not in self.entered_frame_id[source_id]:
-                                self.entered_frame_id[source_id][obj.object_id] = {}
-                            self.entered_frame_id[source_id][obj.object_id][zone_id] = hist_obj.frame_id
-                            if hist_obj.object_id not in self.obj_ids_zone:
-                                self.obj_ids_zone[hist_obj.object_id] = {}
-                            self.obj_ids_zone[hist_obj.object_id][zone_id] = cur_zone
-                            event = ZoneEvent(hist_obj.time_stamp, 'Alarm', hist_obj, cur_zone)
-                            self.zone_id_people[zone_id] += 1
-                            # print(f'New event: {obj.last_image.frame_id}, Event: {event}')
-                            events.append(event)
-                        else:
-                            # Иначе проверяем, остался ли объект в зоне, завершаем события
-                            zone = self.obj_ids_zone[obj.object_id][cur_zone.get_zone_id()]
-                            zone_id = zone.get_zone_id()
-                            # Находим в истории момент выхода из зоны
-                            idx = self._check_finished_event_in_history(obj, zone, img_width, img_height)
-                            if idx == -1:
-                                continue
-                            hist_obj = obj.history[idx]
-                            is_returned, return_idx = self._get_zone_return_idx(idx, obj, zone, img_width, img_height)
-                            if is_returned:
-                                # Если объект вернулся, то изменяем кадр его попадания в зону на более поздний
-                                # для облегчения поиска дальнейшего выхода из зоны
-                                if return_idx != -1:
-                                    self.entered_frame_id[source_id][obj.object_id][zone_id] = obj.history[return_idx].frame_id
-                                continue
-                            event = ZoneEvent(hist_obj.time_stamp, 'Alarm', hist_obj, zone, is_finished=True)
-                            if obj.object_id not in self.left_frame_id[source_id]:
-                                self.left_frame_id[source_id][obj.object_id] = {}
-                            self.left_frame_id[source_id][obj.object_id][zone_id] = hist_obj.frame_id
-                            self.zone_id_people[zone_id] -= 1
-                            del self.entered_frame_id[source_id][obj.object_id][zone_id]
-                            del self.obj_ids_zone[obj.object_id][zone_id]
-                            # print(f'Finished event: {obj.last_image.frame_id}, Event: {event}')
-                            events.append(event)
-
-            for source_id, source_objects in lost_objects:  # Определяем завершившиеся события среди потерянных объектов
-                if source_id not in self.sources or not source_objects.objects:
-                    continue
-                for obj in source_objects.objects:
-                    if obj.object_id in self.obj_ids_zone:  # Если объект был в запрещенной зоне
-                        timestamp = datetime.now()
-                        for zone_id in self.obj_ids_zone[obj.object_id]:
-                            zone = self.obj_ids_zone[obj.object_id][zone_id]
-                            event = ZoneEvent(timestamp, 'Alarm', obj, zone, is_finished=True)
-                            self.zone_id_people[zone.get_zone_id()] -= 1
-                            # print(f'Finished event: {obj.last_image.frame_id}, Event: {event}')
-                            events.append(event)
-                        del self.obj_ids_zone[obj.object_id]
-                    # После того как объект был потерян
-                    if obj.object_id in self.left_frame_id[source_id]:
-                        del self.left_frame_id[source_id][obj.object_id]
-                    if obj.object_id in self.entered_frame_id[source_id]:
-                        del self.entered_frame_id[source_id][obj.object_id]
+            events = []
+            for source_id in self.sources:
+                # Обрабатываются только новые точки истории обновленных объектов и новые потерянные объекты
+                updated, lost = self.objects_reader.read(source_id)
+                if updated and self.sources_zones.get(source_id):
+                    self._process_updated(source_id, updated, events)
+                self._process_lost(lost, events)
             if events:
-                self.queue_out.put(events)
-            self.event.clear()
+                self._put_events(events)
 
-    def _check_event_in_history(self, obj, zone, img_width, img_height) -> int:
-        history = obj.history
-        end = len(history) - 1
-        beg = 0
-        idx = None
-        while beg <= end:
-            mid = (beg + end) // 2
-            history_obj = history[mid]
-            # print(history_obj.track.bounding_box)
-            box = history_obj.track.bounding_box  # Определяем присутствие в зоне по средней точке нижней границы рамки
-            box_bottom_mid = ((box[0] + box[2]) / 2, box[3])
-            if self._is_obj_in_zone(box_bottom_mid, zone, img_width, img_height):
-                idx = mid
-                end = mid - 1
-            else:
-                beg = mid + 1
-        if idx is None:
-            return -1
-        else:
-            return idx
+    def _process_updated(self, source_id, updated, events):
+        engine = self.zone_engines[source_id]
+        img_height, img_width, _ = updated[0][0].last_image.image.shape
+        objs_in_zones = self._get_objects_membership(source_id, updated, img_width, img_height)
+        for (obj, first_idx), obj_in_zones in zip(updated, objs_in_zones):
+            states = self.obj_zone_states.setdefault(obj.object_id, {})
+            time_stamps = obj.history.time_stamps[first_idx:]
+            columns = set(np.flatnonzero(obj_in_zones.any(axis=0)).tolist())
+            columns.update(engine.get_column(zone_id) for zone_id in states if zone_id in engine.zone_ids)
+            for column in sorted(columns):
+                zone = engine.zones[column]
+                state = states.setdefault(zone.get_zone_id(), _ZoneState())
+                for i, in_zone in enumerate(obj_in_zones[:, column].tolist()):
+                    event = self._update_zone_state(state, obj, zone, first_idx + i, in_zone, float(time_stamps[i]))
+                    if event is not None:
+                        events.append(event)
 
-    def _is_threshold_passed(self, beg_idx, obj, zone, img_width, img_height) -> int:
-        history = obj.history
-        beg_obj = history[beg_idx]
-        end = len(history) - 1
-        beg = beg_idx
-        while beg <= end:
-            mid = (beg + end) // 2
-            history_obj = history[mid]
-            # print(history_obj.track.bounding_box)
-            box = history_obj.track.bounding_box  # Определяем присутствие в зоне по средней точке нижней границы рамки
-            box_bottom_mid = ((box[0] + box[2]) / 2, box[3])
-            if (history_obj.time_stamp - beg_obj.time_stamp).total_seconds() >= self.event_threshold:
-                if self._is_obj_in_zone(box_bottom_mid, zone, img_width, img_height):
-                    return True
-                else:
-                    end = mid - 1
-            else:
-                beg = mid + 1
-        return False
+    def _update_zone_state(self, state: _ZoneState, obj, zone, idx, in_zone: bool, time_stamp: float):
+        zone_id = zone.get_zone_id()
+        if state.is_inside:
+            if state.candidate is not None and time_stamp - state.candidate_time > self.zone_left_threshold:
+                # Объект не вернулся в зону за zone_left_threshold, выход из зоны в первой точке вне зоны
+                hist_obj, frame = state.take_candidate(self.candidate_frames)
+                state.is_inside = False
+                self.zone_id_people[zone_id] -= 1
+                del self.obj_ids_zone[obj.object_id][zone_id]
+                event = ZoneEvent(hist_obj.time_stamp, 'Alarm', hist_obj, zone, is_finished=True, frame=frame)
+                if in_zone:
+                    self._update_zone_state(state, obj, zone, idx, in_zone, time_stamp)
+                return event
+            if not in_zone and state.candidate is None:
+                state.set_candidate(obj, idx, time_stamp, self.candidate_frames)
+            elif in_zone:
+                state.discard_candidate(self.candidate_frames)
+            return None
 
-    def _check_finished_event_in_history(self, obj, zone, img_width, img_height) -> int:
-        history = obj.history
-        end = len(history) - 1
-        beg = 0
-        idx = None
-        while beg <= end:
-            mid = (beg + end) // 2
-            history_obj = history[mid]
-            box = history_obj.track.bounding_box  # Определяем присутствие в зоне по средней точке нижней границы рамки
-            box_bottom_mid = ((box[0] + box[2]) / 2, box[3])
-            if history_obj.frame_id > self.entered_frame_id[obj.source_id][obj.object_id][zone.get_zone_id()]:
-                if not self._is_obj_in_zone(box_bottom_mid, zone, img_width, img_height):
-                    idx = mid
-                    end = mid - 1
-                else:
-                    beg = mid + 1
-            else:
-                beg = mid + 1
-        if idx is None:
-            return -1
-        else:
-            return idx
+        if not in_zone:
+            # Точка входа забывается, если объект покинул зону дольше чем на zone_left_threshold
+            if state.candidate is not None and time_stamp - state.last_in_zone_time > self.zone_left_threshold:
+                state.discard_candidate(self.candidate_frames)
+            return None
+        if state.candidate is None:
+            state.set_candidate(obj, idx, time_stamp, self.candidate_frames)
+        state.last_in_zone_time = time_stamp
+        if time_stamp - state.candidate_time < self.event_threshold:
+            return None
+        # Объект находится в зоне дольше event_threshold, вход в зону в первой точке в зоне
+        hist_obj, frame = state.take_candidate(self.candidate_frames)
+        state.is_inside = True
+        self.zone_id_people[zone_id] += 1
+        self.obj_ids_zone.setdefault(obj.object_id, {})[zone_id] = zone
+        return ZoneEvent(hist_obj.time_stamp, 'Alarm', hist_obj, zone, frame=frame)
 
-    def _get_zone_return_idx(self, beg_idx, obj, zone, img_width, img_height) -> tuple[bool, int]:
-        history = obj.history
-        beg_obj = history[beg_idx]
-        end = len(history) - 1
-        beg = beg_idx
-        idx = None
-        is_returned = True
-        while beg <= end:
-            mid = (beg + end) // 2
-            history_obj = history[mid]
-            box = history_obj.track.bounding_box  # Определяем присутствие в зоне по средней точке нижней границы рамки
-            box_bottom_mid = ((box[0] + box[2]) / 2, box[3])
-            if (history_obj.time_stamp - beg_obj.time_stamp).total_seconds() <= self.zone_left_threshold:
-                if self._is_obj_in_zone(box_bottom_mid, zone, img_width, img_height):
-                    idx = mid
-                    end = mid - 1
-                else:
-                    beg = mid + 1
-            else:
-                end = mid - 1
-        if idx is None:
-            last_hist_obj = history[-1]
-            # Если не нашли индекс возвращения в зону, но порог потери еще не превышен
-            if (last_hist_obj.time_stamp - beg_obj.time_stamp).total_seconds() <= self.zone_left_threshold:
-                return is_returned, -1
-            else:
-                is_returned = False
-                return is_returned, -1
-        return is_returned, idx
+    def _process_lost(self, lost, events):
+        frame_cache = get_frame_cache()
+        for obj, _ in lost:
+            for state in self.obj_zone_states.pop(obj.object_id, {}).values():
+                state.discard_candidate(self.candidate_frames)
+            if obj.object_id not in self.obj_ids_zone:
+                continue
+            # Если объект был в зоне, завершаем события
+            timestamp = datetime.now()
+            for zone_id, zone in self.obj_ids_zone[obj.object_id].items():
+                event = ZoneEvent(timestamp, 'Alarm', obj, zone, is_finished=True,
+                                  frame=frame_cache.acquire(obj.last_image))
+                self.zone_id_people[zone.get_zone_id()] -= 1
+                events.append(event)
+            del self.obj_ids_zone[obj.object_id]
 
-    def _is_obj_in_zone(self, box_bottom_mid, zone, img_width, img_height):
-        zone_coords_norm = zone.get_coords()
-        zone_coords = [(point[0] * img_width, point[1] * img_height) for point in zone_coords_norm]
-        if zone.get_zone_form() == ZoneForm.Rectangle:
-            if (zone_coords[0][0] <= box_bottom_mid[0] <= zone_coords[1][0] and
-                    zone_coords[0][1] <= box_bottom_mid[1] <= zone_coords[2][1]):
-                return True
-        elif zone.get_zone_form() == ZoneForm.Polygon:
-            # Ray-casting algorithm для определения принадлежности точки полигону
-            # Еще раз добавляем первую точку для формирования ребер полигона
-            zone_coords.append((zone_coords_norm[0][0] * img_width, zone_coords_norm[0][1] * img_height))
-            x_obj, y_obj = box_bottom_mid[0], box_bottom_mid[1]
-            count = 0
-            for i in range(len(zone_coords) - 1):
-                (x1, y1), (x2, y2) = zone_coords[i], zone_coords[i + 1]  # Получаем ребро
-                if (y_obj < y1) != (y_obj < y2) and x_obj < x1 + ((y_obj - y1) / (y2 - y1)) * (x2 - x1):
-                    count += 1
-            if count % 2 == 1:
-                return True
-        return False
+    def _get_objects_membership(self, source_id, updated, img_width, img_height) -> list[np.ndarray]:
+        """
+        :param updated: list of (object, first new history index)
+        :return: for every object new points x zones boolean matrix of presence of the object in zones
+        """
+        # Присутствие в зоне определяется по средней точке нижней границы рамки
+        points = [obj.history.bottom_centers()[first_idx:] for obj, first_idx in updated]
+        membership = self.zone_engines[source_id].contains(np.concatenate(points), img_width, img_height)
+        offsets = np.cumsum([len(obj_points) for obj_points in points])[:-1]
+        return np.split(membership, offsets)
 
     def _update_zones(self):
+        changed_sources = set()
         while not self.new_zones.empty():
             zone = self.new_zones.get()
             src_id = zone.get_src_id()
+            changed_sources.add(src_id)
             zone.set_id(self.zone_counter)
             self.zone_id_people[self.zone_counter] = 0
             self.zone_counter += 1
             if src_id not in self.sources:
                 self.sources.add(src_id)
                 self.sources_zones[src_id] = []
-                self.left_frame_id[src_id] = {}
-                self.entered_frame_id[src_id] = {}
             self.sources_zones[src_id].append(zone)
 
         while not self.deleted_zones.empty():
@@ -276,6 +204,11 @@ class ZoneEventsDetector(EventsDetector):
             idx = self.sources_zones[src_id].index(zone)
             self.zone_id_people[self.sources_zones[src_id][idx].get_zone_id()] = 0
             del self.sources_zones[src_id][idx]
+            changed_sources.add(src_id)
+
+        # Пиксельные координаты зон и сетка индекса кэшируются в ZoneEngine, при изменении зон он создается заново
+        for src_id in changed_sources:
+            self.zone_engines[src_id] = ZoneEngine(self.sources_zones[src_id], self.zone_grid_size)
 
     def update(self):
         if not self.event.is_set():
@@ -290,20 +223,28 @@ class ZoneEventsDetector(EventsDetector):
     def set_params_impl(self):
         self.sources_list = self.params.get('sources', dict())
         self.sources = {int(key) for key in self.sources_list.keys()}
-        self.left_frame_id = {source: {} for source in self.sources}
-        self.entered_frame_id = {source: {} for source in self.sources}
         self.event_threshold = self.params.get('event_threshold', self.event_threshold)
         self.zone_left_threshold = self.params.get('zone_left_threshold', self.zone_left_threshold)
+        self.zone_grid_size = self.params.get('zone_grid_size', self.zone_grid_size)
+        self.candidate_frames_size = self.params.get('candidate_frames_size', self.candidate_frames_size)
+        self.candidate_frames.set_max_frames(self.candidate_frames_size)
 
         self.sources_zones = {int(key): [] for key in self.sources}
+        self.zone_engines = {int(key): ZoneEngine([]) for key in self.sources}
 
     def get_params_impl(self):
         params = dict()
         params['sources'] = self.sources_list
         params['event_threshold'] = self.event_threshold
         params['zone_left_threshold'] = self.zone_left_threshold
+        params['zone_grid_size'] = self.zone_grid_size
+        params['candidate_frames_size'] = self.candidate_frames_size
         return params
 
+    def get_debug_info(self, debug_info: dict | None):
+        super().get_debug_info(debug_info)
+        debug_info['candidate_frames'] = self.candidate_frames.get_debug_info()
+
     def reset_impl(self):
         pass
 
@@ -9,6 +9,8 @@ from time import sleep
 
 
 class DetectionResult:
+    __slots__ = ('bounding_box', 'confidence', 'class_id', 'detection_data')
+
     def __init__(self):
         self.bounding_box = []
         self.confidence = 0.0
@@ -17,6 +19,8 @@ class DetectionResult:
 
 
 class DetectionResultList:
+    __slots__ = ('source_id', 'frame_id', 'time_stamp', 'detections')
+
     def __init__(self):
         self.source_id = None
         self.frame_id = None
@@ -1,7 +1,9 @@
 from typing import Dict, List, Tuple
 import datetime
+import time
 from time import sleep
 from collections import deque
+from queue import Empty
 
 import numpy as np
 from scipy.optimize import linear_sum_assignment
@@ -9,6 +11,8 @@ from shapely.geometry import box
 from shapely.ops import unary_union
 import scipy.spatial.distance as ssd
 from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 from sklearn.metrics.pairwise import cosine_similarity
 from ..object_tracker.trackers.basetrack import TrackState
 from ultralytics.trackers.bot_sort import BOTrack
@@ -20,6 +24,9 @@ from .object_multicam_tracking_base import TrackingResult
 from .object_multicam_tracking_base import TrackingResultList
 from .object_multicam_tracking_base import ObjectMultiCameraTrackingBase
 from .mctrack import MCTrack
+from .embedding_matrix import EmbeddingMatrix
+from .embedding_gallery import EmbeddingGallery
+from .frame_synchronizer import FrameSynchronizer
 from ..object_tracker.trackers.sctrack import SCTrack
 from dataclasses import dataclass
 from pympler import asizeof
@@ -34,11 +41,29 @@ class ObjectMultiCameraTracking(ObjectMultiCameraTrackingBase):
         self.num_cameras = 0
         self.encoders = None
         self.tracker = None
+        self.reid_gallery = dict()
+        self.reid_gallery["enable"] = True
+        self.reid_gallery["max_size"] = 10000
+        self.reid_gallery["max_age_secs"] = 600.0
+        self.reid_gallery["index_type"] = "flat"
+        self.reid_gallery["index_params"] = dict()
+        self.reid_gallery["archive_frames"] = 30
+        # Results of different cameras are joined by capture time
+        self.sync_tolerance_secs = 0.1
+        self.sync_deadline_secs = 0.5
+        self.synchronizer = None
 
     def init_impl(self, **kwargs):
         sources_ids = self.params.get("source_ids", [])
         encoders = kwargs.get('encoders', None)
-        self.tracker = MultiCameraTracker(len(sources_ids), encoders)
+        gallery = None
+        if self.reid_gallery.get("enable", False):
+            gallery = EmbeddingGallery(max_size=self.reid_gallery.get("max_size", 10000),
+                                       max_age_secs=self.reid_gallery.get("max_age_secs", 600.0),
+                                       index_type=self.reid_gallery.get("index_type", "flat"),
+                                       index_params=self.reid_gallery.get("index_params", None))
+        self.tracker = MultiCameraTracker(len(sources_ids), encoders, gallery=gallery,
+                                          gallery_archive_frames=self.reid_gallery.get("archive_frames", 30))
         return True
 
     def release_impl(self):
@@ -49,47 +74,63 @@ class ObjectMultiCameraTracking(ObjectMultiCameraTrackingBase):
 
     def set_params_impl(self):
         super().set_params_impl()
+        self.reid_gallery.update(self.params.get('reid_gallery', {}))
+        self.sync_tolerance_secs = self.params.get('sync_tolerance_secs', self.sync_tolerance_secs)
+        self.sync_deadline_secs = self.params.get('sync_deadline_secs', self.sync_deadline_secs)
 
     def get_params_impl(self):
         params = super().get_params_impl()
+        params['reid_gallery'] = self.reid_gallery
+        params['sync_tolerance_secs'] = self.sync_tolerance_secs
+        params['sync_deadline_secs'] = self.sync_deadline_secs
         return params
 
     def default(self):
         self.params.clear()
 
     def _process_impl(self):
+        synchronizer = FrameSynchronizer(self.source_ids, self.sync_tolerance_secs, self.sync_deadline_secs)
+        self.synchronizer = synchronizer
         while self.run_flag:
-            sleep(0.01)
-            if self.queue_in.qsize() <= len(self.source_ids):
-                continue
-
-            sc_track_results = []
-            for i in range(0,len(self.source_ids)):
-                sc_track_results.append(self.queue_in.get())
-            if sc_track_results is None:
-                continue
-
-            if self.enable == False:
-                for track_info in sc_track_results:
-                    self.queue_out.put(track_info)
-                continue
-
-            sc_tracks: List[List[BOTrack]] = []
-            images = []
-            track_infos = []
-            for results in sc_track_results:
+            deadline = synchronizer.get_next_deadline()
+            timeout = max(deadline - time.monotonic(), 0.0) if deadline is not None else 0.1
+            try:
+                results = self.queue_in.get(timeout=min(timeout, 0.1))
+            except Empty:
+                results = None
+
+            if results is not None:
                 track_info, image = results
-                images.append(image)
-                track_infos.append(track_info)
-                tracks = []
-                for t in track_info.tracks:
-                    tracks.append(t.tracking_data["track_object"])
-                sc_tracks.append(tracks)
-
-            mc_tracks = self.tracker.update(sc_tracks)
-            tracks_infos = self._create_tracks_info(track_infos, mc_tracks)
-            for track_info in zip(tracks_infos, images):
-                self.queue_out.put(track_info)
+                if self.enable == False or image.source_id not in synchronizer.pending:
+                    self.queue_out.put(results)
+                else:
+                    capture_time = image.time_stamp if image.time_stamp is not None else time.time()
+                    synchronizer.put(image.source_id, capture_time, results)
+
+            for group in synchronizer.pop_groups():
+                self._process_group(group)
+
+    def _process_group(self, group: Dict[int, tuple]):
+        # Camera index in multi-camera tracker is position of the source in source_ids
+        sc_tracks: List[List[BOTrack]] = []
+        track_infos = []
+        for source_id in self.source_ids:
+            track_info = group[source_id][0] if source_id in group else TrackingResultList()
+            track_infos.append(track_info)
+            sc_tracks.append([t.tracking_data["track_object"] for t in track_info.tracks])
+
+        mc_tracks = self.tracker.update(sc_tracks)
+        tracks_infos = self._create_tracks_info(track_infos, mc_tracks)
+        for source_id, track_info in zip(self.source_ids, tracks_infos):
+            if source_id in group:
+                self.queue_out.put((track_info, group[source_id][1]))
+
+    def get_debug_info(self, debug_info: dict | None):
+        super().get_debug_info(debug_info)
+        if debug_info is not None and self.synchronizer is not None:
+            debug_info['sync_pending'] = self.synchronizer.get_num_pending()
+            debug_info['sync_groups'] = self.synchronizer.num_groups
+            debug_info['sync_partial_groups'] = self.synchronizer.num_partial_groups
 
     def _parse_det_info(self, det_info: DetectionResultList) -> tuple:
         cam_id = det_info.source_id
@@ -127,17 +168,14 @@ class ObjectMultiCameraTracking(ObjectMultiCameraTrackingBase):
             mc_tracks: List['MCTrack']) -> List[TrackingResultList]:
         
         sc_tracks_by_cam = [list() for i in range(len(sc_track_results))]
+        src_tracks_by_id = [{t.track_id: t for t in results.tracks} for results in sc_track_results]
         for t in mc_tracks:
             global_id = t.global_track_id
             for cam_id, track in t.sc_tracks.items():
-                
-                track_id = track.track_id
-                src_track_number = [t.track_id for t in sc_track_results[cam_id].tracks].index(track_id)
-                
-                if src_track_number is None:
+                src_track = src_tracks_by_id[cam_id].get(track.track_id)
+                if src_track is None:
                     continue
 
-                src_track = sc_track_results[cam_id].tracks[src_track_number]
                 src_track.tracking_data['global_id'] = global_id
                 sc_tracks_by_cam[cam_id].append(src_track)
         
@@ -157,12 +195,19 @@ class MultiCameraTracker:
             exclude_overlap: bool = False,
             include_lost_tracks: bool = False,
             overlap_threshold: float = 0.5,
-            max_track_len: int = 50):
+            max_track_len: int = 50,
+            gallery: EmbeddingGallery | None = None,
+            gallery_search_k: int = 10,
+            gallery_archive_frames: int = 30):
         
         """
         :param num_cameras: Количество камер.
         :param encoder: Экстрактор признаков.
         :param clustering_threshold: Порог для иерархической кластеризации (0.7 по умолчанию).
+        :param gallery: Галерея признаков потерянных глобальных треков для повторной идентификации.
+            Если не задана, потерянные глобальные треки остаются в списке активных.
+        :param gallery_archive_frames: Глобальный трек переносится в галерею, когда все его треки камер удалены
+            или он не сопоставлен ни одному кластеру gallery_archive_frames кадров подряд.
         """
         self.num_cameras = num_cameras
         self.encoders = encoders
@@ -172,10 +217,18 @@ class MultiCameraTracker:
         self.max_track_length = max_track_len
         self.clustering_threshold = clustering_threshold
         self.include_lost_tracks = include_lost_tracks
+        self.gallery = gallery
+        self.gallery_search_k = gallery_search_k
+        self.gallery_archive_frames = gallery_archive_frames
 
         self.mct_tracks: List[MCTrack] = []
         self.next_global_id = 0
 
+        # Normalized embeddings of current single-camera tracks keyed by (cam_id, track_id)
+        self.embeddings = EmbeddingMatrix()
+        # Clustering results of connected components from the previous frame: members -> {key: label}
+        self._components_cache: Dict[frozenset, Dict[Tuple[int, int], int]] = {}
+
     def update(self, sct_tracks: List[List[SCTrack]]) -> List[MCTrack]:
         """
         Обновляет трекинг по всем камерам и возвращает треки с глобальными идентификаторами.
@@ -205,6 +258,7 @@ class MultiCameraTracker:
 
         # Обновляем глобальные треки
         self._update_global_tracks(mct_tracks)
+        self._archive_removed_global_tracks()
 
         activated_global_tracks = [x for x in self.mct_tracks if x.is_activated]
         
@@ -225,39 +279,35 @@ class MultiCameraTracker:
         return overlaps
     
     def _hierarchical_clustering(self, sct_tracks: List[List[BOTrack]]) -> List[MCTrack]:
-        # Извлеекаем признаки из треков
-        features = [[] for encoder in self.encoders]
+        # Обновляем матрицу признаков только для новых и изменившихся треков
         tracks = []
         cam_ids = []
+        keys = []
+        changed_keys = set()
         for cam_id, ts in enumerate(sct_tracks):
             for track in ts:
-                if track.smooth_feat is not None:
-                    for i in range(len(self.encoders)):
-                        features[i].append(track.smooth_feat[i])
+                if track.smooth_feat is None:
+                    continue
+                key = (cam_id, track.track_id)
+                if self.embeddings.update(key, track.smooth_feat):
+                    changed_keys.add(key)
                 tracks.append(track)
                 cam_ids.append(cam_id)
-        
-        if len(features) == 0 or len(features[0]) == 0:
+                keys.append(key)
+        self.embeddings.retain(keys)
+
+        if len(tracks) == 0:
+            self._components_cache = {}
             return []
-        
-        # Составляем матрицу расстояний
-        dists = []
-        for feats in features:
-            dist = self._create_distance_matrix(np.array(feats))
-            dists.append(dist)
 
-        distances = np.mean(dists, axis=0)
+        # Составляем матрицу расстояний одним матричным умножением
+        features = self.embeddings.get(keys)
+        distances = 1.0 - features @ features.T
         distances = self._fix_distance_matrix(distances, cam_ids)
         # LOGGER.debug(f"Hierchical clustering. Distance matrix:\n{distances}")
 
         # Иерархическая кластеризация
-        if len(distances) == 1:
-            cluster_labels = [0]
-        else:
-            dist_array = ssd.squareform(distances)
-            clustering = linkage(dist_array, method='average')
-            clustering = np.clip(clustering, 0, None)
-            cluster_labels = fcluster(clustering, t=self.clustering_threshold, criterion='distance')
+        cluster_labels = self._cluster(distances, keys, changed_keys)
         
         # Cгруппировать локальные треки по кластерам
         track_clusters = {}
@@ -274,25 +324,70 @@ class MultiCameraTracker:
         # LOGGER.debug(f"Found clusters:\n{[t.sc_tracks for t in mct_tracks]}")
 
         return mct_tracks
+
+    def _cluster(self, distances: np.ndarray, keys: List[Tuple[int, int]], changed_keys: set) -> np.ndarray:
+        """
+        Average linkage clustering cut at clustering_threshold, performed independently for each
+        connected component of the graph of pairs closer than the threshold. Such clusters never span
+        several components, so the result is the same as clustering all tracks at once, while
+        components without new or changed tracks reuse labels from the previous frame.
+        """
+        cluster_labels = np.zeros(len(keys), dtype=np.int64)
+        if len(keys) == 1:
+            self._components_cache = {}
+            return cluster_labels
+
+        adjacency = csr_matrix(distances <= self.clustering_threshold)
+        num_components, components = connected_components(adjacency, directed=False)
+
+        components_cache = {}
+        next_label = 0
+        for members in np.split(np.argsort(components, kind='stable'),
+                                np.cumsum(np.bincount(components, minlength=num_components))[:-1]):
+            member_keys = frozenset(keys[i] for i in members)
+            cached = self._components_cache.get(member_keys)
+            if len(members) == 1:
+                local_labels = [0]
+            elif cached is not None and member_keys.isdisjoint(changed_keys):
+                local_labels = [cached[keys[i]] for i in members]
+            else:
+                dist_array = ssd.squareform(distances[np.ix_(members, members)], checks=False)
+                clustering = linkage(dist_array, method='average')
+                clustering = np.clip(clustering, 0, None)
+                local_labels = fcluster(clustering, t=self.clustering_threshold, criterion='distance')
+            components_cache[member_keys] = {keys[i]: label for i, label in zip(members, local_labels)}
+
+            local_labels = np.asarray(local_labels, dtype=np.int64)
+            _, local_labels = np.unique(local_labels, return_inverse=True)
+            cluster_labels[members] = local_labels + next_label
+            next_label += local_labels.max() + 1
+
+        self._components_cache = components_cache
+        return cluster_labels
     
     def _update_global_tracks(self, mct_tracks: List[MCTrack]):
         mct_tracks, global_matches = self._assign_by_track_id(mct_tracks)
         mct_tracks, global_matches = self._assign_by_features(mct_tracks, global_matches)
 
+        matched_global_ids = set(global_matches)
+        for i, global_track in enumerate(self.mct_tracks):
+            global_track.frames_unmatched = 0 if i in matched_global_ids else global_track.frames_unmatched + 1
+
         self._clean_global_tracks(global_matches)
         self._init_new_global_tracks(mct_tracks)
 
 
     def _clean_global_tracks(self, global_matches: List[int]):
-        matched_sc_track_ids = []
+        global_matches = set(global_matches)
+        matched_sc_track_ids = set()
         for i, global_track in enumerate(self.mct_tracks):
             if i not in global_matches:
                 continue
 
-            matched_sc_track_ids += [
+            matched_sc_track_ids.update(
                 t.track_id for i, t in self.mct_tracks[i].sc_tracks.items()
                 if t.state == TrackState.Tracked
-            ]
+            )
 
         for i, global_track in enumerate(self.mct_tracks):
             
@@ -326,30 +421,29 @@ class MultiCameraTracker:
         ) -> Tuple[List[MCTrack], List[int]]:
         
         global_matches = []
-        mct_matches = []
+        mct_matches = set()
 
-        # Go through all tracks and find matches
-        for i, global_track in enumerate(self.mct_tracks):                    
-            global_track_ids = set((c, t.track_id) for c, t in global_track.sc_tracks.items())
-            
-            for j, mct_track in enumerate(mct_tracks):
-                if j in mct_matches:
-                    continue
+        # Global tracks indexed by the exact set of their single-camera tracks
+        global_tracks_by_ids = {}
+        for i, global_track in enumerate(self.mct_tracks):
+            global_track_ids = frozenset((c, t.track_id) for c, t in global_track.sc_tracks.items())
+            global_tracks_by_ids.setdefault(global_track_ids, i)
 
-                mct_track_ids = set((c, t.track_id) for c, t in mct_track.sc_tracks.items())
-                if mct_track_ids != global_track_ids:
-                    continue
-                
-                # Update global track
-                global_track.update(mct_track)
-                # LOGGER.debug(
-                #     f"Global track {global_track.global_track_id} "
-                #     f"was updated by track is with values:\n{mct_track.sc_tracks}"
-                # )
+        for j, mct_track in enumerate(mct_tracks):
+            mct_track_ids = frozenset((c, t.track_id) for c, t in mct_track.sc_tracks.items())
+            i = global_tracks_by_ids.pop(mct_track_ids, None)
+            if i is None:
+                continue
 
-                mct_matches.append(j)
-                global_matches.append(i)
-                break
+            # Update global track
+            self.mct_tracks[i].update(mct_track)
+            # LOGGER.debug(
+            #     f"Global track {self.mct_tracks[i].global_track_id} "
+            #     f"was updated by track is with values:\n{mct_track.sc_tracks}"
+            # )
+
+            mct_matches.add(j)
+            global_matches.append(i)
 
         unmatched_mct_tracks = [mct_tracks[i] for i in range(len(mct_tracks)) if i not in mct_matches]
         # LOGGER.debug(f"Assignment by id, unmatched tracks:\n{[t.sc_tracks for t in unmatched_mct_tracks]}")
@@ -358,7 +452,8 @@ class MultiCameraTracker:
     
     def _assign_by_features(self, mct_tracks: List[MCTrack], global_matches: List[int]) -> List[MCTrack]:
         
-        unmatched_global_ids = [i for i in range(len(self.mct_tracks)) if i not in global_matches]
+        matched_global_ids = set(global_matches)
+        unmatched_global_ids = [i for i in range(len(self.mct_tracks)) if i not in matched_global_ids]
         # LOGGER.debug(f"Assigning by features, unmatched_global_ids:\n{unmatched_global_ids}")
         if len(unmatched_global_ids) == 0 or len(mct_tracks) == 0:
             return mct_tracks, global_matches
@@ -399,16 +494,18 @@ class MultiCameraTracker:
             #     f"was updated by features is with values:\n{mct_tracks[j].sc_tracks}"
             # )
         
-        unmatched_mct_tracks = [mct_tracks[j] for j in range(len(mct_tracks)) if j not in col_ind]
+        assigned_mct_ids = set(col_ind.tolist())
+        unmatched_mct_tracks = [mct_tracks[j] for j in range(len(mct_tracks)) if j not in assigned_mct_ids]
         return unmatched_mct_tracks, global_matches
                 
     def _init_new_global_tracks(self, mct_tracks: List[MCTrack]):
+        new_mct_tracks = []
         used_sc_tracks = {}
         for global_track in self.mct_tracks:
             for c, t in global_track.sc_tracks.items():
                 if c not in used_sc_tracks:
-                    used_sc_tracks[c] = []
-                used_sc_tracks[c].append(t.track_id)
+                    used_sc_tracks[c] = set()
+                used_sc_tracks[c].add(t.track_id)
             
         for mct_track in mct_tracks:
             for c in list(mct_track.sc_tracks.keys()):
@@ -420,10 +517,59 @@ class MultiCameraTracker:
             if len(mct_track.sc_tracks) == 0:
                 continue
 
-            mct_track.activate()
+            new_mct_tracks.append(mct_track)
+
+        self._reidentify_lost_global_tracks(new_mct_tracks)
+        for mct_track in new_mct_tracks:
+            if not mct_track.is_activated:
+                mct_track.activate()
             # LOGGER.debug(f"Global track {mct_track.global_track_id} was activated with values:\n{mct_track.sc_tracks}")
             self.mct_tracks.append(mct_track)
-            pass
+
+    def _reidentify_lost_global_tracks(self, mct_tracks: List[MCTrack]):
+        """Assigns ids of lost global tracks from the gallery to the closest new tracks"""
+        mct_tracks = [t for t in mct_tracks if t.features]
+        if self.gallery is None or len(self.gallery) == 0 or len(mct_tracks) == 0:
+            return
+
+        queries = np.stack([EmbeddingMatrix.pack(t.smooth_feat) for t in mct_tracks])
+        results = self.gallery.search(queries, k=self.gallery_search_k)
+        candidates = [
+            (distance, i, global_id)
+            for i, matches in enumerate(results)
+            for global_id, distance in matches
+            if distance <= self.clustering_threshold
+        ]
+
+        # Greedy one-to-one assignment by distance
+        assigned_tracks = set()
+        for distance, i, global_id in sorted(candidates):
+            if i in assigned_tracks or global_id not in self.gallery:
+                continue
+            mct_tracks[i].global_track_id = global_id
+            self.gallery.remove(global_id)
+            assigned_tracks.add(i)
+
+    def _archive_removed_global_tracks(self):
+        """
+        Moves to the gallery global tracks whose single-camera tracks are all removed or which were not matched
+        for gallery_archive_frames frames
+        """
+        if self.gallery is None:
+            return
+
+        now = time.time()
+        alive_mct_tracks = []
+        for t in self.mct_tracks:
+            # Без include_lost_tracks треки камер несопоставленного глобального трека очищаются,
+            # поэтому пустой список не означает, что они удалены
+            is_removed = len(t.sc_tracks) > 0 and t.is_removed
+            if not is_removed and t.frames_unmatched < self.gallery_archive_frames:
+                alive_mct_tracks.append(t)
+            elif t.features:
+                self.gallery.add(t.global_track_id, EmbeddingMatrix.pack(t.smooth_feat), now)
+        self.mct_tracks = alive_mct_tracks
+        self.gallery.expire(now)
 
     def _create_distance_matrix(self, appearance_features: np.ndarray) -> np.ndarray:
         distances = 1 - cosine_similarity(appearance_features)
@@ -434,13 +580,10 @@ class MultiCameraTracker:
         Задать рассотояние между треками, которые принадлежат одной камере, равным np.float32.max,
         чтобы избежать кластеризации треков с одной камер"""
 
-        for i in range(len(distances)):
-            for j in range(len(distances)):
-                if i == j:
-                    distances[i, j] = 0.0
-                    continue
-                if cam_ids[i] == cam_ids[j]:
-                    distances[i, j] = np.finfo(np.float32).max
+        cam_ids = np.asarray(cam_ids)
+        distances = np.maximum((distances + distances.T) / 2, 0)
+        distances[cam_ids[:, None] == cam_ids[None, :]] = np.finfo(np.float32).max
+        np.fill_diagonal(distances, 0.0)
         return distances
 
 
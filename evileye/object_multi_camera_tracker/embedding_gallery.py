@@ -0,0 +1,244 @@
+from typing import Dict, List, Set, Tuple
+import time
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+class FlatIndex:
+    """Exact inner product search over all stored rows"""
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.valid = np.zeros(capacity, dtype=bool)
+
+    def add(self, row: int, vector: np.ndarray):
+        self.vectors[row] = vector
+        self.valid[row] = True
+
+    def remove(self, row: int):
+        self.valid[row] = False
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.flatnonzero(self.valid)
+        sims = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        if len(rows) == 0:
+            return sims, found
+        all_sims = queries @ self.vectors[rows].T
+        num = min(k, len(rows))
+        top = np.argpartition(-all_sims, num - 1, axis=1)[:, :num]
+        top_sims = np.take_along_axis(all_sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        sims[:, :num] = np.take_along_axis(top_sims, order, axis=1)
+        found[:, :num] = rows[np.take_along_axis(top, order, axis=1)]
+        return sims, found
+
+    def _search_rows(self, queries: np.ndarray, k: int, candidates: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: similarities and rows of the k nearest candidates for every query, rows are -1 for missing results
+        """
+        sims = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, (query, rows) in enumerate(zip(queries, candidates)):
+            if len(rows) == 0:
+                continue
+            cand_sims = self.vectors[rows] @ query
+            num = min(k, len(rows))
+            top = np.argpartition(-cand_sims, num - 1)[:num]
+            top = top[np.argsort(-cand_sims[top])]
+            sims[i, :num] = cand_sims[top]
+            found[i, :num] = rows[top]
+        return sims, found
+
+
+class IvfIndex(FlatIndex):
+    """
+    Inverted file index: rows are split into lists by the nearest of num_lists centroids trained
+    with spherical k-means, a query scans only the nprobe closest lists.
+    Works as FlatIndex until train_size vectors are stored.
+    """
+
+    def __init__(self, dim: int, capacity: int, num_lists: int = 256, nprobe: int = 8, train_size: int | None = None):
+        super().__init__(dim, capacity)
+        self.num_lists = num_lists
+        self.nprobe = nprobe
+        self.train_size = train_size if train_size is not None else 39 * num_lists
+        self.centroids: np.ndarray | None = None
+        self.lists: List[Set[int]] = []
+        self.assignment = np.full(capacity, -1, dtype=np.int64)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def add(self, row: int, vector: np.ndarray):
+        super().add(row, vector)
+        if self.is_trained:
+            self._assign(row, int(np.argmax(self.centroids @ vector)))
+        elif np.count_nonzero(self.valid) >= self.train_size:
+            self.train()
+
+    def remove(self, row: int):
+        super().remove(row)
+        list_id = self.assignment[row]
+        if list_id >= 0:
+            self.lists[list_id].discard(row)
+            self.assignment[row] = -1
+
+    def train(self, num_iterations: int = 10):
+        rows = np.flatnonzero(self.valid)
+        vectors = self.vectors[rows]
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(len(vectors), size=min(self.num_lists, len(vectors)), replace=False)]
+        for _ in range(num_iterations):
+            labels = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            non_empty = norms[:, 0] > 0
+            centroids[non_empty] = sums[non_empty] / norms[non_empty]
+
+        self.centroids = centroids
+        self.lists = [set() for _ in range(len(centroids))]
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        for row, list_id in zip(rows.tolist(), labels.tolist()):
+            self._assign(row, list_id)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.is_trained:
+            return super().search(queries, k)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        candidates = []
+        for query_probes in probes:
+            rows = [row for list_id in query_probes for row in self.lists[list_id]]
+            candidates.append(np.asarray(rows, dtype=np.int64))
+        return self._search_rows(queries, k, candidates)
+
+    def _assign(self, row: int, list_id: int):
+        self.assignment[row] = list_id
+        self.lists[list_id].add(row)
+
+
+class FaissIndex:
+    """Adapter to FAISS inner product index, rows are used as FAISS ids"""
+
+    def __init__(self, dim: int, capacity: int):
+        if faiss is None:
+            raise ImportError("faiss is not installed, use 'flat' or 'ivf' gallery index instead")
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+    def add(self, row: int, vector: np.ndarray):
+        self.index.add_with_ids(vector.reshape(1, -1), np.array([row], dtype=np.int64))
+
+    def remove(self, row: int):
+        self.index.remove_ids(np.array([row], dtype=np.int64))
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+
+
+class EmbeddingGallery:
+    """
+    Bounded store of appearance embeddings of global tracks for long-term re-identification.
+
+    Embeddings are kept in a ring buffer of max_size rows and expire after max_age_secs.
+    Embeddings are expected to be normalized, so 1 - inner product is the cosine distance.
+    """
+    index_types = {'flat': FlatIndex, 'ivf': IvfIndex, 'faiss': FaissIndex}
+
+    def __init__(self, max_size: int = 10000, max_age_secs: float | None = 600.0, index_type: str = 'flat',
+                 index_params: dict | None = None):
+        if index_type not in EmbeddingGallery.index_types:
+            raise ValueError(f"Unknown gallery index type: {index_type}")
+        self.max_size = max_size
+        self.max_age_secs = max_age_secs
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.index = None
+
+        self.global_ids = np.full(max_size, -1, dtype=np.int64)
+        self.time_stamps = np.zeros(max_size, dtype=np.float64)
+        self.rows_by_id: Dict[int, Set[int]] = {}
+        self.size = 0  # Number of stored embeddings
+        self.head = 0  # Next row to write
+        self.num_rows = 0  # Rows between the oldest one and head, including removed ones
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, global_id):
+        return global_id in self.rows_by_id
+
+    def add(self, global_id: int, embedding: np.ndarray, time_stamp: float | None = None):
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        if self.index is None:
+            self.index = EmbeddingGallery.index_types[self.index_type](len(embedding), self.max_size,
+                                                                       **self.index_params)
+        if self.num_rows == self.max_size:
+            self._remove_row((self.head - self.num_rows) % self.max_size)
+            self.num_rows -= 1
+
+        row = self.head
+        self.global_ids[row] = global_id
+        self.time_stamps[row] = time_stamp if time_stamp is not None else time.time()
+        self.rows_by_id.setdefault(global_id, set()).add(row)
+        self.index.add(row, embedding)
+        self.size += 1
+        self.head = (self.head + 1) % self.max_size
+        self.num_rows += 1
+
+    def remove(self, global_id: int):
+        for row in list(self.rows_by_id.get(global_id, ())):
+            self._remove_row(row)
+
+    def expire(self, now: float | None = None):
+        """Drops embeddings older than max_age_secs, oldest rows are always at the tail of the ring buffer"""
+        if self.max_age_secs is None:
+            return
+        min_time_stamp = (now if now is not None else time.time()) - self.max_age_secs
+        while self.num_rows > 0:
+            tail = (self.head - self.num_rows) % self.max_size
+            if self.global_ids[tail] >= 0 and self.time_stamps[tail] >= min_time_stamp:
+                break
+            self._remove_row(tail)
+            self.num_rows -= 1
+
+    def search(self, queries: np.ndarray, k: int = 10) -> List[List[Tuple[int, float]]]:
+        """
+        :return: for every query list of (global_id, distance) of the closest embedding of each found id,
+         sorted by distance
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(queries), -1)
+        if self.index is None or len(queries) == 0 or not self.rows_by_id:
+            return [[] for _ in range(len(queries))]
+
+        sims, rows = self.index.search(queries, k)
+        results = []
+        for query_sims, query_rows in zip(sims, rows):
+            best = {}
+            for sim, row in zip(query_sims.tolist(), query_rows.tolist()):
+                if row < 0:
+                    continue
+                global_id = int(self.global_ids[row])
+                if global_id >= 0 and global_id not in best:
+                    best[global_id] = 1.0 - sim
+            results.append(sorted(best.items(), key=lambda item: item[1]))
+        return results
+
+    def _remove_row(self, row: int):
+        global_id = int(self.global_ids[row])
+        if global_id < 0:
+            return
+        self.index.remove(row)
+        self.global_ids[row] = -1
+        self.size -= 1
+        rows = self.rows_by_id[global_id]
+        rows.discard(row)
+        if not rows:
+            del self.rows_by_id[global_id]
@@ -0,0 +1,90 @@
+from typing import Dict, Hashable, Iterable, List
+import numpy as np
+
+
+class EmbeddingMatrix:
+    """
+    Persistent matrix of normalized appearance embeddings of single-camera tracks.
+
+    Features of all encoders are normalized, concatenated and scaled by 1/sqrt(num_encoders),
+    so the dot product of two rows is the mean cosine similarity over encoders and the whole
+    similarity matrix is obtained with one matrix multiplication.
+    Rows are rewritten only when the source feature object of a track changes.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.dim = None
+        self.matrix: np.ndarray | None = None
+        self.rows: Dict[Hashable, int] = {}
+        self._sources: Dict[Hashable, object] = {}
+        self._free_rows: List[int] = []
+        self._size = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def reset(self):
+        self.dim = None
+        self.matrix = None
+        self.rows = {}
+        self._sources = {}
+        self._free_rows = []
+        self._size = 0
+
+    def update(self, key: Hashable, feats) -> bool:
+        """
+        Stores embedding of the track with given key
+        :return: True if the row was added or changed
+        """
+        if key in self.rows and self._sources[key] is feats:
+            return False
+
+        vector = self.pack(feats)
+        if self.dim != len(vector):
+            # Encoders set changed, previously stored rows are not comparable anymore
+            self.reset()
+            self.dim = len(vector)
+            self.matrix = np.zeros((self.capacity, self.dim), dtype=np.float32)
+
+        row = self.rows.get(key)
+        if row is None:
+            row = self._allocate_row()
+            self.rows[key] = row
+        self.matrix[row] = vector
+        self._sources[key] = feats
+        return True
+
+    def retain(self, keys: Iterable[Hashable]):
+        """Releases rows of all tracks which are not in keys"""
+        keys = set(keys)
+        for key in [k for k in self.rows if k not in keys]:
+            self._free_rows.append(self.rows.pop(key))
+            del self._sources[key]
+
+    def get(self, keys: List[Hashable]) -> np.ndarray:
+        rows = np.fromiter((self.rows[key] for key in keys), dtype=np.int64, count=len(keys))
+        return self.matrix[rows]
+
+    @staticmethod
+    def pack(feats) -> np.ndarray:
+        parts = []
+        for feat in feats:
+            feat = np.asarray(feat, dtype=np.float32).ravel()
+            norm = np.linalg.norm(feat)
+            parts.append(feat / norm if norm > 0 else feat)
+        return np.concatenate(parts) / np.sqrt(len(parts))
+
+    def _allocate_row(self) -> int:
+        if self._free_rows:
+            return self._free_rows.pop()
+        if self._size == len(self.matrix):
+            grown = np.zeros((2 * len(self.matrix), self.dim), dtype=np.float32)
+            grown[:self._size] = self.matrix[:self._size]
+            self.matrix = grown
+        row = self._size
+        self._size += 1
+        return row
@@ -0,0 +1,74 @@
+from typing import Any, Dict, List
+from collections import deque
+import time
+
+
+class FrameSynchronizer:
+    """
+    Joins per-camera results into groups captured at the same moment.
+
+    Items are grouped around the earliest pending capture time: each source contributes its earliest
+    item within tolerance_secs of it. A group is released as soon as every source either contributed
+    or already has a later item, otherwise it waits for the missing sources no longer than deadline_secs
+    after arrival of its first item and then is released partially.
+    """
+
+    def __init__(self, source_ids: List[int], tolerance_secs: float = 0.1, deadline_secs: float = 0.5):
+        self.source_ids = list(source_ids)
+        self.tolerance_secs = tolerance_secs
+        self.deadline_secs = deadline_secs
+        self.pending: Dict[int, deque] = {source_id: deque() for source_id in self.source_ids}
+        self.num_groups = 0
+        self.num_partial_groups = 0
+
+    def put(self, source_id: int, capture_time: float, item: Any, arrival_time: float | None = None):
+        arrival_time = arrival_time if arrival_time is not None else time.monotonic()
+        self.pending[source_id].append((capture_time, arrival_time, item))
+
+    def get_num_pending(self) -> int:
+        return sum(len(items) for items in self.pending.values())
+
+    def pop_groups(self, now: float | None = None) -> List[Dict[int, Any]]:
+        """
+        :return: list of released groups in capture order, group is a dict source_id -> item
+        """
+        now = now if now is not None else time.monotonic()
+        groups = []
+        while True:
+            group = self._pop_group(now)
+            if group is None:
+                break
+            groups.append(group)
+        return groups
+
+    def get_next_deadline(self) -> float | None:
+        """Monotonic time when the oldest pending group must be released"""
+        arrivals = [items[0][1] for items in self.pending.values() if items]
+        if not arrivals:
+            return None
+        return min(arrivals) + self.deadline_secs
+
+    def _pop_group(self, now: float) -> Dict[int, Any] | None:
+        heads = {source_id: items[0] for source_id, items in self.pending.items() if items}
+        if not heads:
+            return None
+
+        anchor_source = min(heads, key=lambda source_id: heads[source_id][0])
+        anchor_time, anchor_arrival, _ = heads[anchor_source]
+        matched = []
+        is_complete = True
+        for source_id, items in self.pending.items():
+            if not items:
+                is_complete = False
+                continue
+            if items[0][0] - anchor_time <= self.tolerance_secs:
+                matched.append(source_id)
+            # Otherwise the source already delivered a later frame and can't match this moment anymore
+
+        if not is_complete and now - anchor_arrival < self.deadline_secs:
+            return None
+
+        self.num_groups += 1
+        if len(matched) < len(self.source_ids):
+            self.num_partial_groups += 1
+        return {source_id: self.pending[source_id].popleft()[2] for source_id in matched}
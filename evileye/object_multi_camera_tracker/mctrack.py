@@ -23,6 +23,7 @@ class MCTrack:
         self.confident_age = confident_age
         self.confidence_flags = deque([], maxlen=maxlen)
         self.track_ids = deque([], maxlen=maxlen)
+        self.frames_unmatched = 0  # Число кадров подряд, в которых глобальный трек не сопоставлен кластерам
 
     def update(self, new_track: 'MCTrack', include_lost_tracks: bool = False):
         cam_ids = list(set(self.sc_tracks.keys()) | set(new_track.sc_tracks.keys())) 
@@ -151,33 +151,17 @@ class ObjectTrackingBotsort(ObjectTrackingBase):
             detection: DetectionResult, 
             tracks: list[BOTrack]):
         
-        tracks_info = TrackingResultList()
+        # print(tracks)
+        tracks_results = np.asarray([x.result for x in tracks], dtype=np.float32).reshape(-1, 8)
+        # Add track objects to tracking data
+        # in order to use them in multi-camera tracking during reidentification
+        tracking_data = [{"track_object": track} for track in tracks]
+        tracks_info = TrackingResultList.from_array(tracks_results[:, :7], tracking_data)
         tracks_info.source_id = cam_id
         tracks_info.frame_id = frame_id
         tracks_info.time_stamp = datetime.datetime.now()
-
-        # print(tracks)
-        tracks_results = np.asarray([x.result for x in tracks], dtype=np.float32)
-        for i in range(len(tracks_results)):
-            track_bbox = tracks_results[i, :4].tolist()
-            track_conf = tracks_results[i, 5]
-            track_cls = int(tracks_results[i, 6])
-            track_id = int(tracks_results[i, 4])
-            object_info = TrackingResult()
-            object_info.class_id = track_cls
-            object_info.bounding_box = track_bbox
-            object_info.confidence = float(track_conf)
-            object_info.track_id = track_id
-            if detection:
-                object_info.detection_history.append(detection)
-            
-            # Add BOTrack object to tracking data
-            # in order to use it in multi-camera tracking during reidentification
-            object_info.tracking_data = {
-                "track_object": tracks[i],
-            }
-
-            tracks_info.tracks.append(object_info)
+        if detection:
+            for track in tracks_info.tracks:
+                track.detection_history.append(detection)
 
         return tracks_info
-
@@ -1,9 +1,18 @@
 import copy
+import numpy as np
 
 from ..object_detector.object_detection_base import DetectionResultList
 from ..object_detector.object_detection_base import DetectionResult
 
+# Column layout of TrackingResultList.data
+TRACK_X1, TRACK_Y1, TRACK_X2, TRACK_Y2, TRACK_ID, TRACK_CONF, TRACK_CLASS = range(7)
+TRACK_DATA_COLUMNS = 7
+
+
 class TrackingResult:
+    __slots__ = ('track_id', 'bounding_box', 'confidence', 'life_time', 'frame_count', 'class_id',
+                 'detection_history', 'tracking_data')
+
     def __init__(self):
         self.track_id = 0
         self.bounding_box = []
@@ -14,14 +23,91 @@ class TrackingResult:
         self.detection_history: list[DetectionResult] = []  # list of DetectionResult
         self.tracking_data = dict()  # internal tracking data
 
+    def to_dict(self):
+        return {name: getattr(self, name) for name in TrackingResult.__slots__}
+
 
 class TrackingResultList:
+    """
+    Tracks of one frame. Can be backed either by a list of TrackingResult or by a single
+    N x 7 float32 array (x1, y1, x2, y2, track_id, confidence, class_id); in the latter case
+    TrackingResult objects are created only when tracks are accessed, after which the list
+    becomes the authoritative representation.
+    """
+    __slots__ = ('source_id', 'frame_id', 'time_stamp', '_tracks', '_data', '_tracking_data')
     generator_counter = 0
+
     def __init__(self):
         self.source_id = None
         self.frame_id = None
         self.time_stamp = None
-        self.tracks: list[TrackingResult] = []  # list of DetectionResult
+        self._tracks: list[TrackingResult] | None = []  # list of TrackingResult
+        self._data: np.ndarray | None = None
+        self._tracking_data: list[dict] | None = None
+
+    @classmethod
+    def from_array(cls, data: np.ndarray, tracking_data: list[dict] | None = None):
+        result = cls()
+        result.set_data(data, tracking_data)
+        return result
+
+    def set_data(self, data: np.ndarray, tracking_data: list[dict] | None = None):
+        data = np.asarray(data, dtype=np.float32).reshape(-1, TRACK_DATA_COLUMNS)
+        if tracking_data is not None and len(tracking_data) != len(data):
+            raise ValueError(f"Tracking data length {len(tracking_data)} doesn't match number of tracks {len(data)}")
+        self._data = data
+        self._tracking_data = tracking_data
+        self._tracks = None
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is not None:
+            return self._data
+        data = np.empty((len(self._tracks), TRACK_DATA_COLUMNS), dtype=np.float32)
+        for i, track in enumerate(self._tracks):
+            data[i, TRACK_X1:TRACK_Y2 + 1] = track.bounding_box[:4]
+            data[i, TRACK_ID] = track.track_id
+            data[i, TRACK_CONF] = track.confidence
+            data[i, TRACK_CLASS] = track.class_id if track.class_id is not None else -1
+        return data
+
+    @property
+    def tracks(self) -> list[TrackingResult]:
+        if self._tracks is None:
+            self._tracks = self._materialize()
+        return self._tracks
+
+    @tracks.setter
+    def tracks(self, tracks: list[TrackingResult]):
+        self._tracks = tracks
+        self._data = None
+        self._tracking_data = None
+
+    def get_track_ids(self) -> list[int]:
+        if self._tracks is None:
+            return self._data[:, TRACK_ID].astype(np.int64).tolist()
+        return [track.track_id for track in self._tracks]
+
+    def __len__(self):
+        if self._tracks is None:
+            return len(self._data)
+        return len(self._tracks)
+
+    def _materialize(self) -> list[TrackingResult]:
+        tracks = []
+        for i, row in enumerate(self._data.tolist()):
+            track = TrackingResult()
+            track.bounding_box = row[TRACK_X1:TRACK_Y2 + 1]
+            track.track_id = int(row[TRACK_ID])
+            track.confidence = row[TRACK_CONF]
+            track.class_id = int(row[TRACK_CLASS])
+            if self._tracking_data is not None:
+                track.tracking_data = self._tracking_data[i]
+            tracks.append(track)
+        # Materialized objects are the only source of truth from now on
+        self._data = None
+        self._tracking_data = None
+        return tracks
 
     def generate_from(self, data):
         if type(data) == DetectionResultList:
@@ -12,50 +12,77 @@ from typing import Dict, List, Any, Optional
 from pathlib import Path
 from queue import Queue
 from threading import Thread, Lock
+from ..utils.path_resolver import DayDirectory, PathResolver, get_path_resolver
+
+
+def load_labels(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Load label records from JSON-lines file or from legacy JSON file with "objects" array.
+    Broken lines (i.e. the last line interrupted by a crash) are skipped.
+    """
+    if not os.path.isfile(file_path):
+        return []
+    if not file_path.endswith('.jsonl'):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            return data
+        if isinstance(data, dict) and 'objects' in data:
+            return data['objects']
+        return [data] if data else []
+
+    objects = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                objects.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return objects
 
 
 class LabelingManager:
     """
-    Manages saving object detection and tracking labels to JSON files.
+    Manages saving object detection and tracking labels to JSON-lines files.
     
-    Creates and maintains two JSON files:
-    - objects_found.json: For objects detected for the first time
-    - objects_lost.json: For objects that were lost (tracking ended)
+    Creates and maintains two append-only files, one JSON record per line:
+    - objects_found.jsonl: For objects detected for the first time
+    - objects_lost.jsonl: For objects that were lost (tracking ended)
+    and a small sidecar index labels_index.json with number of records and maximum object_id.
+    Files in the former JSON layout can be produced on demand with export_json().
     """
     
-    def __init__(self, base_dir: str = 'EvilEyeData', cameras_params: list = None):
+    def __init__(self, base_dir: str = 'EvilEyeData', cameras_params: list = None, fsync_policy: str = 'flush',
+                 path_resolver: PathResolver = None):
         """
         Initialize the labeling manager.
         
         Args:
             base_dir: Base directory for saving labels and images
             cameras_params: List of camera parameters for source name mapping
+            fsync_policy: When appended labels are forced to disk: 'flush' - after each buffer flush,
+                'interval' - not more often than once per save_interval, 'never' - left to OS
+            path_resolver: Resolver of day directories shared with images, labels switch to the new day
+                together with images
         """
         self.base_dir = base_dir
         self.images_dir = os.path.join(base_dir, 'images')
         self.cameras_params = cameras_params or []
-        
-        # Create base directory if it doesn't exist
-        os.makedirs(self.images_dir, exist_ok=True)
-        
-        # Current date for file naming
-        self.current_date = datetime.date.today()
-        self.date_str = self.current_date.strftime('%Y_%m_%d')
-        
-        # Create date-specific directory
-        self.current_day_dir = os.path.join(self.images_dir, self.date_str)
-        os.makedirs(self.current_day_dir, exist_ok=True)
-        
-        # File paths - now in the same directory as images
-        self.found_labels_file = os.path.join(self.current_day_dir, 'objects_found.json')
-        self.lost_labels_file = os.path.join(self.current_day_dir, 'objects_lost.json')
+        if fsync_policy not in ('flush', 'interval', 'never'):
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.fsync_policy = fsync_policy
+        self.path_resolver = path_resolver or get_path_resolver(base_dir, self.cameras_params)
         
         # File locks to prevent simultaneous read/write access
         self.found_file_lock = Lock()
         self.lost_file_lock = Lock()
+        self.last_fsync_time = time.time()
         
-        # Initialize files if they don't exist
-        self._init_label_files()
+        # Current date for file naming, label files are in the same directory as images
+        self._set_day(self.path_resolver.get_day())
         
         # Buffering configuration
         self.buffer_size = 100  # Save when buffer reaches this size
@@ -64,7 +91,7 @@ class LabelingManager:
         self.lost_buffer = []
         self.last_save_time = time.time()
         self.running = True
-        self.buffer_lock = Lock()
+        self.buffer_lock = threading.RLock()
         
         # Pre-load existing data into buffers to avoid clearing files
         self._preload_existing_data()
@@ -73,75 +100,30 @@ class LabelingManager:
         self.save_thread = Thread(target=self._save_worker, daemon=True)
         self.save_thread.start()
     
-    def _init_label_files(self):
-        """Initialize JSON label files if they don't exist."""
-        
-        # Initialize objects_found.json
-        if not os.path.exists(self.found_labels_file):
-            found_data = {
-                "metadata": {
-                    "version": "1.0",
-                    "created": datetime.datetime.now().isoformat(),
-                    "description": "Object detection labels - objects found for the first time",
-                    "total_objects": 0
-                },
-                "objects": []
-            }
-            self._save_json(self.found_labels_file, found_data, self.found_file_lock)
-        
-        # Initialize objects_lost.json
-        if not os.path.exists(self.lost_labels_file):
-            lost_data = {
-                "metadata": {
-                    "version": "1.0",
-                    "created": datetime.datetime.now().isoformat(),
-                    "description": "Object tracking labels - objects that were lost",
-                    "total_objects": 0
-                },
-                "objects": []
-            }
-            self._save_json(self.lost_labels_file, lost_data, self.lost_file_lock)
+    def _set_day(self, day: DayDirectory):
+        self.current_date = day.date
+        self.date_str = day.date_str
+        self.current_day_dir = day.path
+        self.path_resolver.ensure_dir(self.current_day_dir)
+        
+        self.found_labels_file = os.path.join(self.current_day_dir, 'objects_found.jsonl')
+        self.lost_labels_file = os.path.join(self.current_day_dir, 'objects_lost.jsonl')
+        self.index_file = os.path.join(self.current_day_dir, 'labels_index.json')
+        
+        # Sidecar index, kept in memory and rewritten after each flush
+        self.index = {"found_objects": 0, "lost_objects": 0, "max_object_id": 0}
     
-    def _load_json(self, file_path: str, file_lock: Lock = None) -> Dict[str, Any]:
-        """Load JSON file safely with optional file locking."""
-        if file_lock:
-            file_lock.acquire()
-            try:
-                return self._load_json_internal(file_path)
-            finally:
-                file_lock.release()
-        else:
-            return self._load_json_internal(file_path)
-    
-    def _load_json_internal(self, file_path: str) -> Dict[str, Any]:
-        """Internal JSON loading method."""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Ensure the data has the required structure
-                if not isinstance(data, dict):
-                    data = {}
-                if "metadata" not in data:
-                    data["metadata"] = {
-                        "version": "1.0",
-                        "created": datetime.datetime.now().isoformat(),
-                        "description": "Object detection labels",
-                        "total_objects": 0
-                    }
-                if "objects" not in data:
-                    data["objects"] = []
-                return data
-        except (FileNotFoundError, json.JSONDecodeError):
-            # Return default structure if file doesn't exist or is corrupted
-            return {
-                "metadata": {
-                    "version": "1.0",
-                    "created": datetime.datetime.now().isoformat(),
-                    "description": "Object detection labels",
-                    "total_objects": 0
-                },
-                "objects": []
-            }
+    def _check_day(self):
+        """Switch label files to the new day after midnight, labels buffered before are saved to the previous day."""
+        day = self.path_resolver.get_day()
+        if day.date_str == self.date_str:
+            return
+        with self.buffer_lock:
+            if day.date_str == self.date_str:
+                return
+            self._save_all_buffers()
+            self._set_day(day)
+            self._preload_existing_data()
     
     def _save_json(self, file_path: str, data: Dict[str, Any], file_lock: Lock = None):
         """Save JSON file safely with optional file locking."""
@@ -154,13 +136,13 @@ class LabelingManager:
         else:
             return self._save_json_internal(file_path, data)
     
-    def _save_json_internal(self, file_path: str, data: Dict[str, Any]):
+    def _save_json_internal(self, file_path: str, data: Dict[str, Any], indent: int | None = 2):
         """Internal JSON saving method."""
+        temp_file = f"{file_path}.tmp"
         try:
             # Create temporary file first
-            temp_file = f"{file_path}.tmp"
             with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                json.dump(data, f, indent=indent, ensure_ascii=False)
             
             # Atomic rename to prevent corruption
             os.replace(temp_file, file_path)
@@ -175,19 +157,35 @@ class LabelingManager:
                     pass
             return False
     
-    def _update_metadata(self, data: Dict[str, Any], total_objects: int):
-        """Update metadata in label data."""
-        # Ensure metadata exists
-        if "metadata" not in data:
-            data["metadata"] = {
-                "version": "1.0",
-                "created": datetime.datetime.now().isoformat(),
-                "description": "Object detection labels",
-                "total_objects": 0
-            }
-        
-        data["metadata"]["last_updated"] = datetime.datetime.now().isoformat()
-        data["metadata"]["total_objects"] = total_objects
+    def _append_lines(self, file_path: str, objects: List[Dict[str, Any]], file_lock: Lock) -> bool:
+        """Append objects to JSON-lines file, one record per line."""
+        data = ''.join(json.dumps(obj, ensure_ascii=False) + '\n' for obj in objects)
+        with file_lock:
+            try:
+                with open(file_path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    if self._is_fsync_needed():
+                        os.fsync(f.fileno())
+                return True
+            except Exception as e:
+                print(f"Error appending labels to {file_path}: {e}")
+                return False
+    
+    def _is_fsync_needed(self) -> bool:
+        if self.fsync_policy == 'flush':
+            return True
+        if self.fsync_policy == 'interval' and time.time() - self.last_fsync_time >= self.save_interval:
+            self.last_fsync_time = time.time()
+            return True
+        return False
+    
+    def _update_index(self, objects: List[Dict[str, Any]], count_key: str):
+        """Update sidecar index with appended objects and save it."""
+        self.index[count_key] += len(objects)
+        self.index["max_object_id"] = max(self.index["max_object_id"], self._get_max_object_id(objects, []))
+        self.index["last_updated"] = datetime.datetime.now().isoformat()
+        self._save_json_internal(self.index_file, self.index, indent=None)
     
     def add_object_found(self, object_data: Dict[str, Any]):
         """
@@ -196,6 +194,7 @@ class LabelingManager:
         Args:
             object_data: Dictionary containing object information
         """
+        self._check_day()
         with self.buffer_lock:
             self.found_buffer.append(object_data)
             
@@ -204,46 +203,14 @@ class LabelingManager:
                 self._save_found_buffer()
     
     def _save_found_buffer(self):
-        """Save found objects buffer to file."""
-        if not self.found_buffer:
-            return
-            
+        """Append found objects buffer to file."""
         with self.buffer_lock:
-            # Load current data with file lock
-            data = self._load_json(self.found_labels_file, self.found_file_lock)
-            
-            # Ensure objects list exists
-            if "objects" not in data:
-                data["objects"] = []
-            
-            # Check for duplicates before adding
-            existing_timestamps = {obj.get('timestamp') for obj in data["objects"]}
-            existing_ids = {obj.get('object_id') for obj in data["objects"]}
-            new_objects = []
-            
-            for obj in self.found_buffer:
-                if obj.get('timestamp') not in existing_timestamps or obj.get('object_id') not in existing_ids:
-                    new_objects.append(obj)
-            #    else:
-            #        print(f"⚠️ Skipping duplicate found object with timestamp: {obj.get('timestamp')} for object: {obj.get('object_id')}")
-            
-            # Add only new objects
-            if new_objects:
-                data["objects"].extend(new_objects)
-            #    print(f"💾 Saving {len(new_objects)} new found objects (total: {len(data['objects'])})")
-            #else:
-            #    print(f"ℹ️ No new found objects to save")
-            
-            # Update metadata
-            self._update_metadata(data, len(data["objects"]))
-            
-            # Save updated data with file lock
-            if self._save_json(self.found_labels_file, data, self.found_file_lock):
-                # Clear buffer only if save was successful
+            if not self.found_buffer:
+                return
+            # Clear buffer only if save was successful
+            if self._append_lines(self.found_labels_file, self.found_buffer, self.found_file_lock):
+                self._update_index(self.found_buffer, "found_objects")
                 self.found_buffer.clear()
-            #    print(f"✅ Found objects saved successfully")
-            #else:
-            #    print(f"❌ Failed to save found objects")
     
     def add_object_lost(self, object_data: Dict[str, Any]):
         """
@@ -252,6 +219,7 @@ class LabelingManager:
         Args:
             object_data: Dictionary containing object information
         """
+        self._check_day()
         with self.buffer_lock:
             self.lost_buffer.append(object_data)
             
@@ -260,46 +228,14 @@ class LabelingManager:
                 self._save_lost_buffer()
     
     def _save_lost_buffer(self):
-        """Save lost objects buffer to file."""
-        if not self.lost_buffer:
-            return
-            
+        """Append lost objects buffer to file."""
         with self.buffer_lock:
-            # Load current data with file lock
-            data = self._load_json(self.lost_labels_file, self.lost_file_lock)
-            
-            # Ensure objects list exists
-            if "objects" not in data:
-                data["objects"] = []
-            
-            # Check for duplicates before adding
-            existing_timestamps = {obj.get('detected_timestamp') for obj in data["objects"]}
-            existing_ids = {obj.get('object_id') for obj in data["objects"]}
-            new_objects = []
-            
-            for obj in self.lost_buffer:
-                if obj.get('detected_timestamp') not in existing_timestamps or obj.get('object_id') not in existing_ids:
-                    new_objects.append(obj)
-                #else:
-                #    print(f"⚠️ Skipping duplicate lost object with timestamp: {obj.get('detected_timestamp')} for object: {obj.get('object_id')}")
-            
-            # Add only new objects
-            if new_objects:
-                data["objects"].extend(new_objects)
-                #print(f"💾 Saving {len(new_objects)} new lost objects (total: {len(data['objects'])})")
-            #else:
-            #    print(f"ℹ️ No new lost objects to save")
-            
-            # Update metadata
-            self._update_metadata(data, len(data["objects"]))
-            
-            # Save updated data with file lock
-            if self._save_json(self.lost_labels_file, data, self.lost_file_lock):
-                # Clear buffer only if save was successful
+            if not self.lost_buffer:
+                return
+            # Clear buffer only if save was successful
+            if self._append_lines(self.lost_labels_file, self.lost_buffer, self.lost_file_lock):
+                self._update_index(self.lost_buffer, "lost_objects")
                 self.lost_buffer.clear()
-            #    print(f"✅ Lost objects saved successfully")
-            #else:
-            #    print(f"❌ Failed to save lost objects")
     
     def create_found_object_data(self, obj, image_width: int, image_height: int, 
                                 image_filename: str, preview_filename: str) -> Dict[str, Any]:
@@ -432,13 +368,7 @@ class LabelingManager:
         Returns:
             Source name or default name if not found
         """
-        for camera in self.cameras_params:
-            if source_id in camera.get('source_ids', []):
-                id_idx = camera['source_ids'].index(source_id)
-                source_names = camera.get('source_names', [])
-                if id_idx < len(source_names):
-                    return source_names[id_idx]
-        return f"camera_{source_id}"
+        return self.path_resolver.get_source_name(source_id, f"camera_{source_id}")
     
     def get_statistics(self) -> Dict[str, Any]:
         """
@@ -447,18 +377,50 @@ class LabelingManager:
         Returns:
             Dictionary with statistics
         """
-        found_data = self._load_json(self.found_labels_file, self.found_file_lock)
-        lost_data = self._load_json(self.lost_labels_file, self.lost_file_lock)
-        
         return {
-            "found_objects": len(found_data.get("objects", [])),
-            "lost_objects": len(lost_data.get("objects", [])),
-            "total_objects": len(found_data.get("objects", [])) + len(lost_data.get("objects", [])),
+            "found_objects": self.index["found_objects"],
+            "lost_objects": self.index["lost_objects"],
+            "total_objects": self.index["found_objects"] + self.index["lost_objects"],
+            "max_object_id": self.index["max_object_id"],
             "found_labels_file": self.found_labels_file,
             "lost_labels_file": self.lost_labels_file,
             "date": self.date_str
         }
     
+    def export_json(self, output_dir: str = None) -> tuple[str, str]:
+        """
+        Export labels of the current day to objects_found.json and objects_lost.json in the former
+        JSON layout for tools that need it.
+        
+        Args:
+            output_dir: Output directory, the day directory by default
+            
+        Returns:
+            Paths to exported found and lost label files
+        """
+        self.flush_buffers()
+        output_dir = output_dir or self.current_day_dir
+        os.makedirs(output_dir, exist_ok=True)
+        exported = []
+        for labels_file, file_lock, description in (
+                (self.found_labels_file, self.found_file_lock, "Object detection labels - objects found for the first time"),
+                (self.lost_labels_file, self.lost_file_lock, "Object tracking labels - objects that were lost")):
+            with file_lock:
+                objects = load_labels(labels_file)
+            data = {
+                "metadata": {
+                    "version": "1.0",
+                    "exported": datetime.datetime.now().isoformat(),
+                    "description": description,
+                    "total_objects": len(objects)
+                },
+                "objects": objects
+            }
+            export_file = os.path.join(output_dir, os.path.basename(labels_file)[:-len('.jsonl')] + '.json')
+            self._save_json(export_file, data)
+            exported.append(export_file)
+        return exported[0], exported[1]
+    
     def export_labels_for_training(self, output_dir: str = None) -> str:
         """
         Export labels in a format suitable for training.
@@ -475,11 +437,14 @@ class LabelingManager:
         os.makedirs(output_dir, exist_ok=True)
         
         # Load current data with file locks
-        found_data = self._load_json(self.found_labels_file, self.found_file_lock)
-        lost_data = self._load_json(self.lost_labels_file, self.lost_file_lock)
+        self.flush_buffers()
+        with self.found_file_lock:
+            found_objects = load_labels(self.found_labels_file)
+        with self.lost_file_lock:
+            lost_objects = load_labels(self.lost_labels_file)
         
         # Combine all objects
-        all_objects = found_data.get("objects", []) + lost_data.get("objects", [])
+        all_objects = found_objects + lost_objects
         
         # Create training format
         training_data = {
@@ -487,8 +452,8 @@ class LabelingManager:
                 "version": "1.0",
                 "exported": datetime.datetime.now().isoformat(),
                 "total_objects": len(all_objects),
-                "found_objects": len(found_data.get("objects", [])),
-                "lost_objects": len(lost_data.get("objects", []))
+                "found_objects": len(found_objects),
+                "lost_objects": len(lost_objects)
             },
             "objects": all_objects
         }
@@ -504,6 +469,7 @@ class LabelingManager:
         while self.running:
             time.sleep(1)  # Check every second
             
+            self._check_day()
             current_time = time.time()
             if current_time - self.last_save_time > self.save_interval:
                 self._save_all_buffers()
@@ -528,43 +494,61 @@ class LabelingManager:
             self.save_thread.join(timeout=5)
     
     def _preload_existing_data(self):
-        """Pre-load existing data from JSON files to avoid clearing them on startup."""
+        """
+        Restore the sidecar index of the current day. Only the small index file is read, labels are scanned
+        when the index is missing or stale.
+        
+        Returns:
+            Maximum object_id of existing labels, or 0 if no labels exist
+        """
         try:
-            print(f"🔄 Pre-loading existing data from {self.date_str}...")
-            
-            # Check and repair JSON files if needed
             self._check_and_repair_json_files()
             
-            # Load found objects with file lock
-            found_data = self._load_json(self.found_labels_file, self.found_file_lock)
-            existing_found = found_data.get("objects", [])
-            if existing_found:
-                print(f"📊 Found {len(existing_found)} existing found objects")
-                # Don't add to buffer, just ensure file is preserved
-            
-            # Load lost objects with file lock
-            lost_data = self._load_json(self.lost_labels_file, self.lost_file_lock)
-            existing_lost = lost_data.get("objects", [])
-            if existing_lost:
-                print(f"📊 Found {len(existing_lost)} existing lost objects")
-                # Don't add to buffer, just ensure file is preserved
-            
-            total_existing = len(existing_found) + len(existing_lost)
+            index = None
+            if os.path.exists(self.index_file):
+                try:
+                    with open(self.index_file, 'r', encoding='utf-8') as f:
+                        index = json.load(f)
+                except (json.JSONDecodeError, OSError):
+                    index = None
+            # Labels could be appended after the index was saved last time, then the index is rebuilt
+            if index is None or any(os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(self.index_file)
+                                    for path in (self.found_labels_file, self.lost_labels_file)):
+                index = self._rebuild_index()
+            
+            self.index.update(index)
+            total_existing = self.index["found_objects"] + self.index["lost_objects"]
             if total_existing > 0:
-                print(f"✅ Successfully pre-loaded {total_existing} existing objects")
-                
-                # Return the maximum object_id found for counter initialization
-                max_object_id = self._get_max_object_id(existing_found, existing_lost)
-                return max_object_id
-            else:
-                print(f"ℹ️ No existing objects found, starting fresh")
-                return 0
+                print(f"✅ Found {total_existing} existing objects for {self.date_str}")
+            return self.index["max_object_id"]
                 
         except Exception as e:
             print(f"⚠️ Warning: Error pre-loading existing data: {e}")
             print(f"ℹ️ Continuing with fresh start")
             return 0
     
+    def _rebuild_index(self) -> Dict[str, Any]:
+        """Scan label files of the current day, labels in the former JSON layout are migrated to JSON-lines."""
+        for labels_file in (self.found_labels_file, self.lost_labels_file):
+            legacy_file = labels_file[:-len('.jsonl')] + '.json'
+            if os.path.exists(legacy_file) and not os.path.exists(labels_file):
+                try:
+                    objects = load_labels(legacy_file)
+                except (json.JSONDecodeError, OSError):
+                    continue
+                temp_file = f"{labels_file}.tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(obj, ensure_ascii=False) + '\n' for obj in objects))
+                os.replace(temp_file, labels_file)
+                print(f"🔄 Migrated {len(objects)} labels from {legacy_file}")
+        
+        found_objects = load_labels(self.found_labels_file)
+        lost_objects = load_labels(self.lost_labels_file)
+        index = {"found_objects": len(found_objects), "lost_objects": len(lost_objects),
+                 "max_object_id": self._get_max_object_id(found_objects, lost_objects)}
+        self._save_json_internal(self.index_file, index, indent=None)
+        return index
+    
     def _get_max_object_id(self, found_objects: List[Dict], lost_objects: List[Dict]) -> int:
         """
         Get the maximum object_id from existing objects.
@@ -601,63 +585,22 @@ class LabelingManager:
         return max_id
     
     def _check_and_repair_json_files(self):
-        """Check and repair corrupted JSON files."""
-        try:
-            # Check found objects file
-            if os.path.exists(self.found_labels_file):
-                try:
-                    with open(self.found_labels_file, 'r', encoding='utf-8') as f:
-                        json.load(f)
-                    print(f"✅ Found objects file is valid")
-                except json.JSONDecodeError as e:
-                    print(f"⚠️ Found objects file is corrupted: {e}")
-                    print(f"🔄 Attempting to repair...")
-                    self._repair_json_file(self.found_labels_file, "found")
-            
-            # Check lost objects file
-            if os.path.exists(self.lost_labels_file):
-                try:
-                    with open(self.lost_labels_file, 'r', encoding='utf-8') as f:
-                        json.load(f)
-                    print(f"✅ Lost objects file is valid")
-                except json.JSONDecodeError as e:
-                    print(f"⚠️ Lost objects file is corrupted: {e}")
-                    print(f"🔄 Attempting to repair...")
-                    self._repair_json_file(self.lost_labels_file, "lost")
-                    
-        except Exception as e:
-            print(f"⚠️ Warning: Error checking JSON files: {e}")
-    
-    def _repair_json_file(self, file_path: str, file_type: str):
-        """Attempt to repair a corrupted JSON file."""
-        try:
-            # Create backup of corrupted file
-            backup_path = f"{file_path}.backup.{int(time.time())}"
-            os.rename(file_path, backup_path)
-            print(f"💾 Created backup: {backup_path}")
-            
-            # Create new valid file
-            new_data = {
-                "metadata": {
-                    "version": "1.0",
-                    "created": datetime.datetime.now().isoformat(),
-                    "description": f"Object {file_type} labels (repaired)",
-                    "total_objects": 0
-                },
-                "objects": []
-            }
-            
-            # Use appropriate file lock based on file type
-            file_lock = self.found_file_lock if "found" in file_path else self.lost_file_lock
-            self._save_json(file_path, new_data, file_lock)
-            print(f"✅ Repaired {file_type} objects file")
-            
-        except Exception as e:
-            print(f"❌ Failed to repair {file_type} objects file: {e}")
-            # Try to restore from backup
+        """Cut off the incomplete last record left in label files by an interrupted write."""
+        for labels_file in (self.found_labels_file, self.lost_labels_file):
             try:
-                if os.path.exists(backup_path):
-                    os.rename(backup_path, file_path)
-                    print(f"🔄 Restored original file from backup")
-            except Exception as restore_e:
-                print(f"❌ Failed to restore from backup: {restore_e}")
+                if not os.path.exists(labels_file) or os.path.getsize(labels_file) == 0:
+                    continue
+                with open(labels_file, 'rb+') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) == b'\n':
+                        continue
+                    f.seek(0)
+                    content = f.read()
+                    valid_size = content.rfind(b'\n') + 1
+                    backup_path = f"{labels_file}.backup.{int(time.time())}"
+                    with open(backup_path, 'wb') as backup:
+                        backup.write(content[valid_size:])
+                    f.truncate(valid_size)
+                print(f"⚠️ Removed incomplete record from {labels_file}, saved to {backup_path}")
+            except Exception as e:
+                print(f"⚠️ Warning: Error checking label file {labels_file}: {e}")
@@ -1,7 +1,13 @@
 import copy
+import datetime
+import numpy as np
 
 
 class ObjectResultHistory:
+    __slots__ = ('object_id', 'global_id', 'source_id', 'frame_id', 'class_id', 'time_lost', 'time_stamp',
+                 'time_detected', 'last_update', 'cur_video_position', 'lost_frames', 'track', 'properties',
+                 'object_data')
+
     def __init__(self):
         self.object_id = 0
         self.global_id = None
@@ -18,10 +24,151 @@ class ObjectResultHistory:
         self.properties = dict()  # some object features in scene (i.e. is_moving, is_immovable, immovable_time, zone_visited, zone_time_spent etc)
         self.object_data = dict()  # internal object data
 
+    def to_dict(self):
+        # Replacement for __dict__ on slotted classes, fields are listed from base to derived class
+        fields = dict()
+        for cls in reversed(type(self).__mro__):
+            for name in cls.__dict__.get('__slots__', ()):
+                fields[name] = getattr(self, name, None)
+        return fields
+
+
+class _HistoryStorage:
+    __slots__ = ('elements', 'frame_ids', 'time_stamps', 'boxes', 'size')
+
+    def __init__(self, capacity: int):
+        self.elements: list[ObjectResultHistory | None] = [None] * capacity
+        self.frame_ids = np.full(capacity, -1, dtype=np.int64)
+        self.time_stamps = np.full(capacity, np.nan, dtype=np.float64)
+        self.boxes = np.zeros((capacity, 4), dtype=np.float32)
+        self.size = 0  # Число заполненных ячеек, запись возможна только после них
+
+
+class ObjectHistory:
+    """
+    Bounded history of an object: last max_len history elements together with frame ids, time stamps
+    (seconds) and bounding boxes of the elements stored in contiguous numpy arrays for vectorized queries.
+
+    History is a view of a shared storage of 2 * max_len rows. appended() returns a new view: the element is
+    written after the end of the current view and the oldest element is dropped by moving the view start,
+    so views held by objects of previously published snapshots are never changed. When the storage end is
+    reached the view is compacted into a new storage, therefore both append and eviction are amortized O(1).
+    """
+    __slots__ = ('max_len', '_storage', '_start', '_stop')
+
+    def __init__(self, max_len: int = 30):
+        self.max_len = max(int(max_len), 1)
+        self._storage: _HistoryStorage | None = None
+        self._start = 0
+        self._stop = 0
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __bool__(self):
+        return self._stop > self._start
+
+    def __iter__(self):
+        if self._storage is None:
+            return iter(())
+        return iter(self._storage.elements[self._start:self._stop])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        length = self._stop - self._start
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('history index out of range')
+        return self._storage.elements[self._start + index]
+
+    @property
+    def frame_ids(self) -> np.ndarray:
+        return self._column('frame_ids')
+
+    @property
+    def time_stamps(self) -> np.ndarray:
+        return self._column('time_stamps')
+
+    @property
+    def boxes(self) -> np.ndarray:
+        if self._storage is None:
+            return np.zeros((0, 4), dtype=np.float32)
+        return self._storage.boxes[self._start:self._stop]
+
+    def bottom_centers(self) -> np.ndarray:
+        """Middle points of the bottom sides of the boxes, N x 2"""
+        boxes = self.boxes
+        return np.stack(((boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]), axis=1)
+
+    def find_frame(self, frame_id) -> int:
+        """
+        :return: index of the element of given frame or -1
+        """
+        if frame_id is None:
+            return -1
+        found = np.flatnonzero(self.frame_ids == frame_id)
+        return int(found[0]) if len(found) else -1
+
+    def appended(self, element: ObjectResultHistory) -> 'ObjectHistory':
+        storage = self._storage
+        length = self._stop - self._start
+        start = self._start + 1 if length >= self.max_len else self._start
+        if storage is None or self._stop != storage.size or self._stop == len(storage.elements):
+            # Эта же история уже была дополнена или хранилище заполнено: переносим окно в новое хранилище
+            storage = self._compact(start)
+            start, stop = 0, self._stop - start
+        else:
+            stop = self._stop
+
+        storage.elements[stop] = element
+        storage.frame_ids[stop] = element.frame_id if element.frame_id is not None else -1
+        storage.time_stamps[stop] = ObjectHistory._to_seconds(element.time_stamp)
+        track = element.track
+        if track is not None and len(track.bounding_box) >= 4:
+            storage.boxes[stop] = track.bounding_box[:4]
+        storage.size = stop + 1
+
+        result = ObjectHistory(self.max_len)
+        result._storage = storage
+        result._start = start
+        result._stop = stop + 1
+        return result
+
+    def _compact(self, start: int) -> _HistoryStorage:
+        storage = _HistoryStorage(2 * self.max_len)
+        if self._storage is not None:
+            num = self._stop - start
+            storage.elements[:num] = self._storage.elements[start:self._stop]
+            storage.frame_ids[:num] = self._storage.frame_ids[start:self._stop]
+            storage.time_stamps[:num] = self._storage.time_stamps[start:self._stop]
+            storage.boxes[:num] = self._storage.boxes[start:self._stop]
+            storage.size = num
+        return storage
+
+    def _column(self, name: str) -> np.ndarray:
+        if self._storage is None:
+            return np.zeros(0, dtype=np.int64 if name == 'frame_ids' else np.float64)
+        return getattr(self._storage, name)[self._start:self._stop]
+
+    @staticmethod
+    def _to_seconds(time_stamp) -> float:
+        if time_stamp is None:
+            return np.nan
+        if isinstance(time_stamp, datetime.datetime):
+            return time_stamp.timestamp()
+        return float(time_stamp)
+
+
 class ObjectResult(ObjectResultHistory):
+    __slots__ = ('history', 'last_image', 'cur_video_pos')
+
     def __init__(self):
         super().__init__()
-        self.history: list[ObjectResultHistory] = []
+        self.history = ObjectHistory()
+        self.last_image = None
+        self.cur_video_pos = None
 
     def __str__(self):
         return f'ID: {self.object_id}, Source: {self.source_id}, Updated: {self.last_update}, Lost: {self.lost_frames}'
@@ -65,13 +212,50 @@ class ObjectResultList:
         for obj in self.objects:
             if frame_id == obj.frame_id:
                 objs.append(obj)
-            elif obj.history and use_history:
-                for hist in obj.history:
-                    if hist.frame_id == frame_id:
-                        objs.append(obj)
-                        break
+            elif use_history and obj.history.find_frame(frame_id) >= 0:
+                objs.append(obj)
 
         return objs
 
     def get_num_objects(self):
         return len(self.objects)
+
+
+class ObjectsSnapshot:
+    """
+    Immutable view of objects of one source published by ObjectsHandler after each update of the source.
+    Objects referenced by a snapshot are never modified: the handler replaces changed objects with updated copies.
+
+    updated_ids - ids of objects that appeared or got a new history element in this version,
+    lost_ids - ids of objects that became lost in this version,
+    previous - snapshot of the previous version of the source, the chain is cut by the handler after
+    a limited number of versions.
+    """
+    __slots__ = ('source_id', 'version', 'active', 'lost', 'updated_ids', 'lost_ids', 'previous')
+
+    def __init__(self, source_id, version: int, active: tuple, lost: tuple, updated_ids: frozenset,
+                 lost_ids: frozenset, previous=None):
+        self.source_id = source_id
+        self.version = version
+        self.active: tuple[ObjectResult, ...] = active
+        self.lost: tuple[ObjectResult, ...] = lost
+        self.updated_ids = updated_ids
+        self.lost_ids = lost_ids
+        self.previous: ObjectsSnapshot | None = previous
+
+    def get_changes_since(self, version: int) -> tuple[set, set]:
+        """
+        :return: ids of objects updated and ids of objects lost after given version. If the version is too old
+         to be found in the chain, all active and lost objects are reported
+        """
+        updated_ids = set()
+        lost_ids = set()
+        snapshot = self
+        while snapshot is not None and snapshot.version > version:
+            updated_ids |= snapshot.updated_ids
+            lost_ids |= snapshot.lost_ids
+            if snapshot.previous is None and snapshot.version > version + 1:
+                return {obj.object_id for obj in self.active}, {obj.object_id for obj in self.lost}
+            snapshot = snapshot.previous
+        updated_ids -= lost_ids
+        return updated_ids, lost_ids
@@ -7,14 +7,19 @@ import copy
 from ..core.base_class import EvilEyeBase
 from ..capture.video_capture_base import CaptureImage
 from ..utils import threading_events
+from ..utils import image_writer
+from ..utils import path_resolver
+from ..utils import object_data
+from ..utils.preview_renderer import PreviewRenderer
 from ..utils.utils import ObjectResultEncoder
 from queue import Queue
+from collections import deque
 from threading import Thread
 from threading import Condition, Lock
 from ..object_tracker.tracking_results import TrackingResult
 from ..object_tracker.tracking_results import TrackingResultList
 from timeit import default_timer as timer
-from .object_result import ObjectResultHistory, ObjectResult, ObjectResultList
+from .object_result import ObjectResultHistory, ObjectResult, ObjectResultList, ObjectsSnapshot, ObjectHistory
 from ..database_controller.db_adapter_objects import DatabaseAdapterObjects
 from .labeling_manager import LabelingManager
 from pympler import asizeof
@@ -40,8 +45,21 @@ class ObjectsHandler(EvilEyeBase):
         self.objs_queue = Queue()
         # Списки для хранения различных типов объектов
         self.new_objs: ObjectResultList = ObjectResultList()
-        self.active_objs: ObjectResultList = ObjectResultList()
-        self.lost_objs: ObjectResultList = ObjectResultList()
+        # Индексы объектов: (source_id, track_id) -> активный объект, object_id -> активный или потерянный объект
+        self.active_by_track: dict[tuple, ObjectResult] = dict()
+        self.objects_by_id: dict[int, ObjectResult] = dict()
+        # Объекты по источникам: source_id -> {object_id: объект} в порядке появления (потери)
+        self.active_by_source: dict[int, dict[int, ObjectResult]] = dict()
+        self.lost_by_source: dict[int, dict[int, ObjectResult]] = dict()
+        # Потерянные объекты всех источников в порядке потери
+        self.lost_order: deque[ObjectResult] = deque()
+        # Последние опубликованные снимки объектов по источникам, читаются без блокировки
+        self.snapshots: dict[int, ObjectsSnapshot] = dict()
+        self.snapshots_history_len = 100
+        self._snapshots_chains: dict[int, deque[ObjectsSnapshot]] = dict()
+        self._updated_ids: dict[int, set] = dict()
+        self._lost_ids: dict[int, set] = dict()
+        self._dirty_sources = set()
         self.history_len = 30
         self.lost_thresh = 5  # Порог перевода (в кадрах) в потерянные объекты
         self.max_active_objects = 100
@@ -56,6 +74,10 @@ class ObjectsHandler(EvilEyeBase):
         else:
             self.db_params = {}
             self.cameras_params = {}
+        self.preview_renderer = PreviewRenderer(self.db_params.get('preview_width', 300),
+                                                self.db_params.get('preview_height', 150),
+                                                self.db_params.get('preview_crop_margin', None))
+        self.object_data_trajectory_len = self.db_params.get('object_data_trajectory_len', None)
         # Условие для блокировки других потоков
         self.condition = Condition()
         self.lock = Lock()
@@ -66,13 +88,14 @@ class ObjectsHandler(EvilEyeBase):
         self.lost_store_time_secs = 10
         self.last_sources = dict()
 
-        self.snapshot = None
         self.subscribers = []
         # self.objects_file = open('roi_detector_exp_file3.txt', 'w')
         
         # Initialize labeling manager
-        base_dir = self.db_params.get('image_dir', 'EvilEyeData') if self.db_params else 'EvilEyeData'
-        self.labeling_manager = LabelingManager(base_dir=base_dir, cameras_params=self.cameras_params)
+        base_dir = self.db_params.get('image_dir') or 'EvilEyeData'
+        self.path_resolver = path_resolver.get_path_resolver(base_dir, self.cameras_params)
+        self.labeling_manager = LabelingManager(base_dir=base_dir, cameras_params=self.cameras_params,
+                                                path_resolver=self.path_resolver)
         
         # Initialize object_id counter from existing data
         self._init_object_id_counter()
@@ -115,6 +138,7 @@ class ObjectsHandler(EvilEyeBase):
         self.lost_thresh = self.params.get('lost_thresh', 5)
         self.max_active_objects = self.params.get('max_active_objects', 100)
         self.max_lost_objects = self.params.get('max_lost_objects', 100)
+        self.snapshots_history_len = self.params.get('snapshots_history_len', 100)
 
     def get_params_impl(self):
         params = dict()
@@ -123,6 +147,7 @@ class ObjectsHandler(EvilEyeBase):
         params['lost_thresh'] = self.lost_thresh
         params['max_active_objects'] = self.max_active_objects
         params['max_lost_objects'] = self.max_lost_objects
+        params['snapshots_history_len'] = self.snapshots_history_len
 
     def stop(self):
         # self.objects_file.close()
@@ -166,32 +191,54 @@ class ObjectsHandler(EvilEyeBase):
     def subscribe(self, *subscribers):
         self.subscribers = list(subscribers)
 
+    def get_object(self, object_id):
+        with self.lock:
+            return self.objects_by_id.get(object_id)
+
+    def get_snapshot(self, cam_id) -> ObjectsSnapshot | None:
+        return self.snapshots.get(cam_id)
+
+    def get_changes(self, cam_id, since_version: int) -> tuple[ObjectsSnapshot | None, set, set]:
+        """
+        Returns the latest snapshot of the source with ids of objects updated and lost after since_version
+        """
+        snapshot = self.snapshots.get(cam_id)
+        if snapshot is None:
+            return None, set(), set()
+        updated_ids, lost_ids = snapshot.get_changes_since(since_version)
+        return snapshot, updated_ids, lost_ids
+
+    @property
+    def active_objs(self) -> ObjectResultList:
+        result = ObjectResultList()
+        result.objects = list(self.active_by_track.values())
+        return result
+
+    @property
+    def lost_objs(self) -> ObjectResultList:
+        result = ObjectResultList()
+        result.objects = list(self.lost_order)
+        return result
+
     def _get_active(self, cam_id):
         source_objects = ObjectResultList()
-        if self.snapshot is None:
-            return source_objects
-        for obj in self.snapshot:
-            if obj.source_id == cam_id:
-                source_objects.objects.append(obj)
+        snapshot = self.snapshots.get(cam_id)
+        if snapshot is not None:
+            source_objects.objects = snapshot.active
         return source_objects
 
     def _get_lost(self, cam_id):
-        with self.lock:
-            source_objects = ObjectResultList()
-            for obj in self.lost_objs.objects:
-                if obj.source_id == cam_id:
-                    source_objects.objects.append(obj)
+        source_objects = ObjectResultList()
+        snapshot = self.snapshots.get(cam_id)
+        if snapshot is not None:
+            source_objects.objects = snapshot.lost
         return source_objects
 
     def _get_all(self, cam_id):
-        with self.lock:
-            source_objects = ObjectResultList()
-            for obj in self.active_objs.objects:
-                if obj.source_id == cam_id:
-                    source_objects.objects.append(obj)
-            for obj in self.lost_objs.objects:
-                if obj.source_id == cam_id:
-                    source_objects.objects.append(obj)
+        source_objects = ObjectResultList()
+        snapshot = self.snapshots.get(cam_id)
+        if snapshot is not None:
+            source_objects.objects = snapshot.active + snapshot.lost
         return source_objects
 
     def handle_objs(self):  # Функция, отвечающая за работу с объектами
@@ -208,26 +255,27 @@ class ObjectsHandler(EvilEyeBase):
             with self.lock:
                 # self.condition.acquire()
                 self._handle_active(tracks, image)
-                if self.active_objs.objects:
-                    self.snapshot = self.active_objs.objects
-                else:
-                    self.snapshot = None
+                self._publish_snapshots()
 
             for subscriber in self.subscribers:
                 subscriber.update()
 
     def _handle_active(self, tracking_results: TrackingResultList, image):
-        for active_obj in self.active_objs.objects:
-            active_obj.last_update = False
+        source_id = tracking_results.source_id
+        source_active = self.active_by_source.setdefault(source_id, dict())
+        self._dirty_sources.add(source_id)
+        updated_ids = self._updated_ids.setdefault(source_id, set())
+        lost_ids = self._lost_ids.setdefault(source_id, set())
+        frame_updated_ids = set()
 
         for track in tracking_results.tracks:
-            track_object = None
-            for active_obj in self.active_objs.objects:
-                if active_obj.track.track_id == track.track_id:
-                    track_object = active_obj
-                    break
+            # Tracker internals are only needed up to multi-camera tracking; don't keep them alive in histories
+            track.tracking_data.pop('track_object', None)
+            track_object = self.active_by_track.get((source_id, track.track_id))
 
             if track_object:
+                # Опубликованные в снимках объекты не изменяются, вместо них сохраняется обновленная копия
+                track_object = copy.copy(track_object)
                 track_object.source_id = tracking_results.source_id
                 track_object.frame_id = tracking_results.frame_id
                 track_object.class_id = track.class_id
@@ -235,11 +283,12 @@ class ObjectsHandler(EvilEyeBase):
                 track_object.time_stamp = tracking_results.time_stamp
                 track_object.last_image = image
                 track_object.cur_video_pos = image.current_video_position
-                track_object.history.append(track_object.get_current_history_element())
-                if len(track_object.history) > self.history_len:  # Если количество данных превышает размер истории, удаляем самые старые данные об объекте
-                    del track_object.history[0]
+                # Если количество данных превышает размер истории, самые старые данные об объекте удаляются
+                track_object.history = track_object.history.appended(track_object.get_current_history_element())
                 track_object.last_update = True
                 track_object.lost_frames = 0
+                self._add_active(track_object)
+                frame_updated_ids.add(track_object.object_id)
             else:
                 obj = ObjectResult()
                 obj.source_id = tracking_results.source_id
@@ -253,7 +302,8 @@ class ObjectsHandler(EvilEyeBase):
                 obj.cur_video_pos = image.current_video_position
                 self.object_id_counter += 1
                 obj.track = track
-                obj.history.append(obj.get_current_history_element())
+                obj.last_update = True
+                obj.history = ObjectHistory(self.history_len).appended(obj.get_current_history_element())
                 start_insert_it = timer()
                 if self.db_adapter is not None:
                     self.db_adapter.insert(obj)
@@ -280,15 +330,18 @@ class ObjectsHandler(EvilEyeBase):
                 except Exception as e:
                     print(f"Error saving labeling data for found object: {e}")
                 
-                self.active_objs.objects.append(obj)
-               # print(f"active_objs len={len(self.active_objs.objects)} size={asizeof.asizeof(self.active_objs.objects)/(1024.0*1024.0)}")
-               # print(f"lost_objs len={len(self.lost_objs.objects)} size={asizeof.asizeof(self.lost_objs.objects)/(1024.0*1024.0)}")
-
-        filtered_active_objects = []
-        for active_obj in self.active_objs.objects:
-            if not active_obj.last_update and active_obj.source_id == tracking_results.source_id:
+                self._add_active(obj)
+                frame_updated_ids.add(obj.object_id)
+
+        updated_ids |= frame_updated_ids
+        for active_obj in list(source_active.values()):
+            if active_obj.object_id not in frame_updated_ids:
+                active_obj = copy.copy(active_obj)
+                active_obj.last_update = False
                 active_obj.lost_frames += 1
-                if active_obj.lost_frames >= self.lost_thresh:
+                if active_obj.lost_frames < self.lost_thresh:
+                    self._add_active(active_obj)
+                else:
                     active_obj.time_lost = datetime.datetime.now()
                     start_update_it = timer()
                     if self.db_adapter is not None:
@@ -316,25 +369,58 @@ class ObjectsHandler(EvilEyeBase):
                     except Exception as e:
                         print(f"Error saving labeling data for lost object: {e}")
                     
-                    self.lost_objs.objects.append(active_obj)
-                else:
-                    filtered_active_objects.append(active_obj)
-            else:
-                filtered_active_objects.append(active_obj)
-        self.active_objs.objects = filtered_active_objects
-
-        start_index_for_remove = None
-        for i in reversed(range(len(self.lost_objs.objects))):
-            if (datetime.datetime.now() - self.lost_objs.objects[i].time_lost).total_seconds() > self.lost_store_time_secs:
-                start_index_for_remove = i
-                break
-        if start_index_for_remove is not None:
-            self.lost_objs.objects = self.lost_objs.objects[start_index_for_remove:]
-
-        if len(self.active_objs.objects) > self.max_active_objects:
-            self.active_objs.objects = self.active_objs.objects[-self.max_active_objects:]
-        if len(self.lost_objs.objects) > self.max_lost_objects:
-            self.lost_objs.objects = self.lost_objs.objects[-self.max_lost_objects:]
+                    self._move_to_lost(active_obj)
+                    lost_ids.add(active_obj.object_id)
+
+        now = datetime.datetime.now()
+        while self.lost_order and (now - self.lost_order[0].time_lost).total_seconds() > self.lost_store_time_secs:
+            self._remove_oldest_lost()
+
+        while len(self.active_by_track) > self.max_active_objects:
+            self._remove_active(next(iter(self.active_by_track.values())))
+        while len(self.lost_order) > self.max_lost_objects:
+            self._remove_oldest_lost()
+
+    def _add_active(self, obj: ObjectResult):
+        self.active_by_track[(obj.source_id, obj.track.track_id)] = obj
+        self.active_by_source.setdefault(obj.source_id, dict())[obj.object_id] = obj
+        self.objects_by_id[obj.object_id] = obj
+
+    def _remove_active(self, obj: ObjectResult):
+        self._dirty_sources.add(obj.source_id)
+        self.active_by_track.pop((obj.source_id, obj.track.track_id), None)
+        self.active_by_source[obj.source_id].pop(obj.object_id, None)
+        self.objects_by_id.pop(obj.object_id, None)
+
+    def _move_to_lost(self, obj: ObjectResult):
+        self._remove_active(obj)
+        self.lost_by_source.setdefault(obj.source_id, dict())[obj.object_id] = obj
+        self.lost_order.append(obj)
+        self.objects_by_id[obj.object_id] = obj
+
+    def _remove_oldest_lost(self):
+        obj = self.lost_order.popleft()
+        self._dirty_sources.add(obj.source_id)
+        self.lost_by_source[obj.source_id].pop(obj.object_id, None)
+        self.objects_by_id.pop(obj.object_id, None)
+
+    def _publish_snapshots(self):
+        for source_id in self._dirty_sources:
+            previous = self.snapshots.get(source_id)
+            snapshot = ObjectsSnapshot(source_id, previous.version + 1 if previous is not None else 1,
+                                       tuple(self.active_by_source.get(source_id, {}).values()),
+                                       tuple(self.lost_by_source.get(source_id, {}).values()),
+                                       frozenset(self._updated_ids.pop(source_id, ())),
+                                       frozenset(self._lost_ids.pop(source_id, ())),
+                                       previous)
+            chain = self._snapshots_chains.setdefault(source_id, deque())
+            chain.append(snapshot)
+            if len(chain) > self.snapshots_history_len:
+                chain.popleft()
+                chain[0].previous = None
+            # Замена ссылки атомарна, читатели получают либо старый, либо новый снимок целиком
+            self.snapshots[source_id] = snapshot
+        self._dirty_sources.clear()
 
     def _prepare_for_saving(self, obj: ObjectResult, image_width, image_height) -> tuple[list, list, str, str]:
         fields_for_saving = {'source_id': obj.source_id,
@@ -350,17 +436,13 @@ class ObjectsHandler(EvilEyeBase):
                              'lost_preview_path': None,
                              'frame_path': self._get_img_path('frame', 'detected', obj),
                              'lost_frame_path': None,
-                             'object_data': json.dumps(obj.__dict__, cls=ObjectResultEncoder),
+                             'object_data': object_data.encode_object_data(obj, self.object_data_trajectory_len),
                              'project_id': self.db_controller.get_project_id() if self.db_controller is not None else 0,
                              'job_id': self.db_controller.get_job_id() if self.db_controller is not None else 0,
                              'camera_full_address': ''}
 
-        for camera in self.cameras_params:
-            if obj.source_id in camera['source_ids']:
-                id_idx = camera['source_ids'].index(obj.source_id)
-                fields_for_saving['source_name'] = camera['source_names'][id_idx]
-                fields_for_saving['camera_full_address'] = camera['camera']
-                break
+        fields_for_saving['source_name'] = self.path_resolver.get_source_name(obj.source_id)
+        fields_for_saving['camera_full_address'] = self.path_resolver.get_camera_address(obj.source_id)
 
         fields_for_saving['bounding_box'] = copy.deepcopy(fields_for_saving['bounding_box'])
         fields_for_saving['bounding_box'][0] /= image_width
@@ -375,7 +457,7 @@ class ObjectsHandler(EvilEyeBase):
                                'time_lost': obj.time_lost,
                                'lost_preview_path': self._get_img_path('preview', 'lost', obj),
                                'lost_frame_path': self._get_img_path('frame', 'lost', obj),
-                               'object_data': json.dumps(obj.__dict__, cls=ObjectResultEncoder)}
+                               'object_data': object_data.encode_object_data(obj, self.object_data_trajectory_len)}
 
         fields_for_updating['lost_bounding_box'] = copy.deepcopy(fields_for_updating['lost_bounding_box'])
         fields_for_updating['lost_bounding_box'][0] /= image_width
@@ -407,24 +489,14 @@ class ObjectsHandler(EvilEyeBase):
             img_path = self._get_img_path(image_type, obj_event_type, obj)
             
             # Resolve full path
-            if 'image_dir' in self.db_params and self.db_params['image_dir']:
-                save_dir = self.db_params['image_dir']
-            else:
-                save_dir = 'EvilEyeData'  # Default directory
-                
+            save_dir = self.path_resolver.base_dir
             if not os.path.isabs(save_dir):
                 save_dir = os.path.join(os.getcwd(), save_dir)
             
             full_img_path = os.path.join(save_dir, img_path)
             
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(full_img_path), exist_ok=True)
-            
-            # Save image using the same logic as database journal
+            # Encoding and writing are done by the shared image writer, not on the handler thread
             if image_type == 'preview':
-                # Create preview with bounding box (same as database journal)
-                preview = cv2.resize(copy.deepcopy(image.image), (self.db_params.get('preview_width', 300), self.db_params.get('preview_height', 150)), cv2.INTER_NEAREST)
-                
                 # Convert bounding box to normalized coordinates (same as database journal)
                 image_height, image_width, _ = image.image.shape
                 normalized_box = [
@@ -433,53 +505,22 @@ class ObjectsHandler(EvilEyeBase):
                     box[2] / image_width,   # width
                     box[3] / image_height   # height
                 ]
-                
-                preview_boxes = utils.draw_preview_boxes(preview, self.db_params.get('preview_width', 300), self.db_params.get('preview_height', 150), normalized_box)
-                saved = cv2.imwrite(full_img_path, preview_boxes)
+                # Create preview with bounding box (same as database journal)
+                image_writer.get_image_writer().write(full_img_path,
+                                                      lambda: self.preview_renderer.render(image, normalized_box))
             else:
                 # Save original frame without any graphical info (same as database journal)
-                saved = cv2.imwrite(full_img_path, image.image)
-            
-            if not saved:
-                print(f'ERROR: can\'t save image file {full_img_path}')
+                image_writer.get_image_writer().write_frame(full_img_path, image)
 
         except Exception as e:
             print(f"Error saving image: {e}")
 
     def _get_img_path(self, image_type, obj_event_type, obj):
-        # Use default image directory if database is not available
-        if 'image_dir' in self.db_params and self.db_params['image_dir']:
-            save_dir = self.db_params['image_dir']
-        else:
-            save_dir = 'EvilEyeData'  # Default directory
-        img_dir = os.path.join(save_dir, 'images')
-        cur_date = datetime.date.today()
-        cur_date_str = cur_date.strftime('%Y_%m_%d')
-
-        current_day_path = os.path.join(img_dir, cur_date_str)
-        obj_type_path = os.path.join(current_day_path, obj_event_type + '_' + image_type + 's')
-        # obj_event_path = os.path.join(current_day_path, obj_event_type)
-        if not os.path.exists(img_dir):
-            os.makedirs(img_dir, exist_ok=True)
-        if not os.path.exists(current_day_path):
-            os.makedirs(current_day_path, exist_ok=True)
-        if not os.path.exists(obj_type_path):
-            os.makedirs(obj_type_path, exist_ok=True)
-        # if not os.path.exists(obj_event_path):
-        #     os.mkdir(obj_event_path)
-
-        # Get source name for the object
-        source_name = ''
-        for camera in self.cameras_params:
-            if obj.source_id in camera['source_ids']:
-                id_idx = camera['source_ids'].index(obj.source_id)
-                source_name = camera['source_names'][id_idx]
-                break
-        
+        # Каталоги дня и имена источников кэшируются в path_resolver, смена дня происходит в полночь
+        source_name = self.path_resolver.get_source_name(obj.source_id)
         if obj_event_type == 'detected':
             timestamp = obj.time_stamp.strftime('%Y_%m_%d_%H_%M_%S.%f')
-            img_path = os.path.join(obj_type_path, f'{timestamp}_{source_name}_{image_type}.jpeg')
-        elif obj_event_type == 'lost':
+        else:
             timestamp = obj.time_lost.strftime('%Y_%m_%d_%H_%M_%S_%f')
-            img_path = os.path.join(obj_type_path, f'{timestamp}_{source_name}_{image_type}.jpeg')
-        return os.path.relpath(img_path, save_dir)
+        return self.path_resolver.get_image_path(obj_event_type, image_type,
+                                                 f'{timestamp}_{source_name}_{image_type}.jpeg')
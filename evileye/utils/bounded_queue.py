@@ -0,0 +1,278 @@
+import os
+import pickle
+import struct
+from enum import Enum
+from queue import Queue, Full, Empty
+from time import monotonic
+from typing import Callable
+
+DEFAULT_SPILL_DIR = os.path.join('EvilEyeData', 'queues')
+
+
+class OverflowPolicy(Enum):
+    Block = 'block'  # Производитель ждет освобождения места в очереди
+    DropOldest = 'drop_oldest'  # Самый старый элемент удаляется, чтобы освободить место новому
+    Spill = 'spill'  # Элементы сверх max_size записываются в журнал на диске и возвращаются в очередь по мере ее разбора
+
+
+class BoundedQueue(Queue):
+    """
+    Queue between pipeline stages holding at most max_size items in memory with a policy applied when it is full.
+
+    With Spill policy items that do not fit are pickled to a journal file at spill_path and read back in order
+    as the consumer takes items from memory, qsize() and empty() count journaled items too. Items left in
+    the journal when the process stopped are replayed by the next queue created with the same spill_path.
+    Items that could not be pickled, written or read back are dropped.
+    on_drop(item) is called on the producer thread for every dropped item, so resources held by it (i.e. frames
+    in FrameCache) can be released. Frames referenced by spilled items stay in the cache until they are evicted.
+    close() is called when the consumer stopped: after it a full queue drops new items instead of blocking.
+    """
+
+    _header = struct.Struct('<I')
+
+    def __init__(self, max_size: int = 1000, overflow_policy: str | OverflowPolicy = OverflowPolicy.Block,
+                 spill_path: str | None = None, on_drop: Callable | None = None):
+        self.max_size = max(1, max_size)
+        self.overflow_policy = OverflowPolicy(overflow_policy)
+        if self.overflow_policy is OverflowPolicy.Spill and not spill_path:
+            raise ValueError('spill_path is required for spill overflow policy')
+        self.spill_path = spill_path
+        self.on_drop = on_drop
+        self.closed = False
+
+        self._spill_file = None
+        self._spill_read_pos = 0
+        self.num_pending_spilled = 0  # Элементы в журнале, еще не возвращенные в очередь
+
+        self.num_dropped = 0
+        self.num_spilled = 0
+        self.num_replayed = 0
+        self.num_blocked = 0
+        self.blocked_time_secs = 0.0
+        self.max_size_reached = 0
+        # Ограничение размера реализовано в put, поэтому базовая очередь создается неограниченной
+        super().__init__()
+        if self.overflow_policy is OverflowPolicy.Spill:
+            self._open_journal()
+
+    def put(self, item, block=True, timeout=None):
+        dropped = []
+        with self.not_full:
+            accepted = True
+            if len(self.queue) >= self.max_size or self.num_pending_spilled:
+                if self.overflow_policy is OverflowPolicy.Block:
+                    self._wait_not_full(block, timeout)
+                    accepted = len(self.queue) < self.max_size
+                    if accepted:
+                        self.queue.append(item)
+                elif self.overflow_policy is OverflowPolicy.DropOldest:
+                    dropped.append(self.queue.popleft())
+                    self.unfinished_tasks -= 1
+                    self.queue.append(item)
+                else:
+                    accepted = self._spill(item)
+            else:
+                self.queue.append(item)
+            if accepted:
+                self.unfinished_tasks += 1
+                self.max_size_reached = max(self.max_size_reached, self._qsize())
+                self.not_empty.notify()
+            else:
+                dropped.append(item)
+            self.num_dropped += len(dropped)
+        if self.on_drop is not None:
+            for dropped_item in dropped:
+                self.on_drop(dropped_item)
+
+    def get(self, block=True, timeout=None):
+        # Элементы журнала, которые не удалось прочитать, отбрасываются, и ожидание продолжается,
+        # поэтому get() возвращает только прочитанные элементы
+        with self.not_empty:
+            if timeout is not None and timeout < 0:
+                raise ValueError("'timeout' must be a non-negative number")
+            end_it = monotonic() + timeout if timeout is not None else None
+            while True:
+                self._replay_pending()
+                if self.queue:
+                    break
+                if not block:
+                    raise Empty
+                if end_it is None:
+                    self.not_empty.wait()
+                else:
+                    remaining = end_it - monotonic()
+                    if remaining <= 0.0:
+                        raise Empty
+                    self.not_empty.wait(remaining)
+            item = self.queue.popleft()
+            self.not_full.notify()
+            return item
+
+    def full(self):
+        with self.mutex:
+            return len(self.queue) >= self.max_size
+
+    def close(self):
+        """
+        Wakes blocked producers and stops blocking new ones. Journaled items are not replayed any more,
+        they are left in the journal for the next queue with the same spill_path
+        """
+        with self.mutex:
+            self.closed = True
+            self.not_full.notify_all()
+            if self._spill_file is not None:
+                self._compact_journal()
+                self._spill_file.close()
+                self._spill_file = None
+                self._discard_tasks(self.num_pending_spilled)
+                self.num_pending_spilled = 0
+
+    def get_debug_info(self) -> dict:
+        with self.mutex:
+            return {'size': self._qsize(),
+                    'max_size': self.max_size,
+                    'overflow_policy': self.overflow_policy.value,
+                    'max_size_reached': self.max_size_reached,
+                    'dropped': self.num_dropped,
+                    'spilled': self.num_spilled,
+                    'replayed': self.num_replayed,
+                    'pending_spilled': self.num_pending_spilled,
+                    'blocked': self.num_blocked,
+                    'blocked_time_secs': self.blocked_time_secs}
+
+    def _wait_not_full(self, block, timeout):
+        if not block:
+            raise Full
+        self.num_blocked += 1
+        begin_it = monotonic()
+        try:
+            if timeout is None:
+                while len(self.queue) >= self.max_size and not self.closed:
+                    self.not_full.wait()
+            elif timeout < 0:
+                raise ValueError("'timeout' must be a non-negative number")
+            else:
+                end_it = begin_it + timeout
+                while len(self.queue) >= self.max_size and not self.closed:
+                    remaining = end_it - monotonic()
+                    if remaining <= 0.0:
+                        raise Full
+                    self.not_full.wait(remaining)
+        finally:
+            self.blocked_time_secs += monotonic() - begin_it
+
+    # Методы ниже вызываются базовым классом под self.mutex
+    def _qsize(self):
+        return len(self.queue) + self.num_pending_spilled
+
+    def _replay_pending(self):
+        # Журнал дочитывается в память по мере освобождения места, порядок элементов сохраняется
+        while self.num_pending_spilled and len(self.queue) < self.max_size:
+            self._replay_one()
+
+    def _discard_tasks(self, num: int):
+        # Отброшенные элементы не будут обработаны потребителем, join() не должен их ждать
+        if num <= 0:
+            return
+        self.unfinished_tasks -= num
+        if self.unfinished_tasks <= 0:
+            self.unfinished_tasks = 0
+            self.all_tasks_done.notify_all()
+
+    def _spill(self, item) -> bool:
+        if self._spill_file is None:
+            return False
+        try:
+            data = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+        try:
+            self._spill_file.seek(0, os.SEEK_END)
+            self._spill_file.write(self._header.pack(len(data)))
+            self._spill_file.write(data)
+            self._spill_file.flush()
+        except OSError:
+            return False
+        self.num_pending_spilled += 1
+        self.num_spilled += 1
+        return True
+
+    def _replay_one(self):
+        try:
+            self._spill_file.seek(self._spill_read_pos)
+            header = self._spill_file.read(self._header.size)
+            size, = self._header.unpack(header)
+            data = self._spill_file.read(size)
+            if len(data) < size:
+                raise ValueError('journal record is truncated')
+            self._spill_read_pos = self._spill_file.tell()
+        except (OSError, ValueError, struct.error):
+            # Журнал недоступен или поврежден, оставшиеся в нем элементы теряются
+            self.num_dropped += self.num_pending_spilled
+            self._discard_tasks(self.num_pending_spilled)
+            self.num_pending_spilled = 0
+            self._reset_journal()
+            return
+        self.num_pending_spilled -= 1
+        try:
+            self.queue.append(pickle.loads(data))
+            self.num_replayed += 1
+        except Exception:
+            self.num_dropped += 1
+            self._discard_tasks(1)
+        if not self.num_pending_spilled:
+            self._reset_journal()
+
+    def _reset_journal(self):
+        self._spill_read_pos = 0
+        try:
+            self._spill_file.truncate(0)
+        except (OSError, ValueError):
+            pass
+
+    def _compact_journal(self):
+        # Уже возвращенные в очередь записи удаляются из начала журнала
+        if not self._spill_read_pos:
+            return
+        try:
+            self._spill_file.seek(self._spill_read_pos)
+            data = self._spill_file.read()
+            self._spill_file.truncate(0)
+            self._spill_file.write(data)
+            self._spill_file.flush()
+            self._spill_read_pos = 0
+        except (OSError, ValueError):
+            pass
+
+    def _open_journal(self):
+        try:
+            spill_dir = os.path.dirname(self.spill_path)
+            if spill_dir:
+                os.makedirs(spill_dir, exist_ok=True)
+            self._spill_file = open(self.spill_path, 'a+b')
+        except OSError as e:
+            print(f'Queue journal {self.spill_path} could not be opened, items that do not fit will be dropped: {e}')
+            self._spill_file = None
+            return
+        # Элементы, оставшиеся в журнале после предыдущего запуска, возвращаются в очередь первыми
+        self._spill_file.seek(0)
+        valid_pos = 0
+        while True:
+            header = self._spill_file.read(self._header.size)
+            if len(header) < self._header.size:
+                break
+            size, = self._header.unpack(header)
+            if len(self._spill_file.read(size)) < size:
+                break
+            valid_pos = self._spill_file.tell()
+            self.num_pending_spilled += 1
+        # Недописанная запись в конце журнала отбрасывается
+        self._spill_file.truncate(valid_pos)
+        self.unfinished_tasks += self.num_pending_spilled
+
+
+def create_queue(name: str, max_size: int, overflow_policy: str, spill_dir: str | None,
+                 on_drop: Callable | None = None) -> BoundedQueue:
+    """Queue of a pipeline stage, the journal of spill policy is spill_dir/name.journal"""
+    spill_path = os.path.join(spill_dir or DEFAULT_SPILL_DIR, f'{name}.journal')
+    return BoundedQueue(max_size, overflow_policy, spill_path, on_drop)
@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+
+
+class FrameRef:
+    """
+    Reference of an event to a frame in FrameCache: source id, frame id, frame size and generation of the cache
+    entry, so a reference to a dropped entry doesn't affect an entry of the same frame acquired later
+    """
+    __slots__ = ('source_id', 'frame_id', 'width', 'height', 'generation')
+
+    def __init__(self, source_id, frame_id, width: int, height: int, generation: int = 0):
+        self.source_id = source_id
+        self.frame_id = frame_id
+        self.width = width
+        self.height = height
+        self.generation = generation
+
+    def get_key(self) -> tuple:
+        return self.source_id, self.frame_id
+
+
+class FrameCache:
+    """
+    Short-lived bounded cache of frames referenced by events.
+
+    Detectors put the frame of an event with acquire() and keep only the returned FrameRef, the image is
+    materialized with get() by the consumer that needs it (database adapter writing previews and frames).
+    Every acquire() is acknowledged by one release() and the frame leaves the cache when all its references
+    are released. The cache holds at most max_frames frames: if it is full, the oldest frame is dropped even
+    if it is still referenced, get() returns None for it and the image of such event is not saved.
+    Every entry has its own generation: get() and release() of references to a dropped entry are ignored
+    even if the same frame was acquired again.
+    """
+
+    def __init__(self, max_frames: int = 64):
+        self.max_frames = max_frames
+        # (айди источника, айди кадра): [кадр, число ссылок, поколение записи]
+        self._frames: OrderedDict[tuple, list] = OrderedDict()
+        self._last_generation = 0
+        self._lock = threading.Lock()
+
+        self.num_acquired = 0
+        self.num_released = 0
+        self.num_evicted = 0
+        self.num_misses = 0
+        self.num_stale_releases = 0
+        self.max_size_reached = 0
+
+    def set_max_frames(self, max_frames: int):
+        with self._lock:
+            self.max_frames = max(1, max_frames)
+            self._evict()
+
+    def acquire(self, image) -> FrameRef | None:
+        """
+        :param image: CaptureImage, it must not be modified after capture
+        :return: reference to the frame or None if there is no image
+        """
+        if image is None or image.image is None:
+            return None
+        height, width = image.image.shape[:2]
+        key = (image.source_id, image.frame_id)
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is None:
+                self._last_generation += 1
+                entry = self._frames[key] = [image, 0, self._last_generation]
+                self._evict()
+                self.max_size_reached = max(self.max_size_reached, len(self._frames))
+            entry[1] += 1
+            self.num_acquired += 1
+            generation = entry[2]
+        return FrameRef(image.source_id, image.frame_id, width, height, generation)
+
+    def acquire_cached(self, source_id, frame_id) -> FrameRef | None:
+        """
+        Adds a reference to the frame if it is still in the cache
+        :return: reference to the frame or None if the frame is not cached
+        """
+        with self._lock:
+            entry = self._frames.get((source_id, frame_id))
+            if entry is None:
+                self.num_misses += 1
+                return None
+            entry[1] += 1
+            self.num_acquired += 1
+            height, width = entry[0].image.shape[:2]
+            generation = entry[2]
+        return FrameRef(source_id, frame_id, width, height, generation)
+
+    def acquire_history_frame(self, obj, element) -> FrameRef | None:
+        """
+        Adds a reference to the frame of a history element of the object: the last image of the object
+        if it is the frame of the element or the frame of the element still in the cache
+        :return: reference to the frame or None if the frame of the element is not available
+        """
+        image = obj.last_image
+        if image is not None and image.frame_id == element.frame_id:
+            return self.acquire(image)
+        return self.acquire_cached(element.source_id, element.frame_id)
+
+    def get(self, ref: FrameRef | None):
+        """
+        :return: CaptureImage of the reference or None if it was dropped from the cache
+        """
+        if ref is None:
+            return None
+        with self._lock:
+            entry = self._frames.get(ref.get_key())
+            if entry is None or entry[2] != ref.generation:
+                self.num_misses += 1
+                return None
+            return entry[0]
+
+    def release(self, ref: FrameRef | None):
+        if ref is None:
+            return
+        key = ref.get_key()
+        with self._lock:
+            self.num_released += 1
+            entry = self._frames.get(key)
+            if entry is None or entry[2] != ref.generation:
+                # Запись ссылки уже вытеснена, ссылки на новую запись того же кадра не затрагиваются
+                self.num_stale_releases += 1
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._frames[key]
+
+    def get_debug_info(self) -> dict:
+        with self._lock:
+            return {'size': len(self._frames),
+                    'max_frames': self.max_frames,
+                    'max_size_reached': self.max_size_reached,
+                    'references': sum(entry[1] for entry in self._frames.values()),
+                    'acquired': self.num_acquired,
+                    'released': self.num_released,
+                    'evicted': self.num_evicted,
+                    'misses': self.num_misses,
+                    'stale_releases': self.num_stale_releases}
+
+    def _evict(self):
+        while len(self._frames) > self.max_frames:
+            self._frames.popitem(last=False)
+            self.num_evicted += 1
+
+
+_frame_cache = FrameCache()
+
+
+def get_frame_cache() -> FrameCache:
+    """Cache shared by events detectors, events processor and database adapters of the process"""
+    return _frame_cache
+
+
+def release_event_frames(events):
+    """Releases frames of events that will not reach a database adapter"""
+    for event in events:
+        for frame in event.get_frames():
+            _frame_cache.release(frame)
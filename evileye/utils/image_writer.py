@@ -0,0 +1,186 @@
+import os
+import threading
+from collections import OrderedDict
+from queue import Queue, Full
+from timeit import default_timer as timer
+from typing import Callable, Hashable
+import cv2
+import numpy as np
+
+
+class ImageWriter:
+    """
+    Background encoder and writer of snapshot images (previews and full frames) shared by objects handler,
+    database adapters and events.
+
+    Writes are put to a bounded queue and processed by a pool of threads: cv2 releases GIL while encoding,
+    so threads are enough to take the work off the producer threads. A producer blocks only when the queue
+    is full, time spent in such waits is reported in debug info as backpressure.
+    Writes of the same file are deduplicated while pending, images with the same key (i.e. the same frame
+    of the same source) are encoded once and the encoded bytes are reused for all paths.
+    Images are referenced, not copied: frames must not be modified after they were captured.
+    """
+
+    def __init__(self, num_workers: int = 2, max_queue_size: int = 256, encoded_cache_size: int = 32):
+        self.num_workers = num_workers
+        self.queue = Queue(maxsize=max_queue_size)
+        self.encoded_cache_size = encoded_cache_size
+        self._encoded: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self._pending_paths = set()
+        self._lock = threading.Lock()
+        self._workers = []
+        self.run_flag = False
+
+        self.num_submitted = 0
+        self.num_written = 0
+        self.num_deduplicated = 0
+        self.num_encoded = 0
+        self.num_errors = 0
+        self.num_blocked = 0
+        self.blocked_time_secs = 0.0
+        self.write_time_secs = 0.0
+        self.max_queue_size_reached = 0
+
+    def start(self):
+        if self.run_flag:
+            return
+        self.run_flag = True
+        self._workers = [threading.Thread(target=self._run, daemon=True) for _ in range(self.num_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def stop(self, flush: bool = True):
+        if not self.run_flag:
+            return
+        if flush:
+            self.queue.join()
+        self.run_flag = False
+        for _ in self._workers:
+            self.queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def flush(self):
+        """Waits until all submitted images are written"""
+        self.queue.join()
+
+    def write(self, path: str, render: Callable[[], np.ndarray], key: Hashable | None = None) -> bool:
+        """
+        Schedules writing of the image returned by render() to path. render is called on a writer thread
+        :param key: identity of the rendered image, images with equal keys are encoded once
+        :return: False if the same file is already waiting to be written
+        """
+        with self._lock:
+            if path in self._pending_paths:
+                self.num_deduplicated += 1
+                return False
+            self._pending_paths.add(path)
+            self.num_submitted += 1
+
+        task = (path, render, key)
+        try:
+            self.queue.put_nowait(task)
+        except Full:
+            begin_it = timer()
+            self.queue.put(task)
+            with self._lock:
+                self.num_blocked += 1
+                self.blocked_time_secs += timer() - begin_it
+        with self._lock:
+            self.max_queue_size_reached = max(self.max_queue_size_reached, self.queue.qsize())
+        return True
+
+    def write_frame(self, path: str, image) -> bool:
+        """Schedules writing of the full frame of CaptureImage without any graphical info"""
+        return self.write(path, lambda: image.image, key=('frame', image.source_id, image.frame_id))
+
+    def get_debug_info(self) -> dict:
+        with self._lock:
+            return {'queue_size': self.queue.qsize(),
+                    'max_queue_size': self.queue.maxsize,
+                    'max_queue_size_reached': self.max_queue_size_reached,
+                    'submitted': self.num_submitted,
+                    'written': self.num_written,
+                    'encoded': self.num_encoded,
+                    'deduplicated': self.num_deduplicated,
+                    'errors': self.num_errors,
+                    'blocked': self.num_blocked,
+                    'blocked_time_secs': self.blocked_time_secs,
+                    'avg_write_time_ms': 1000.0 * self.write_time_secs / self.num_written if self.num_written else 0.0}
+
+    def _run(self):
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    break
+                path, render, key = task
+                begin_it = timer()
+                try:
+                    saved = self._write(path, render, key)
+                except Exception as e:
+                    saved = False
+                    print(f"Error saving image {path}: {e}")
+                with self._lock:
+                    self._pending_paths.discard(path)
+                    if saved:
+                        self.num_written += 1
+                        self.write_time_secs += timer() - begin_it
+                    else:
+                        self.num_errors += 1
+            finally:
+                self.queue.task_done()
+
+    def _write(self, path: str, render: Callable[[], np.ndarray], key: Hashable | None) -> bool:
+        ext = os.path.splitext(path)[1] or '.jpeg'
+        cache_key = (key, ext) if key is not None else None
+        encoded = None
+        if cache_key is not None:
+            with self._lock:
+                encoded = self._encoded.get(cache_key)
+                if encoded is not None:
+                    self._encoded.move_to_end(cache_key)
+                    self.num_deduplicated += 1
+
+        if encoded is None:
+            image = render()
+            if image is None:
+                return False
+            is_encoded, encoded = cv2.imencode(ext, image)
+            if not is_encoded:
+                print(f'ERROR: can\'t encode image file {path}')
+                return False
+            with self._lock:
+                self.num_encoded += 1
+                if cache_key is not None:
+                    self._encoded[cache_key] = encoded
+                    if len(self._encoded) > self.encoded_cache_size:
+                        self._encoded.popitem(last=False)
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(encoded.tobytes())
+        return True
+
+
+_image_writer: ImageWriter | None = None
+_image_writer_lock = threading.Lock()
+
+
+def get_image_writer() -> ImageWriter:
+    """Shared writer of the process, started on first use"""
+    global _image_writer
+    with _image_writer_lock:
+        if _image_writer is None or not _image_writer.run_flag:
+            _image_writer = ImageWriter()
+            _image_writer.start()
+        return _image_writer
+
+
+def stop_image_writer():
+    """Writes all pending images and stops the shared writer"""
+    with _image_writer_lock:
+        writer = _image_writer
+    if writer is not None:
+        writer.stop()
@@ -0,0 +1,150 @@
+import base64
+import datetime
+import json
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Версия схемы object_data. Записи без поля version сохранены старой версией: полный __dict__ объекта
+# вместе с историей, треками и историей детекций
+OBJECT_DATA_VERSION = 2
+
+
+def _default(obj):
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    return None
+
+
+def dumps(data) -> str:
+    """Compact JSON encoding, orjson is used if installed"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, default=_default, separators=(',', ':'))
+
+
+def loads(value):
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+def _pack(array: np.ndarray, dtype) -> dict:
+    array = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': np.dtype(dtype).str.lstrip('<>|='), 'shape': list(array.shape),
+            'data': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def _unpack(packed: dict) -> np.ndarray:
+    dtype = np.dtype(packed['dtype']).newbyteorder('<')
+    array = np.frombuffer(base64.b64decode(packed['data']), dtype=dtype)
+    return array.reshape(packed['shape']).astype(dtype.newbyteorder('='))
+
+
+def _downsample_indices(length: int, max_points: int | None) -> np.ndarray:
+    """Evenly spaced indices of the trajectory, the first and the last points are always kept"""
+    if max_points is None or length <= max_points:
+        return np.arange(length)
+    if max_points <= 1:
+        return np.array([length - 1])
+    return np.unique(np.linspace(0, length - 1, max_points).round().astype(np.int64))
+
+
+def make_object_data(obj, max_trajectory_len: int | None = None) -> dict:
+    """
+    Summary of ObjectResult for the object_data column: object fields, current track without detection history
+    and trajectory (frame ids, time stamps in seconds and boxes of history) packed as little-endian base64 arrays
+    :param max_trajectory_len: trajectory is downsampled to this number of points, None keeps all history
+    """
+    track = obj.track
+    data = {'version': OBJECT_DATA_VERSION,
+            'object_id': obj.object_id,
+            'global_id': obj.global_id,
+            'source_id': obj.source_id,
+            'class_id': obj.class_id,
+            'frame_id': obj.frame_id,
+            'time_stamp': obj.time_stamp,
+            'time_detected': obj.time_detected,
+            'time_lost': obj.time_lost,
+            'lost_frames': obj.lost_frames,
+            'track': None,
+            'properties': obj.properties,
+            'trajectory': None}
+    if track is not None:
+        data['track'] = {'track_id': track.track_id,
+                         'bounding_box': list(track.bounding_box),
+                         'confidence': track.confidence,
+                         'life_time': track.life_time,
+                         'frame_count': track.frame_count}
+
+    history = obj.history
+    indices = _downsample_indices(len(history), max_trajectory_len)
+    data['trajectory'] = {'history_len': len(history),
+                          'frame_ids': _pack(history.frame_ids[indices], np.int64),
+                          'time_stamps': _pack(history.time_stamps[indices], np.float64),
+                          'boxes': _pack(history.boxes[indices], np.float32)}
+    return data
+
+
+def encode_object_data(obj, max_trajectory_len: int | None = None) -> str:
+    return dumps(make_object_data(obj, max_trajectory_len))
+
+
+def _legacy_trajectory(history: list) -> dict:
+    frame_ids = []
+    time_stamps = []
+    boxes = []
+    for element in history or []:
+        track = element.get('track') or {}
+        box = track.get('bounding_box') or [0, 0, 0, 0]
+        time_stamp = element.get('time_stamp')
+        if isinstance(time_stamp, str):
+            time_stamp = datetime.datetime.fromisoformat(time_stamp).timestamp()
+        frame_ids.append(element.get('frame_id') if element.get('frame_id') is not None else -1)
+        time_stamps.append(time_stamp if time_stamp is not None else np.nan)
+        boxes.append(box[:4])
+    return {'history_len': len(frame_ids),
+            'frame_ids': np.array(frame_ids, dtype=np.int64),
+            'time_stamps': np.array(time_stamps, dtype=np.float64),
+            'boxes': np.array(boxes, dtype=np.float32).reshape(-1, 4)}
+
+
+def decode_object_data(value) -> dict | None:
+    """
+    Reads object_data of any version into the current schema, trajectory arrays are returned as numpy arrays
+    :param value: JSON string or already parsed dict (psycopg2 parses json columns)
+    """
+    if value is None:
+        return None
+    data = loads(value) if isinstance(value, (str, bytes)) else dict(value)
+
+    if 'version' not in data:
+        track = data.get('track') or None
+        if track is not None:
+            track = {name: track.get(name) for name in ('track_id', 'bounding_box', 'confidence',
+                                                        'life_time', 'frame_count')}
+        result = {name: data.get(name) for name in ('object_id', 'global_id', 'source_id', 'class_id', 'frame_id',
+                                                    'time_stamp', 'time_detected', 'time_lost', 'lost_frames')}
+        result['version'] = 1
+        result['track'] = track
+        result['properties'] = data.get('properties') or {}
+        result['trajectory'] = _legacy_trajectory(data.get('history'))
+        return result
+
+    trajectory = data.get('trajectory')
+    if trajectory is not None:
+        data['trajectory'] = {'history_len': trajectory['history_len'],
+                              'frame_ids': _unpack(trajectory['frame_ids']),
+                              'time_stamps': _unpack(trajectory['time_stamps']),
+                              'boxes': _unpack(trajectory['boxes'])}
+    return data
@@ -0,0 +1,106 @@
+import datetime
+import os
+import threading
+import time
+
+
+class DayDirectory:
+    """Immutable description of the directory of one day: base_dir/images/YYYY_MM_DD"""
+    __slots__ = ('date', 'date_str', 'path', 'next_day_time')
+
+    def __init__(self, base_dir: str, date: datetime.date):
+        self.date = date
+        self.date_str = date.strftime('%Y_%m_%d')
+        self.path = os.path.join(base_dir, 'images', self.date_str)
+        next_day = datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time())
+        self.next_day_time = next_day.timestamp()
+
+
+class PathResolver:
+    """
+    Builds paths of snapshot images and labels under base_dir/images/YYYY_MM_DD.
+
+    The current day is switched at local midnight by replacing a single DayDirectory object, so images and labels
+    that get the day from the same resolver roll over together. Created directories and source names are cached,
+    after the first use of a directory paths are built without filesystem calls.
+    """
+
+    def __init__(self, base_dir: str = 'EvilEyeData', cameras_params: list | None = None):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._created_dirs = set()
+        self._source_names = dict()
+        self._camera_addresses = dict()
+        self._day = DayDirectory(base_dir, datetime.date.today())
+        self.set_cameras_params(cameras_params or [])
+
+    def set_cameras_params(self, cameras_params: list):
+        source_names = dict()
+        camera_addresses = dict()
+        for camera in cameras_params:
+            names = camera.get('source_names', [])
+            for id_idx, source_id in enumerate(camera.get('source_ids', [])):
+                if id_idx < len(names):
+                    source_names.setdefault(source_id, names[id_idx])
+                camera_addresses.setdefault(source_id, camera.get('camera', ''))
+        self._source_names = source_names
+        self._camera_addresses = camera_addresses
+
+    def get_source_name(self, source_id, default: str = '') -> str:
+        return self._source_names.get(source_id, default)
+
+    def get_camera_address(self, source_id, default: str = '') -> str:
+        return self._camera_addresses.get(source_id, default)
+
+    def get_day(self) -> DayDirectory:
+        day = self._day
+        if time.time() >= day.next_day_time:
+            with self._lock:
+                day = self._day
+                if time.time() >= day.next_day_time:
+                    day = DayDirectory(self.base_dir, datetime.date.today())
+                    self._day = day
+        return day
+
+    def get_day_dir(self) -> str:
+        """Directory of the current day, created if needed"""
+        day = self.get_day()
+        self.ensure_dir(day.path)
+        return day.path
+
+    def get_image_path(self, obj_event_type: str, image_type: str, file_name: str,
+                       day: DayDirectory | None = None) -> str:
+        """
+        :return: path of the image relative to base_dir, i.e. images/2024_01_31/detected_previews/file_name
+        """
+        day = day or self.get_day()
+        type_dir = os.path.join(day.path, obj_event_type + '_' + image_type + 's')
+        self.ensure_dir(type_dir)
+        return os.path.relpath(os.path.join(type_dir, file_name), self.base_dir)
+
+    def ensure_dir(self, path: str):
+        if path in self._created_dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self._created_dirs.add(path)
+            # Каталоги прошедших дней больше не нужны в кэше
+            if len(self._created_dirs) > 1024:
+                self._created_dirs = {p for p in self._created_dirs if p.startswith(self._day.path)}
+                self._created_dirs.add(path)
+
+
+_resolvers: dict[str, PathResolver] = dict()
+_resolvers_lock = threading.Lock()
+
+
+def get_path_resolver(base_dir: str = 'EvilEyeData', cameras_params: list | None = None) -> PathResolver:
+    """Resolver shared by all components writing to base_dir"""
+    key = os.path.abspath(base_dir)
+    with _resolvers_lock:
+        resolver = _resolvers.get(key)
+        if resolver is None:
+            resolver = _resolvers[key] = PathResolver(base_dir, cameras_params)
+        elif cameras_params:
+            resolver.set_cameras_params(cameras_params)
+        return resolver
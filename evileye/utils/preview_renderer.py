@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from . import utils
+
+
+class PreviewRenderer:
+    """
+    Renders small previews of frames with object boxes and zones for journals and database.
+
+    The frame is resized straight from the captured image without copying it. If crop_margin is set, the preview
+    shows only the area around the object box, extended by crop_margin of the box size on each side and
+    to the aspect ratio of the preview. Resized frames are cached per (source_id, frame_id) and shared by all
+    renderers, so one preview of a frame serves objects handler, database adapters and events, boxes are drawn
+    on a copy of the cached preview.
+    """
+    cache_size = 64
+    _cache: OrderedDict = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, width: int = 300, height: int = 150, crop_margin: float | None = None):
+        self.width = width
+        self.height = height
+        self.crop_margin = crop_margin
+
+    def render(self, image, box=None, zone_coords=None) -> np.ndarray:
+        """
+        :param image: CaptureImage
+        :param box: object box normalized to frame size
+        :param zone_coords: zone points normalized to frame size
+        """
+        frame_height, frame_width = image.image.shape[:2]
+        region = self._get_region(box, frame_width, frame_height)
+        preview = self._get_resized(image, region).copy()
+
+        x1, y1, x2, y2 = region
+        region_width = (x2 - x1) / frame_width
+        region_height = (y2 - y1) / frame_height
+        offset_x = x1 / frame_width
+        offset_y = y1 / frame_height
+        if zone_coords is not None:
+            zone_coords = [((point[0] - offset_x) / region_width, (point[1] - offset_y) / region_height)
+                           for point in zone_coords]
+        if box is not None:
+            box = [(box[0] - offset_x) / region_width, (box[1] - offset_y) / region_height,
+                   (box[2] - offset_x) / region_width, (box[3] - offset_y) / region_height]
+            if zone_coords is not None:
+                return utils.draw_preview_boxes_zones(preview, self.width, self.height, box, zone_coords)
+            return utils.draw_preview_boxes(preview, self.width, self.height, box)
+        return preview
+
+    def _get_region(self, box, frame_width, frame_height) -> tuple[int, int, int, int]:
+        if self.crop_margin is None or box is None:
+            return 0, 0, frame_width, frame_height
+
+        box_width = (box[2] - box[0]) * frame_width
+        box_height = (box[3] - box[1]) * frame_height
+        region_width = box_width * (1 + 2 * self.crop_margin)
+        region_height = box_height * (1 + 2 * self.crop_margin)
+        # Расширяем область до пропорций превью, чтобы изображение не искажалось
+        aspect = self.width / self.height
+        if region_width < region_height * aspect:
+            region_width = region_height * aspect
+        else:
+            region_height = region_width / aspect
+        region_width = min(max(region_width, 1.0), frame_width)
+        region_height = min(max(region_height, 1.0), frame_height)
+
+        center_x = (box[0] + box[2]) / 2 * frame_width
+        center_y = (box[1] + box[3]) / 2 * frame_height
+        x1 = int(min(max(center_x - region_width / 2, 0), frame_width - region_width))
+        y1 = int(min(max(center_y - region_height / 2, 0), frame_height - region_height))
+        return x1, y1, x1 + int(region_width), y1 + int(region_height)
+
+    def _get_resized(self, image, region) -> np.ndarray:
+        key = (image.source_id, image.frame_id, region, self.width, self.height)
+        with PreviewRenderer._lock:
+            preview = PreviewRenderer._cache.get(key)
+            if preview is not None:
+                PreviewRenderer._cache.move_to_end(key)
+                return preview
+
+        x1, y1, x2, y2 = region
+        # cv2.resize не изменяет исходный кадр, поэтому копия кадра не нужна
+        preview = cv2.resize(image.image[y1:y2, x1:x2], (self.width, self.height))
+        with PreviewRenderer._lock:
+            PreviewRenderer._cache[key] = preview
+            if len(PreviewRenderer._cache) > PreviewRenderer.cache_size:
+                PreviewRenderer._cache.popitem(last=False)
+        return preview
@@ -11,6 +11,14 @@ def subscribe(event, subscriber_func):
         events[event].append(subscriber_func)
 
 
+def unsubscribe(event, subscriber_func):
+    with mutex:
+        if event not in events:
+            return
+        # Список заменяется, а не изменяется, чтобы не мешать уже начатой рассылке
+        events[event] = [func for func in events[event] if func != subscriber_func]
+
+
 def notify(event, *args, **kwargs):
     with mutex:
         if event not in events:
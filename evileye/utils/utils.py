@@ -4,7 +4,7 @@ import datetime
 import numpy as np
 import cv2
 from ..object_tracker.tracking_results import TrackingResult
-from ..objects_handler.object_result import ObjectResultHistory
+from ..objects_handler.object_result import ObjectResultHistory, ObjectHistory
 import copy
 from pathlib import Path
 
@@ -312,11 +312,10 @@ def draw_boxes_tracking(image: CaptureImage, cameras_objs, source_name, source_d
         last_hist_index = len(obj.history) - 1
         last_info = obj.track
         if obj.frame_id != image.frame_id:
-            for i in range(len(obj.history) - 1):
-                if obj.history[i].frame_id == image.frame_id:
-                    last_hist_index = i
-                    last_info = obj.history[i].track
-                    break
+            frame_idx = obj.history.find_frame(image.frame_id)
+            if 0 <= frame_idx < last_hist_index:
+                last_hist_index = frame_idx
+                last_info = obj.history[frame_idx].track
 
         cv2.rectangle(image.image, (int(last_info.bounding_box[0]), int(last_info.bounding_box[1])),
                       (int(last_info.bounding_box[2]), int(last_info.bounding_box[3])), (0, 255, 0), thickness=font_thickness)
@@ -340,16 +339,9 @@ def draw_boxes_tracking(image: CaptureImage, cameras_objs, source_name, source_d
                           background_enabled=config.get('background_enabled', True))
 
         # print(len(obj['obj_info']))
-        if len(obj.history) > 1:
-            for i in range(0, last_hist_index):
-                first_info = obj.history[i].track
-                second_info = obj.history[i + 1].track
-                first_cm_x = int((first_info.bounding_box[0] + first_info.bounding_box[2]) / 2)
-                first_cm_y = int(first_info.bounding_box[3])
-                second_cm_x = int((second_info.bounding_box[0] + second_info.bounding_box[2]) / 2)
-                second_cm_y = int(second_info.bounding_box[3])
-                cv2.line(image.image, (first_cm_x, first_cm_y),
-                         (second_cm_x, second_cm_y), (0, 0, 255), thickness=font_thickness)
+        if last_hist_index > 0:
+            points = obj.history.bottom_centers()[:last_hist_index + 1].astype(np.int32)
+            cv2.polylines(image.image, [points], False, (0, 0, 255), thickness=font_thickness)
 
 
 def draw_debug_info(image: CaptureImage, debug_info: dict):
@@ -373,9 +365,11 @@ class ObjectResultEncoder(json.JSONEncoder):
         if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
             return obj.isoformat()
         if isinstance(obj, TrackingResult):
-            return obj.__dict__
+            return obj.to_dict()
         if isinstance(obj, ObjectResultHistory):
-            return obj.__dict__
+            return obj.to_dict()
+        if isinstance(obj, ObjectHistory):
+            return list(obj)
         if isinstance(obj, CaptureImage):
             return None
         # if isinstance(obj, BOTrack):
@@ -25,6 +25,7 @@ from . import events_journal
 from .journal_adapters.jadapter_fov_events import JournalAdapterFieldOfViewEvents
 from .journal_adapters.jadapter_cam_events import JournalAdapterCamEvents
 from .journal_adapters.jadapter_zone_events import JournalAdapterZoneEvents
+from .journal_adapters.jadapter_line_crossing_events import JournalAdapterLineCrossingEvents
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
@@ -71,6 +72,14 @@ class DatabaseJournalWindow(QWidget):
         self.zone_events_adapter = JournalAdapterZoneEvents()
         self.zone_events_adapter.set_params(**self.adapter_params['DatabaseAdapterZoneEvents'])
         self.zone_events_adapter.init()
+        events_adapters = [self.cam_events_adapter, self.perimeter_events_adapter, self.zone_events_adapter]
+        # Журнал пересечений линий подключается, если его таблица есть в конфигурации базы данных
+        self.line_crossing_events_adapter = None
+        if 'DatabaseAdapterLineCrossingEvents' in self.adapter_params:
+            self.line_crossing_events_adapter = JournalAdapterLineCrossingEvents()
+            self.line_crossing_events_adapter.set_params(**self.adapter_params['DatabaseAdapterLineCrossingEvents'])
+            self.line_crossing_events_adapter.init()
+            events_adapters.append(self.line_crossing_events_adapter)
 
         self.setWindowTitle('DB Journal')
         self.resize(1600, 600)
@@ -81,8 +90,7 @@ class DatabaseJournalWindow(QWidget):
         if self.obj_journal_enabled:
             self.tabs.addTab(handler_journal_view.HandlerJournal(self.db_controller, 'objects', self.params, self.database_params,
                                                                  self.tables['objects'], parent=self), 'Objects journal')
-        self.tabs.addTab(events_journal.EventsJournal([self.cam_events_adapter,
-                                                       self.perimeter_events_adapter, self.zone_events_adapter],
+        self.tabs.addTab(events_journal.EventsJournal(events_adapters,
                                                       self.db_controller, 'objects', self.params, self.database_params,
                                                       self.tables['objects'], parent=self), 'Events journal')
 
@@ -290,6 +290,8 @@ class EventsJournal(QWidget):
                 query.prepare('SELECT box_entered, zone_coords from zone_events WHERE preview_path_entered = :path')
             else:
                 query.prepare('SELECT box_left, zone_coords from zone_events WHERE preview_path_left = :path')
+        elif 'line_crossing' in path:
+            query.prepare('SELECT box, line_coords from line_crossing_events WHERE preview_path = :path')
         else:
             if 'detected' in path:
                 query.prepare('SELECT bounding_box from objects WHERE preview_path = :path')
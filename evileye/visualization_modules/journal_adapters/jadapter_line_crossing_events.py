@@ -0,0 +1,18 @@
+from .jadapter_base import JournalAdapterBase
+
+
+class JournalAdapterLineCrossingEvents(JournalAdapterBase):
+    def __init__(self):
+        super().__init__()
+        self.table_name = None
+        self.event_name = None
+
+    def init_impl(self):
+        pass
+
+    def select_query(self) -> str:
+        query = ('SELECT CAST(\'Alarm\' AS text) AS type, time_stamp, NULL AS time_lost, '
+                 '(\'Line \' || line_name || \' crossed \' || direction || \' on source \' || source_id || '
+                 '\' (forward: \' || count_forward || \', backward: \' || count_backward || \')\') AS information, '
+                 'preview_path, NULL AS lost_preview_path FROM line_crossing_events')
+        return query
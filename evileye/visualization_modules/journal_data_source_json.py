@@ -2,12 +2,13 @@ import os
 import json
 from typing import List, Dict, Tuple, Callable, Optional
 from .journal_data_source import EventJournalDataSource
+from ..objects_handler.labeling_manager import load_labels
 
 
 class JsonLabelJournalDataSource(EventJournalDataSource):
     """
-    Data source that reads events from objects_found.json and objects_lost.json
-    stored under base_dir/YYYY_MM_DD/.
+    Data source that reads events from objects_found.jsonl and objects_lost.jsonl
+    (or objects_found.json and objects_lost.json of former days) stored under base_dir/YYYY_MM_DD/.
     """
 
     def __init__(self, base_dir: str):
@@ -63,8 +64,8 @@ class JsonLabelJournalDataSource(EventJournalDataSource):
         for d in dates:
             if not d:
                 continue
-            found_fp = os.path.join(self.base_dir, 'images', d, 'objects_found.json')
-            lost_fp = os.path.join(self.base_dir, 'images', d, 'objects_lost.json')
+            found_fp = self._get_labels_path(d, 'objects_found')
+            lost_fp = self._get_labels_path(d, 'objects_lost')
             
             # Check if files have been modified
             if self._check_file_changed(found_fp) or self._check_file_changed(lost_fp):
@@ -76,30 +77,25 @@ class JsonLabelJournalDataSource(EventJournalDataSource):
             for d in dates:
                 if not d:
                     continue
-                found_fp = os.path.join(self.base_dir, 'images', d, 'objects_found.json')
-                lost_fp = os.path.join(self.base_dir, 'images', d, 'objects_lost.json')
+                found_fp = self._get_labels_path(d, 'objects_found')
+                lost_fp = self._get_labels_path(d, 'objects_lost')
                 self._read_file(found_fp, 'found', d)
                 self._read_file(lost_fp, 'lost', d)
             # default sort: ts desc
             self._cache.sort(key=lambda e: e.get('ts', ''), reverse=True)
 
+    def _get_labels_path(self, date_folder: str, name: str) -> str:
+        labels_path = os.path.join(self.base_dir, 'images', date_folder, name + '.jsonl')
+        if os.path.exists(labels_path):
+            return labels_path
+        return os.path.join(self.base_dir, 'images', date_folder, name + '.json')
+
     def _read_file(self, filepath: str, event_type: str, date_folder: str) -> None:
         if not os.path.isfile(filepath):
             return
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Handle different JSON structures
-            if isinstance(data, list):
-                # Direct array of objects
-                items = data
-            elif isinstance(data, dict) and 'objects' in data:
-                # Objects in 'objects' array
-                items = data['objects']
-            else:
-                # Single object or other structure
-                items = [data] if data else []
+            # Handle JSON-lines and different JSON structures
+            items = load_labels(filepath)
             
             for idx, item in enumerate(items):
                 ev = self._map_item(item, event_type, date_folder, idx)
@@ -137,6 +137,9 @@ class VideoThread(QThread):
         try:
             frame, track_info, source_name, source_duration_secs, debug_info = self.queue.get()
             begin_it = timer()
+            # Кадр разделяется с обработчиком объектов и записью изображений, поэтому рисуем на копии
+            frame = copy.copy(frame)
+            frame.image = frame.image.copy()
             utils.draw_boxes_tracking(frame, track_info, source_name, source_duration_secs,
                                       self.font_scale, self.font_thickness, self.font_color,
                                       text_config=self.text_config)
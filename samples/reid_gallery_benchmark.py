@@ -0,0 +1,61 @@
+# Benchmark of the re-identification embedding gallery used by multi-camera tracking
+"""
+Fills EmbeddingGallery with random normalized embeddings grouped around a number of identities
+and measures insertion time, search latency and recall of the approximate indexes against exact search.
+
+Example:
+    python samples/reid_gallery_benchmark.py --sizes 10000 100000 1000000 --index flat ivf
+"""
+import argparse
+import time
+import numpy as np
+from evileye.object_multi_camera_tracker.embedding_gallery import EmbeddingGallery
+
+
+def make_embeddings(rng, num, dim, num_ids):
+    centers = rng.normal(size=(num_ids, dim)).astype(np.float32)
+    ids = rng.integers(0, num_ids, size=num)
+    embeddings = centers[ids] + 0.3 * rng.normal(size=(num, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return ids, embeddings
+
+
+def run(size, index_type, dim, num_queries, k):
+    rng = np.random.default_rng(0)
+    ids, embeddings = make_embeddings(rng, size + num_queries, dim, max(size // 10, 1))
+    queries = embeddings[size:]
+
+    gallery = EmbeddingGallery(max_size=size, max_age_secs=None, index_type=index_type,
+                               index_params={'num_lists': int(np.sqrt(size))} if index_type == 'ivf' else None)
+    begin = time.perf_counter()
+    for global_id, embedding in zip(ids[:size], embeddings[:size]):
+        gallery.add(int(global_id), embedding, time_stamp=0.0)
+    add_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    results = gallery.search(queries, k=k)
+    search_time = time.perf_counter() - begin
+
+    exact = embeddings[:size] @ queries.T
+    exact_ids = ids[:size][np.argmax(exact, axis=0)]
+    found = sum(1 for res, exact_id in zip(results, exact_ids) if res and res[0][0] == exact_id)
+    print(f"{index_type:>5} size={size:>8} add={add_time / size * 1e6:8.2f} us/emb "
+          f"search={search_time / num_queries * 1e3:8.3f} ms/query recall@1={found / num_queries:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--index', type=str, nargs='+', default=['flat', 'ivf'], choices=['flat', 'ivf', 'faiss'])
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        for index_type in args.index:
+            run(size, index_type, args.dim, args.queries, args.k)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import pytest
+
+from evileye.database_controller.db_adapter import DatabaseAdapterBase
+
+
+class FakeDbController:
+    """Executes batches of inserts and updates, a transaction with a row from bad_rows is not committed"""
+
+    def __init__(self, image_dir):
+        self.image_dir = image_dir
+        self.bad_rows = set()
+        self.committed = []
+        self.num_transactions = 0
+
+    def get_params(self):
+        return {'image_dir': self.image_dir}
+
+    def get_cameras_params(self):
+        return []
+
+    def query_batch(self, operations):
+        self.num_transactions += 1
+        rows = []
+        for query_string, data, many in operations:
+            rows.extend(data if many else [data])
+        if any(row in self.bad_rows for row in rows):
+            return None
+        self.committed.extend(rows)
+        return [[(row,) for row in data] if many else None for query_string, data, many in operations]
+
+
+class Adapter(DatabaseAdapterBase):
+    def __init__(self, db_controller):
+        super().__init__(db_controller)
+        self.processed = []
+        self.discarded = []
+
+    def _insert_impl(self, data):
+        self.queue_in.put(('insert', 'INSERT INTO test VALUES %s', data, data))
+
+    def _update_impl(self, data):
+        self.queue_in.put(('update', 'UPDATE test SET value = %s', data, data))
+
+    def _process_results(self, query_type, record, payload):
+        self.processed.append(payload)
+
+    def _discard_payload(self, query_type, payload):
+        self.discarded.append(payload)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return FakeDbController(str(tmp_path))
+
+
+def run_batch(db, rows):
+    adapter = Adapter(db)
+    adapter.set_params(table_name='test', batch_size=len(rows), batch_max_latency_secs=1.0)
+    for row in rows:
+        adapter.insert(row)
+    adapter.start()
+    adapter.stop()
+    debug_info = {}
+    adapter.get_debug_info(debug_info)
+    return adapter, debug_info
+
+
+def test_batch_is_committed_in_one_transaction(db):
+    adapter, debug_info = run_batch(db, list(range(8)))
+    assert db.committed == list(range(8))
+    assert db.num_transactions == 1
+    assert adapter.processed == list(range(8))
+    assert (debug_info['batches'], debug_info['failed_batches'], debug_info['discarded_queries']) == (1, 0, 0)
+
+
+def test_bad_row_discards_only_itself(db):
+    db.bad_rows = {5}
+    adapter, debug_info = run_batch(db, list(range(8)))
+    assert db.committed == [0, 1, 2, 3, 4, 6, 7]
+    assert adapter.processed == [0, 1, 2, 3, 4, 6, 7]
+    assert adapter.discarded == [5]
+    assert debug_info['failed_batches'] == 1
+    assert debug_info['failed_queries'] == 8
+    assert debug_info['discarded_queries'] == 1
+
+
+def test_failed_batch_keeps_query_order(db):
+    db.bad_rows = {0, 6}
+    adapter = Adapter(db)
+    adapter.set_params(table_name='test', batch_size=7, batch_max_latency_secs=1.0)
+    for row in range(4):
+        adapter.insert(row)
+    adapter.update(4)
+    adapter.insert(5)
+    adapter.insert(6)
+    adapter.start()
+    adapter.stop()
+    assert db.committed == [1, 2, 3, 4, 5]
+    assert adapter.discarded == [0, 6]
@@ -0,0 +1,73 @@
+import itertools
+
+from evileye.events_control.event_id_allocator import EventIdAllocator
+
+
+class FakeDbController:
+    """Event ids sequence shared by allocators, reservations fail while is_available is False"""
+
+    def __init__(self, start_id=0):
+        self.sequence = itertools.count(start_id)
+        self.is_available = True
+        self.num_calls = 0
+
+    def reserve_event_ids(self, count):
+        self.num_calls += 1
+        if not self.is_available:
+            raise ConnectionError('database is not available')
+        return [next(self.sequence) for _ in range(count)]
+
+
+def test_local_ids_without_database():
+    allocator = EventIdAllocator(start_id=5)
+    assert [allocator.next_id() for _ in range(3)] == [5, 6, 7]
+
+
+def test_ids_are_reserved_in_blocks():
+    db = FakeDbController(start_id=10)
+    allocator = EventIdAllocator(db, block_size=4)
+    assert [allocator.next_id() for _ in range(6)] == [10, 11, 12, 13, 14, 15]
+    assert db.num_calls == 2
+    assert allocator.get_debug_info()['reserved_blocks'] == 2
+
+
+def test_allocators_sharing_sequence_get_different_ids():
+    db = FakeDbController()
+    first = EventIdAllocator(db, block_size=3)
+    second = EventIdAllocator(db, block_size=3)
+    ids = [allocator.next_id() for _ in range(10) for allocator in (first, second)]
+    assert len(set(ids)) == len(ids)
+
+
+def test_no_ids_without_reservation():
+    db = FakeDbController()
+    db.is_available = False
+    allocator = EventIdAllocator(db, block_size=2, retry_interval_secs=0.0)
+    assert [allocator.next_id() for _ in range(3)] == [None] * 3
+    assert not allocator.is_available
+
+    db.is_available = True
+    other = EventIdAllocator(db, block_size=2)
+    ids = [allocator.next_id() for _ in range(3)] + [other.next_id() for _ in range(3)]
+    assert len(set(ids)) == len(ids)
+    assert allocator.is_available
+
+    debug_info = allocator.get_debug_info()
+    assert debug_info['failed_reservations'] == 3
+    assert debug_info['reserved_blocks'] == 2
+
+
+def test_failed_reservation_is_retried_with_rate_limit():
+    db = FakeDbController()
+    db.is_available = False
+    allocator = EventIdAllocator(db, block_size=2, retry_interval_secs=3600.0)
+    assert all(allocator.next_id() is None for _ in range(100))
+    assert db.num_calls == 1
+    assert allocator.get_retry_delay() > 3500.0
+
+    db.is_available = True
+    assert allocator.next_id() is None
+    allocator.next_retry_time = 0.0
+    assert allocator.get_retry_delay() == 0.0
+    assert allocator.next_id() == 0
+    assert db.num_calls == 2
@@ -0,0 +1,22 @@
+import threading
+
+from evileye.events_control.events_controller import EventsDetectorsController
+
+
+def test_get_does_not_block_on_unreadable_journal(tmp_path):
+    controller = EventsDetectorsController([])
+    controller.set_params(queue_size=1, queue_overflow_policy='spill', queue_spill_dir=str(tmp_path))
+    for item in range(3):
+        controller.queue_out.put({'Detector': [item]})
+    # Записи журнала пропали, но еще учитываются в empty()
+    controller.queue_out._spill_file.truncate(0)
+    assert not controller.queue_out.empty()
+
+    results = []
+    reader = threading.Thread(target=lambda: results.extend(controller.get() for _ in range(2)), daemon=True)
+    reader.start()
+    reader.join(1.0)
+    assert not reader.is_alive()
+    assert results == [{'Detector': [0]}, {}]
+    controller.queue_in.close()
+    controller.queue_out.close()
@@ -0,0 +1,180 @@
+import datetime
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from evileye.events_control.events_processor import EventsProcessor
+from evileye.events_detectors.event_zone import ZoneEvent
+from evileye.events_detectors.zone import Zone
+from evileye.utils.frame_cache import get_frame_cache
+
+
+class FakeAdapter:
+    def __init__(self, event_name):
+        self.event_name = event_name
+        self.inserted = []
+        self.updated = []
+
+    def get_event_name(self):
+        return self.event_name
+
+    def get_table_name(self):
+        return 'zone_events'
+
+    def insert(self, event):
+        self.inserted.append(event)
+
+    def update(self, event):
+        self.updated.append(event)
+
+
+class Image:
+    def __init__(self, frame_id):
+        self.image = np.zeros((10, 10, 3), dtype=np.uint8)
+        self.source_id = 0
+        self.frame_id = frame_id
+
+
+@pytest.fixture
+def zone():
+    zone = Zone(0, ((0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)), 'rect')
+    zone.set_id(1)
+    return zone
+
+
+def make_zone_event(zone, frame_id, is_finished):
+    obj = SimpleNamespace(source_id=0, object_id=7, track=SimpleNamespace(bounding_box=[1, 2, 3, 4]),
+                          time_stamp=datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=frame_id))
+    return ZoneEvent(obj.time_stamp, 'Alarm', obj, zone, is_finished=is_finished,
+                     frame=get_frame_cache().acquire(Image(frame_id)))
+
+
+def run_processor(processor, batches, expected_processed):
+    processor.start()
+    try:
+        for batch in batches:
+            processor.put(batch)
+        deadline = time.monotonic() + 5.0
+        while time.monotonic() < deadline and not expected_processed():
+            time.sleep(0.01)
+    finally:
+        processor.stop()
+
+
+def make_processor(adapter, **params):
+    processor = EventsProcessor([adapter], None)
+    processor.set_params(**params)
+    processor.init()
+    return processor
+
+
+def test_orphan_finished_event_is_skipped(zone):
+    adapter = FakeAdapter('ZoneEvent')
+    processor = make_processor(adapter)
+    finished = make_zone_event(zone, 1, is_finished=True)
+    run_processor(processor, [{'ZoneEventsDetector': [finished]}],
+                  lambda: processor.num_orphan_finished_events == 1)
+
+    assert processor.num_orphan_finished_events == 1
+    assert adapter.inserted == []
+    assert adapter.updated == []
+    assert get_frame_cache().get(finished.frame_left) is None
+    debug_info = {}
+    processor.get_debug_info(debug_info)
+    assert debug_info['orphan_finished_events'] == 1
+
+
+def test_started_and_finished_event(zone):
+    adapter = FakeAdapter('ZoneEvent')
+    processor = make_processor(adapter)
+    started = make_zone_event(zone, 1, is_finished=False)
+    finished = make_zone_event(zone, 2, is_finished=True)
+    run_processor(processor, [{'ZoneEventsDetector': [started]}, {'ZoneEventsDetector': [finished]}],
+                  lambda: len(adapter.updated) == 1)
+
+    assert adapter.inserted == [started]
+    assert adapter.updated == [started]
+    assert started.time_left == finished.time_left
+    assert processor.num_orphan_finished_events == 0
+    for frame in started.get_frames():
+        get_frame_cache().release(frame)
+
+
+def test_finish_after_dropped_start(zone):
+    adapter = FakeAdapter('ZoneEvent')
+    processor = make_processor(adapter, queue_size=1, queue_overflow_policy='drop_oldest')
+    started = make_zone_event(zone, 1, is_finished=False)
+    finished = make_zone_event(zone, 2, is_finished=True)
+    # Начало события вытесняется из очереди до запуска обработчика
+    processor.put({'ZoneEventsDetector': [started]})
+    processor.put({'ZoneEventsDetector': [finished]})
+    assert get_frame_cache().get(started.frame_entered) is None
+    run_processor(processor, [], lambda: processor.num_orphan_finished_events == 1)
+
+    assert processor.num_orphan_finished_events == 1
+    assert adapter.inserted == []
+    assert get_frame_cache().get(finished.frame_left) is None
+
+
+class UnavailableDbController:
+    def __init__(self):
+        self.is_available = False
+        self.next_id = 100
+
+    def reserve_event_ids(self, count):
+        if not self.is_available:
+            raise ConnectionError('database is not available')
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+        return ids
+
+
+def test_events_are_held_until_ids_are_reserved(zone):
+    adapter = FakeAdapter('ZoneEvent')
+    db = UnavailableDbController()
+    processor = EventsProcessor([adapter], db)
+    processor.set_params(event_id_retry_interval_secs=0.01)
+    processor.init()
+    started = make_zone_event(zone, 1, is_finished=False)
+    finished = make_zone_event(zone, 2, is_finished=True)
+    processor.start()
+    try:
+        processor.put({'ZoneEventsDetector': [started]})
+        processor.put({'ZoneEventsDetector': [finished]})
+        time.sleep(0.1)
+        # Без зарезервированных айди события не сохраняются и не считаются завершениями без начала
+        assert adapter.inserted == []
+        assert len(processor.held_events) == 1
+        debug_info = {}
+        processor.get_debug_info(debug_info)
+        assert debug_info['held_events'] == 1
+        assert not debug_info['event_ids']['is_available']
+
+        db.is_available = True
+        deadline = time.monotonic() + 5.0
+        while time.monotonic() < deadline and not adapter.updated:
+            time.sleep(0.01)
+    finally:
+        processor.stop()
+
+    assert adapter.inserted == [started]
+    assert adapter.updated == [started]
+    assert started.event_id == 100
+    assert processor.num_orphan_finished_events == 0
+    for frame in started.get_frames():
+        get_frame_cache().release(frame)
+
+
+def test_stop_releases_held_events(zone):
+    adapter = FakeAdapter('ZoneEvent')
+    processor = EventsProcessor([adapter], UnavailableDbController())
+    processor.set_params(event_id_retry_interval_secs=3600.0)
+    processor.init()
+    started = make_zone_event(zone, 1, is_finished=False)
+    run_processor(processor, [{'ZoneEventsDetector': [started]}], lambda: len(processor.held_events) == 1)
+
+    assert adapter.inserted == []
+    assert len(processor.held_events) == 0
+    assert get_frame_cache().get(started.frame_entered) is None
@@ -0,0 +1,128 @@
+import datetime
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from evileye.events_control.events_processor import EventsProcessor
+from evileye.events_detectors.fov_events_detector import FieldOfViewEventsDetector
+from evileye.objects_handler.object_result import ObjectResult, ObjectsSnapshot
+
+
+class FakeObjectsHandler:
+    """Publishes snapshots of source 0 the same way as ObjectsHandler"""
+
+    def __init__(self):
+        self.snapshot = None
+
+    def publish(self, active=(), lost=(), updated_ids=(), lost_ids=()):
+        version = self.snapshot.version + 1 if self.snapshot is not None else 1
+        self.snapshot = ObjectsSnapshot(0, version, tuple(active), tuple(lost), frozenset(updated_ids),
+                                        frozenset(lost_ids), self.snapshot)
+
+    def get_changes(self, source_id, since_version):
+        if self.snapshot is None:
+            return None, set(), set()
+        updated_ids, lost_ids = self.snapshot.get_changes_since(since_version)
+        return self.snapshot, updated_ids, lost_ids
+
+
+class FakeAdapter:
+    def __init__(self):
+        self.inserted = []
+        self.updated = []
+
+    def get_event_name(self):
+        return 'FieldOfViewEvent'
+
+    def get_table_name(self):
+        return 'fov_events'
+
+    def insert(self, event):
+        self.inserted.append(event)
+
+    def update(self, event):
+        self.updated.append(event)
+
+
+def make_object(object_id, num_points):
+    obj = ObjectResult()
+    obj.object_id = object_id
+    obj.source_id = 0
+    obj.time_detected = datetime.datetime(2024, 1, 1, 12)
+    for frame_id in range(1, num_points + 1):
+        obj.frame_id = frame_id
+        obj.time_stamp = obj.time_detected + datetime.timedelta(seconds=frame_id)
+        obj.track = SimpleNamespace(bounding_box=[0, 0, 10, 10])
+        obj.history = obj.history.appended(obj.get_current_history_element())
+    return obj
+
+
+def make_lost(obj):
+    obj.time_lost = obj.time_stamp + datetime.timedelta(seconds=1)
+    return obj
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5.0
+    while time.monotonic() < deadline and not condition():
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def handler():
+    return FakeObjectsHandler()
+
+
+@pytest.fixture
+def detector(handler):
+    detector = FieldOfViewEventsDetector(handler)
+    detector.set_params(sources={'0': [['00:00:00', '23:59:59']]})
+    detector.start()
+    yield detector
+    detector.stop()
+
+
+def read_events(detector, num_events):
+    events = []
+    wait_for(lambda: events.extend(detector.get()) or len(events) >= num_events)
+    return events
+
+
+def test_active_object_starts_and_finishes_event(handler, detector):
+    obj = make_object(1, 2)
+    handler.publish(active=[obj], updated_ids=[1])
+    detector.update()
+    started = read_events(detector, 1)
+    assert [(event.object_id, event.is_finished()) for event in started] == [(1, False)]
+
+    handler.publish(lost=[make_lost(obj)], lost_ids=[1])
+    detector.update()
+    finished = read_events(detector, 1)
+    assert [(event.object_id, event.is_finished()) for event in finished] == [(1, True)]
+
+
+def test_object_lost_before_read_is_stored(handler, detector):
+    # Объект потерян до того, как детектор прочитал его историю
+    obj = make_lost(make_object(2, 3))
+    handler.publish(lost=[obj], lost_ids=[2])
+    detector.update()
+    events = read_events(detector, 2)
+    assert [(event.object_id, event.is_finished()) for event in events] == [(2, False), (2, True)]
+    assert events[0].time_obj_detected == obj.time_detected
+    assert events[1].time_lost == obj.time_lost
+
+    adapter = FakeAdapter()
+    processor = EventsProcessor([adapter], None)
+    processor.set_params()
+    processor.init()
+    processor.start()
+    try:
+        processor.put({'FieldOfViewEventsDetector': events})
+        wait_for(lambda: len(adapter.updated) == 1)
+    finally:
+        processor.stop()
+    assert adapter.inserted == [events[0]]
+    assert adapter.updated == [events[0]]
+    assert adapter.inserted[0].time_lost == obj.time_lost
+    assert processor.num_orphan_finished_events == 0
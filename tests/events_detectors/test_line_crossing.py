@@ -0,0 +1,172 @@
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from evileye.events_detectors.line import CrossingDirection
+from evileye.events_detectors.line_crossing_events_detector import (LineCrossingEventsDetector, _LineCounter,
+                                                                    find_crossings, line_sides)
+from evileye.objects_handler.object_result import ObjectResult
+from evileye.utils.frame_cache import get_frame_cache
+
+# Вертикальная линия сверху вниз: правая сторона линии - слева на кадре (x < 0.5)
+LINE_STARTS = np.array([[0.5, 0.0]])
+LINE_ENDS = np.array([[0.5, 1.0]])
+
+
+def crossings(starts, ends, line_starts=LINE_STARTS, line_ends=LINE_ENDS):
+    crossed, forward = find_crossings(np.array(starts, dtype=np.float64), np.array(ends, dtype=np.float64),
+                                      line_starts, line_ends)
+    return crossed[:, 0].tolist(), forward[:, 0].tolist()
+
+
+def test_line_sides():
+    sides = line_sides(np.array([[0.4, 0.5], [0.6, 0.5], [0.5, 0.3], [np.nan, np.nan]]), LINE_STARTS, LINE_ENDS)
+    assert sides[:, 0].tolist() == [1, -1, 0, 0]
+
+
+def test_crossing_and_direction():
+    crossed, forward = crossings([[0.6, 0.5], [0.4, 0.5]], [[0.4, 0.5], [0.6, 0.5]])
+    assert crossed == [True, True]
+    assert forward == [True, False]
+
+
+def test_segment_passing_beside_line_does_not_cross():
+    assert crossings([[0.4, 1.5]], [[0.6, 1.5]])[0] == [False]
+
+
+def test_touch_does_not_cross():
+    # Касание линии с любой стороны и возврат не являются пересечениями
+    starts = [[0.6, 0.5], [0.5, 0.5], [0.4, 0.5], [0.5, 0.5]]
+    ends = [[0.5, 0.5], [0.6, 0.5], [0.5, 0.5], [0.4, 0.5]]
+    assert crossings(starts, ends)[0] == [False] * 4
+
+
+def test_colinear_segment_does_not_cross():
+    assert crossings([[0.5, 0.2]], [[0.5, 0.8]])[0] == [False]
+
+
+def test_zero_length_segment_does_not_cross():
+    assert crossings([[0.6, 0.5], [0.5, 0.5]], [[0.6, 0.5], [0.5, 0.5]])[0] == [False, False]
+
+
+def test_segment_through_line_end_crosses():
+    assert crossings([[0.4, 1.0]], [[0.6, 1.0]])[0] == [True]
+
+
+def test_per_line_start_points():
+    line_starts = np.array([[0.5, 0.0], [0.0, 0.5]])
+    line_ends = np.array([[0.5, 1.0], [1.0, 0.5]])
+    starts = np.array([[[0.6, 0.6], [0.6, 0.4]]])
+    crossed, forward = find_crossings(starts, np.array([[0.4, 0.6]]), line_starts, line_ends)
+    assert crossed.tolist() == [[True, True]]
+
+
+def test_counter_window_expiry():
+    counter = _LineCounter(10.0)
+    counter.add(0.0, True)
+    counter.add(5.0, False)
+    counter.add(9.0, True)
+    assert (counter.forward, counter.backward) == (2, 1)
+    counter.expire(10.0)
+    assert (counter.forward, counter.backward) == (2, 1)
+    counter.expire(10.5)
+    assert (counter.forward, counter.backward) == (1, 1)
+    counter.add(16.0, True)
+    assert (counter.forward, counter.backward) == (2, 0)
+    counter.expire(100.0)
+    assert (counter.forward, counter.backward) == (0, 0)
+    assert (counter.total_forward, counter.total_backward) == (3, 1)
+
+
+class Image:
+    def __init__(self, frame_id):
+        self.image = np.zeros((100, 100, 3), dtype=np.uint8)
+        self.source_id = 0
+        self.frame_id = frame_id
+
+
+class Trajectory:
+    """
+    Object moving through given points of the bottom middle of its box in pixels of 100 x 100 frame,
+    the n-th point has frame id n and time stamp of n seconds from start_time
+    """
+    start_time = datetime.datetime(2024, 1, 1)
+
+    def __init__(self, object_id):
+        self.obj = ObjectResult()
+        self.obj.object_id = object_id
+        self.obj.source_id = 0
+        self.frame_id = 0
+
+    def move(self, *points) -> tuple:
+        first_idx = len(self.obj.history)
+        for x, y in points:
+            self.frame_id += 1
+            self.obj.frame_id = self.frame_id
+            self.obj.time_stamp = self.start_time + datetime.timedelta(seconds=self.frame_id)
+            self.obj.track = SimpleNamespace(bounding_box=[x - 5, y - 20, x + 5, y])
+            self.obj.last_image = Image(self.frame_id)
+            self.obj.history = self.obj.history.appended(self.obj.get_current_history_element())
+        return self.obj, first_idx
+
+
+@pytest.fixture
+def detector():
+    detector = LineCrossingEventsDetector(None)
+    detector.set_params(sources={'0': [[[0.5, 0.0], [0.5, 1.0]]]})
+    return detector
+
+
+def process(detector, *updated):
+    events = []
+    detector._process_updated(0, list(updated), events)
+    for event in events:
+        get_frame_cache().release(event.frame)
+    return [(event.object_id, event.direction, (event.time_crossed - Trajectory.start_time).seconds)
+            for event in events]
+
+
+def test_detector_touch_and_return(detector):
+    trajectory = Trajectory(1)
+    assert process(detector, trajectory.move((60, 50))) == []
+    assert process(detector, trajectory.move((50, 50))) == []
+    assert process(detector, trajectory.move((60, 50))) == []
+    assert process(detector, trajectory.move((50, 50), (60, 50))) == []
+    assert detector.get_counters()[0]['total_forward'] == 0
+    assert detector.get_counters()[0]['total_backward'] == 0
+
+
+def test_detector_crossing_through_line_point(detector):
+    trajectory = Trajectory(1)
+    process(detector, trajectory.move((60, 50)))
+    process(detector, trajectory.move((50, 50)))
+    # Пересечение засчитывается в точке, где объект оказался по другую сторону линии
+    events = []
+    detector._process_updated(0, [trajectory.move((40, 50))], events)
+    assert [(event.direction, event.frame.frame_id) for event in events] == [(CrossingDirection.Forward, 3)]
+    get_frame_cache().release(events[0].frame)
+    assert process(detector, trajectory.move((50, 50), (50, 60), (60, 60), (40, 60))) == \
+        [(1, CrossingDirection.Backward, 6), (1, CrossingDirection.Forward, 7)]
+    counters = detector.get_counters()[0]
+    assert (counters['total_forward'], counters['total_backward']) == (2, 1)
+
+
+def test_detector_objects_are_independent(detector):
+    first = Trajectory(1)
+    second = Trajectory(2)
+    process(detector, first.move((60, 50)), second.move((40, 50)))
+    assert process(detector, first.move((40, 50)), second.move((50, 50))) == [(1, CrossingDirection.Forward, 2)]
+    assert process(detector, second.move((40, 50))) == []
+
+
+def test_detector_frame_of_crossing_point(detector):
+    trajectory = Trajectory(1)
+    process(detector, trajectory.move((60, 50)))
+    # Кадр точки пересечения уже не последний кадр объекта и отсутствует в кэше
+    events = []
+    detector._process_updated(0, [trajectory.move((40, 50), (30, 50))], events)
+    assert len(events) == 1
+    assert events[0].frame is None
+    assert events[0].box == [35, 30, 45, 50]
@@ -0,0 +1,104 @@
+import copy
+
+from evileye.events_detectors.objects_delta import ObjectsDeltaReader
+from evileye.objects_handler.object_result import ObjectResult, ObjectsSnapshot
+
+
+class FakeObjectsHandler:
+    """Publishes snapshots of source 0, the chain is cut after max_versions like in ObjectsHandler"""
+
+    def __init__(self, max_versions=100):
+        self.max_versions = max_versions
+        self.snapshot = None
+
+    def publish(self, active=(), lost=(), updated_ids=(), lost_ids=()):
+        version = self.snapshot.version + 1 if self.snapshot is not None else 1
+        previous = self.snapshot if version % self.max_versions else None
+        self.snapshot = ObjectsSnapshot(0, version, tuple(active), tuple(lost), frozenset(updated_ids),
+                                        frozenset(lost_ids), previous)
+
+    def get_changes(self, source_id, since_version):
+        if self.snapshot is None:
+            return None, set(), set()
+        updated_ids, lost_ids = self.snapshot.get_changes_since(since_version)
+        return self.snapshot, updated_ids, lost_ids
+
+
+def advance(obj, frame_id):
+    """Updated copy of the object with a new history element, previous snapshots keep the old object"""
+    obj = copy.copy(obj)
+    obj.frame_id = frame_id
+    obj.history = obj.history.appended(obj.get_current_history_element())
+    return obj
+
+
+def make_object(object_id, frame_id):
+    obj = ObjectResult()
+    obj.object_id = object_id
+    obj.source_id = 0
+    return advance(obj, frame_id)
+
+
+def read_ids(reader):
+    updated, lost = reader.read(0)
+    return ([(obj.object_id, first_idx) for obj, first_idx in updated],
+            [(obj.object_id, first_idx) for obj, first_idx in lost])
+
+
+def test_no_snapshot():
+    assert ObjectsDeltaReader(FakeObjectsHandler()).read(0) == ([], [])
+
+
+def test_only_new_history_points_are_read():
+    handler = FakeObjectsHandler()
+    reader = ObjectsDeltaReader(handler)
+    first, second = make_object(1, 1), make_object(2, 1)
+    handler.publish(active=[first, second], updated_ids=[1, 2])
+    assert read_ids(reader) == ([(1, 0), (2, 0)], [])
+    assert read_ids(reader) == ([], [])
+
+    first = advance(first, 2)
+    handler.publish(active=[first, second], updated_ids=[1])
+    first = advance(first, 3)
+    handler.publish(active=[first, second], updated_ids=[1])
+    # Две версии читаются за один раз, начиная с первой непрочитанной точки
+    assert read_ids(reader) == ([(1, 1)], [])
+
+
+def test_lost_objects_are_reported_once():
+    handler = FakeObjectsHandler()
+    reader = ObjectsDeltaReader(handler)
+    obj = make_object(1, 1)
+    handler.publish(active=[obj], updated_ids=[1])
+    read_ids(reader)
+    obj = advance(obj, 2)
+    handler.publish(lost=[obj], lost_ids=[1])
+    # У потерянного объекта возвращаются только непрочитанные точки
+    assert read_ids(reader) == ([], [(1, 1)])
+    handler.publish(lost=[obj])
+    assert read_ids(reader) == ([], [])
+
+
+def test_object_updated_and_lost_between_reads_is_only_lost():
+    handler = FakeObjectsHandler()
+    reader = ObjectsDeltaReader(handler)
+    obj = make_object(1, 1)
+    handler.publish(active=[obj], updated_ids=[1])
+    handler.publish(lost=[obj], lost_ids=[1])
+    assert read_ids(reader) == ([], [(1, 0)])
+
+
+def test_cut_chain_reports_all_objects_without_repeats():
+    handler = FakeObjectsHandler(max_versions=3)
+    reader = ObjectsDeltaReader(handler)
+    active, lost = make_object(1, 1), make_object(2, 1)
+    handler.publish(active=[active, lost], updated_ids=[1, 2])
+    read_ids(reader)
+    handler.publish(active=[active], lost=[lost], lost_ids=[2])
+    assert read_ids(reader) == ([], [(2, 1)])
+
+    for _ in range(3):
+        handler.publish(active=[active], lost=[lost])
+    # Цепочка снимков обрезана: обработчик сообщает обо всех объектах, но потерянный объект уже был прочитан,
+    # а у активного нет новых точек
+    assert read_ids(reader) == ([], [])
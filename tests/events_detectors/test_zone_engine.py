@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from evileye.events_detectors.zone import Zone, ZoneForm
+from evileye.events_detectors.zone_engine import ZoneEngine
+
+IMG_WIDTH = 640
+IMG_HEIGHT = 480
+
+
+def is_point_in_zone(point, zone, img_width, img_height):
+    """Reference scalar check of a point against a zone in pixels"""
+    zone_coords = [(x * img_width, y * img_height) for x, y in zone.get_coords()]
+    x_obj, y_obj = point
+    if zone.get_zone_form() == ZoneForm.Rectangle:
+        return (zone_coords[0][0] <= x_obj <= zone_coords[1][0] and
+                zone_coords[0][1] <= y_obj <= zone_coords[2][1])
+    zone_coords.append(zone_coords[0])
+    count = 0
+    for (x1, y1), (x2, y2) in zip(zone_coords[:-1], zone_coords[1:]):
+        if (y_obj < y1) != (y_obj < y2) and x_obj < x1 + ((y_obj - y1) / (y2 - y1)) * (x2 - x1):
+            count += 1
+    return count % 2 == 1
+
+
+def make_zones(rng, num_zones):
+    zones = []
+    for zone_id in range(num_zones):
+        x, y = rng.uniform(0.0, 0.8, 2)
+        width, height = rng.uniform(0.05, 0.2, 2)
+        if zone_id % 2:
+            coords = ((x, y), (x + width, y), (x + width, y + height), (x, y + height))
+            zone = Zone(0, coords, 'rect')
+        else:
+            num_vertices = int(rng.integers(3, 8))
+            angles = np.sort(rng.uniform(0, 2 * np.pi, num_vertices))
+            radii = rng.uniform(0.3, 1.0, num_vertices)
+            coords = tuple((float(x + width * (1 + r * np.cos(a)) / 2), float(y + height * (1 + r * np.sin(a)) / 2))
+                           for a, r in zip(angles, radii))
+            zone = Zone(0, coords, 'poly')
+        zone.set_id(zone_id + 1)
+        zones.append(zone)
+    return zones
+
+
+def reference_contains(zones, points):
+    return np.array([[is_point_in_zone(point, zone, IMG_WIDTH, IMG_HEIGHT) for zone in zones]
+                     for point in points.tolist()], dtype=bool).reshape(len(points), len(zones))
+
+
+@pytest.fixture
+def zones_and_points():
+    rng = np.random.default_rng(12345)
+    zones = make_zones(rng, 25)
+    points = rng.uniform((0, 0), (IMG_WIDTH, IMG_HEIGHT), (2000, 2))
+    # Точки на вершинах и границах зон и за пределами кадра
+    vertices = np.array([(x * IMG_WIDTH, y * IMG_HEIGHT) for zone in zones for x, y in zone.get_coords()])
+    outside = np.array([(-5.0, 10.0), (IMG_WIDTH + 1.0, 10.0), (10.0, IMG_HEIGHT + 3.0), (IMG_WIDTH, IMG_HEIGHT)])
+    return zones, np.concatenate((points, vertices, outside))
+
+
+@pytest.mark.parametrize('grid_size', [None, 1, 4, 16, 64])
+def test_contains_matches_reference(zones_and_points, grid_size):
+    zones, points = zones_and_points
+    engine = ZoneEngine(zones, grid_size=grid_size)
+    result = engine.contains(points, IMG_WIDTH, IMG_HEIGHT)
+    assert result.shape == (len(points), len(zones))
+    np.testing.assert_array_equal(result, reference_contains(zones, points))
+
+
+def test_grid_equals_full_scan(zones_and_points):
+    zones, points = zones_and_points
+    full_scan = ZoneEngine(zones).contains(points, IMG_WIDTH, IMG_HEIGHT)
+    for grid_size in (2, 8, 32):
+        np.testing.assert_array_equal(ZoneEngine(zones, grid_size=grid_size).contains(points, IMG_WIDTH, IMG_HEIGHT),
+                                      full_scan)
+
+
+def test_columns_follow_zone_order(zones_and_points):
+    zones, _ = zones_and_points
+    engine = ZoneEngine(zones, grid_size=8)
+    assert len(engine) == len(zones)
+    for column, zone in enumerate(zones):
+        assert engine.get_column(zone.get_zone_id()) == column
+
+
+@pytest.mark.parametrize('grid_size', [None, 8])
+def test_empty_inputs(grid_size):
+    zones = make_zones(np.random.default_rng(0), 3)
+    assert ZoneEngine(zones, grid_size).contains(np.zeros((0, 2)), IMG_WIDTH, IMG_HEIGHT).shape == (0, 3)
+    assert ZoneEngine([], grid_size).contains(np.ones((4, 2)), IMG_WIDTH, IMG_HEIGHT).shape == (4, 0)
+
+
+@pytest.mark.parametrize('grid_size', [None, 4])
+def test_resolution_change(grid_size):
+    zone = Zone(0, ((0.25, 0.25), (0.75, 0.25), (0.75, 0.75), (0.25, 0.75)), 'rect')
+    zone.set_id(1)
+    engine = ZoneEngine([zone], grid_size)
+    assert engine.contains([(50, 50)], 100, 100)[0, 0]
+    assert not engine.contains([(50, 50)], 400, 400)[0, 0]
+    assert engine.contains([(200, 200)], 400, 400)[0, 0]
@@ -0,0 +1,181 @@
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from evileye.events_detectors.zone_events_detector import ZoneEventsDetector
+from evileye.objects_handler.object_result import ObjectResult
+from evileye.utils.frame_cache import get_frame_cache
+
+# Зона занимает левую половину кадра 100 x 100
+ZONE_COORDS = ((0.0, 0.0), (0.5, 0.0), (0.5, 1.0), (0.0, 1.0))
+
+
+class Image:
+    def __init__(self, frame_id):
+        self.image = np.zeros((100, 100, 3), dtype=np.uint8)
+        self.source_id = 0
+        self.frame_id = frame_id
+
+
+class Trajectory:
+    """
+    Object moving through given points of the bottom middle of its box in pixels,
+    the n-th point has frame id n and time stamp of n seconds from start_time
+    """
+    start_time = datetime.datetime(2024, 1, 1)
+
+    def __init__(self, object_id):
+        self.obj = ObjectResult()
+        self.obj.object_id = object_id
+        self.obj.source_id = 0
+        self.frame_id = 0
+
+    def move(self, *points) -> tuple:
+        first_idx = len(self.obj.history)
+        for x, y in points:
+            self.frame_id += 1
+            self.obj.frame_id = self.frame_id
+            self.obj.time_stamp = self.start_time + datetime.timedelta(seconds=self.frame_id)
+            self.obj.track = SimpleNamespace(bounding_box=[x - 5, y - 20, x + 5, y])
+            self.obj.last_image = Image(self.frame_id)
+            self.obj.history = self.obj.history.appended(self.obj.get_current_history_element())
+        return self.obj, first_idx
+
+
+def make_detector(event_threshold=0, zone_left_threshold=0):
+    detector = ZoneEventsDetector(None)
+    detector.set_params(sources={'0': [ZONE_COORDS]}, event_threshold=event_threshold,
+                        zone_left_threshold=zone_left_threshold)
+    detector.init()
+    detector._update_zones()
+    return detector
+
+
+def process(detector, *updated):
+    events = []
+    detector._process_updated(0, list(updated), events)
+    return events
+
+
+def release(events):
+    for event in events:
+        for frame in event.get_frames():
+            get_frame_cache().release(frame)
+
+
+@pytest.fixture
+def detector():
+    return make_detector()
+
+
+def test_entry_frame_is_last_image_of_entry_point(detector):
+    trajectory = Trajectory(1)
+    assert process(detector, trajectory.move((60, 50))) == []
+    events = process(detector, trajectory.move((40, 50)))
+    assert [(event.is_finished(), event.frame_entered.frame_id) for event in events] == [(False, 2)]
+    assert events[0].box_entered == [35, 30, 45, 50]
+    release(events)
+
+
+def test_entry_frame_of_earlier_point_is_not_last_image(detector):
+    trajectory = Trajectory(1)
+    process(detector, trajectory.move((60, 50)))
+    # Точка входа не последняя из прочитанных, ее кадра нет в кэше: рамка не рисуется на чужом кадре
+    events = process(detector, trajectory.move((40, 50), (30, 50)))
+    assert len(events) == 1
+    assert events[0].frame_entered is None
+    assert events[0].box_entered == [35, 30, 45, 50]
+
+
+def test_entry_frame_of_earlier_point_is_taken_from_cache(detector):
+    trajectory = Trajectory(1)
+    process(detector, trajectory.move((60, 50)))
+    held = detector.candidate_frames.acquire(Image(2))
+    events = process(detector, trajectory.move((40, 50), (30, 50)))
+    assert events[0].frame_entered.frame_id == 2
+    assert get_frame_cache().get(events[0].frame_entered) is not None
+    release(events)
+    detector.candidate_frames.release(held)
+
+
+def test_candidate_frames_are_bounded_separately():
+    detector = make_detector(event_threshold=10)
+    event_frame = get_frame_cache().acquire(Image(-1))
+    trajectories = []
+    for object_id in range(200):
+        trajectory = Trajectory(object_id)
+        trajectory.frame_id = 100 * object_id  # Объекты видны на разных кадрах
+        trajectories.append(trajectory)
+    assert process(detector, *[trajectory.move((40, 50)) for trajectory in trajectories]) == []
+
+    # Кандидаты вытесняют только друг друга, кадры событий, ожидающих сохранения, остаются в общем кэше
+    candidate_frames = detector.candidate_frames.get_debug_info()
+    assert (candidate_frames['size'], candidate_frames['evicted']) == (128, 72)
+    assert get_frame_cache().get(event_frame) is not None
+    get_frame_cache().release(event_frame)
+
+    for trajectory in trajectories:
+        detector._process_lost([(trajectory.obj, 0)], [])
+    assert detector.candidate_frames.get_debug_info()['size'] == 0
+
+
+def entries_and_exits(events):
+    release(events)
+    return [('left' if event.is_finished() else 'entered',
+             ((event.time_left if event.is_finished() else event.time_entered) - Trajectory.start_time).seconds)
+            for event in events]
+
+
+def test_entry_needs_event_threshold_in_zone():
+    detector = make_detector(event_threshold=2, zone_left_threshold=10)
+    trajectory = Trajectory(1)
+    assert process(detector, trajectory.move((40, 50), (40, 50))) == []
+    # Короткий выход из зоны не сбрасывает точку входа
+    assert process(detector, trajectory.move((60, 50))) == []
+    assert entries_and_exits(process(detector, trajectory.move((40, 50)))) == [('entered', 1)]
+    assert detector.zone_id_people[0] == 1
+
+
+def test_entry_candidate_is_forgotten_after_zone_left_threshold():
+    detector = make_detector(event_threshold=3, zone_left_threshold=1)
+    trajectory = Trajectory(1)
+    assert process(detector, trajectory.move((40, 50), (60, 50), (60, 50), (60, 50))) == []
+    assert detector.candidate_frames.get_debug_info()['references'] == 0
+    assert process(detector, trajectory.move((40, 50), (40, 50), (40, 50))) == []
+    assert entries_and_exits(process(detector, trajectory.move((40, 50)))) == [('entered', 5)]
+
+
+def test_exit_needs_zone_left_threshold_outside():
+    detector = make_detector(event_threshold=0, zone_left_threshold=2)
+    trajectory = Trajectory(1)
+    assert entries_and_exits(process(detector, trajectory.move((40, 50)))) == [('entered', 1)]
+    # Возврат в зону до истечения zone_left_threshold отменяет выход
+    assert process(detector, trajectory.move((60, 50), (60, 50), (40, 50))) == []
+    assert process(detector, trajectory.move((60, 50), (60, 50), (60, 50))) == []
+    assert entries_and_exits(process(detector, trajectory.move((60, 50)))) == [('left', 5)]
+    assert detector.zone_id_people[0] == 0
+    assert detector.obj_ids_zone[1] == {}
+
+
+def test_reentry_after_exit_in_one_read():
+    detector = make_detector(event_threshold=0, zone_left_threshold=1)
+    trajectory = Trajectory(1)
+    events = process(detector, trajectory.move((40, 50), (60, 50), (60, 50), (60, 50), (40, 50)))
+    assert entries_and_exits(events) == [('entered', 1), ('left', 2), ('entered', 5)]
+    assert detector.zone_id_people[0] == 1
+
+
+def test_lost_object_in_zone_finishes_event():
+    detector = make_detector(event_threshold=0, zone_left_threshold=10)
+    trajectory = Trajectory(1)
+    release(process(detector, trajectory.move((40, 50))))
+    assert process(detector, trajectory.move((60, 50))) == []
+    assert detector.candidate_frames.get_debug_info()['references'] == 1
+    events = []
+    detector._process_lost([(trajectory.obj, 2)], events)
+    assert [(event.is_finished(), event.object_id) for event in events] == [(True, 1)]
+    release(events)
+    assert detector.zone_id_people[0] == 0
+    assert detector.candidate_frames.get_debug_info()['references'] == 0
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from evileye.object_multi_camera_tracker.embedding_gallery import EmbeddingGallery, FlatIndex, IvfIndex
+
+
+def normalized(rng, num, dim=16):
+    vectors = rng.normal(size=(num, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top(vectors, valid, queries, k):
+    sims = queries @ vectors.T
+    sims[:, ~valid] = -np.inf
+    return np.argsort(-sims, axis=1)[:, :k]
+
+
+@pytest.mark.parametrize('index_type', [FlatIndex, IvfIndex])
+def test_index_search_matches_exact_search(index_type):
+    rng = np.random.default_rng(0)
+    vectors = normalized(rng, 50)
+    index = index_type(16, 64)
+    for row, vector in enumerate(vectors):
+        index.add(row, vector)
+    index.remove(3)
+    valid = np.ones(50, dtype=bool)
+    valid[3] = False
+
+    sims, rows = index.search(vectors[:5], 4)
+    assert rows.tolist() == exact_top(vectors, valid, vectors[:5], 4).tolist()
+    assert np.all(np.diff(sims, axis=1) <= 0)
+    assert 3 not in rows
+
+
+def test_flat_index_returns_missing_rows_when_small():
+    index = FlatIndex(4, 8)
+    index.add(0, np.array([1, 0, 0, 0], dtype=np.float32))
+    sims, rows = index.search(np.array([[1, 0, 0, 0]], dtype=np.float32), 3)
+    assert rows.tolist() == [[0, -1, -1]]
+    assert sims[0, 0] == pytest.approx(1.0)
+
+
+def test_ivf_index_is_trained_and_finds_stored_vectors():
+    rng = np.random.default_rng(1)
+    vectors = normalized(rng, 200)
+    index = IvfIndex(16, 256, num_lists=4, nprobe=4, train_size=100)
+    for row, vector in enumerate(vectors):
+        index.add(row, vector)
+        assert index.is_trained == (row + 1 >= 100)
+    # Все списки просматриваются, поэтому результат совпадает с точным поиском
+    _, rows = index.search(vectors[:10], 1)
+    assert rows[:, 0].tolist() == list(range(10))
+    index.remove(0)
+    _, rows = index.search(vectors[:1], 1)
+    assert rows[0, 0] != 0
+
+
+def test_ring_buffer_overwrites_oldest():
+    rng = np.random.default_rng(2)
+    vectors = normalized(rng, 5)
+    gallery = EmbeddingGallery(max_size=3, max_age_secs=None)
+    for global_id, vector in enumerate(vectors):
+        gallery.add(global_id, vector, time_stamp=float(global_id))
+    assert len(gallery) == 3
+    assert [global_id in gallery for global_id in range(5)] == [False, False, True, True, True]
+    assert gallery.search(vectors[:1], k=3)[0][0][0] != 0
+
+
+def test_expire_drops_old_embeddings():
+    rng = np.random.default_rng(3)
+    vectors = normalized(rng, 4)
+    gallery = EmbeddingGallery(max_size=10, max_age_secs=10.0)
+    for global_id, vector in enumerate(vectors):
+        gallery.add(global_id, vector, time_stamp=100.0 + 5 * global_id)
+    gallery.remove(2)
+    gallery.expire(now=120.0)
+    assert sorted(gallery.rows_by_id) == [3]
+    assert len(gallery) == 1
+    # Удаленная строка в хвосте не останавливает удаление устаревших строк
+    gallery.expire(now=1000.0)
+    assert len(gallery) == 0
+    assert gallery.num_rows == 0
+
+
+def test_reidentification_by_closest_embedding():
+    rng = np.random.default_rng(4)
+    vectors = normalized(rng, 3)
+    gallery = EmbeddingGallery(max_size=10, max_age_secs=None)
+    gallery.add(7, vectors[0])
+    gallery.add(7, vectors[1])
+    gallery.add(9, vectors[2])
+    query = vectors[1] + 0.05 * normalized(rng, 1)[0]
+    results = gallery.search(query[np.newaxis], k=3)
+    assert [global_id for global_id, _ in results[0]] == [7, 9]
+    assert results[0][0][1] < 0.05
+    gallery.remove(7)
+    assert [global_id for global_id, _ in gallery.search(query[np.newaxis])[0]] == [9]
+
+
+def test_unknown_index_type():
+    with pytest.raises(ValueError):
+        EmbeddingGallery(index_type='unknown')
@@ -0,0 +1,59 @@
+from evileye.object_multi_camera_tracker.frame_synchronizer import FrameSynchronizer
+
+
+def make_synchronizer(source_ids=(0, 1, 2)):
+    return FrameSynchronizer(list(source_ids), tolerance_secs=0.1, deadline_secs=0.5)
+
+
+def test_frames_within_tolerance_are_grouped():
+    synchronizer = make_synchronizer()
+    synchronizer.put(0, 10.00, 'a0', arrival_time=100.0)
+    synchronizer.put(1, 10.05, 'b0', arrival_time=100.0)
+    assert synchronizer.pop_groups(now=100.0) == []
+    synchronizer.put(2, 10.10, 'c0', arrival_time=100.1)
+    assert synchronizer.pop_groups(now=100.1) == [{0: 'a0', 1: 'b0', 2: 'c0'}]
+    assert synchronizer.get_num_pending() == 0
+    assert (synchronizer.num_groups, synchronizer.num_partial_groups) == (1, 0)
+
+
+def test_frame_out_of_tolerance_goes_to_next_group():
+    synchronizer = make_synchronizer()
+    synchronizer.put(0, 10.0, 'a0', arrival_time=100.0)
+    synchronizer.put(1, 10.2, 'b1', arrival_time=100.0)
+    synchronizer.put(2, 10.0, 'c0', arrival_time=100.0)
+    synchronizer.put(0, 10.2, 'a1', arrival_time=100.2)
+    synchronizer.put(2, 10.2, 'c1', arrival_time=100.2)
+    # Источник 1 уже передал более поздний кадр, поэтому первая группа выпускается без ожидания
+    assert synchronizer.pop_groups(now=100.2) == [{0: 'a0', 2: 'c0'}, {0: 'a1', 1: 'b1', 2: 'c1'}]
+    assert (synchronizer.num_groups, synchronizer.num_partial_groups) == (2, 1)
+
+
+def test_partial_group_is_released_at_deadline():
+    synchronizer = make_synchronizer()
+    synchronizer.put(0, 10.0, 'a0', arrival_time=100.0)
+    synchronizer.put(1, 10.0, 'b0', arrival_time=100.2)
+    assert synchronizer.get_next_deadline() == 100.5
+    assert synchronizer.pop_groups(now=100.49) == []
+    assert synchronizer.pop_groups(now=100.5) == [{0: 'a0', 1: 'b0'}]
+    assert synchronizer.get_next_deadline() is None
+    assert (synchronizer.num_groups, synchronizer.num_partial_groups) == (1, 1)
+
+
+def test_stalled_source_does_not_block_others():
+    synchronizer = make_synchronizer()
+    for i in range(5):
+        synchronizer.put(0, 10.0 + 0.25 * i, f'a{i}', arrival_time=100.0 + 0.25 * i)
+        synchronizer.put(1, 10.0 + 0.25 * i, f'b{i}', arrival_time=100.0 + 0.25 * i)
+
+    # Источник 2 не присылает кадры: каждая группа ждет его не дольше deadline_secs после прихода своего кадра
+    assert synchronizer.pop_groups(now=100.75) == [{0: 'a0', 1: 'b0'}, {0: 'a1', 1: 'b1'}]
+    assert synchronizer.get_next_deadline() == 101.0
+    assert synchronizer.pop_groups(now=101.5) == [{0: f'a{i}', 1: f'b{i}'} for i in range(2, 5)]
+    assert synchronizer.get_num_pending() == 0
+
+    # Кадр возобновившегося источника с более поздним временем съемки сразу выпускает ожидающую группу
+    synchronizer.put(0, 11.25, 'a5', arrival_time=101.75)
+    synchronizer.put(1, 11.25, 'b5', arrival_time=101.75)
+    synchronizer.put(2, 11.5, 'c6', arrival_time=101.75)
+    assert synchronizer.pop_groups(now=101.75) == [{0: 'a5', 1: 'b5'}]
+    assert synchronizer.pop_groups(now=102.25) == [{2: 'c6'}]
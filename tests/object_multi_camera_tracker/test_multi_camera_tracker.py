@@ -0,0 +1,73 @@
+import numpy as np
+
+from evileye.object_multi_camera_tracker.custom_object_tracking import MultiCameraTracker, ObjectMultiCameraTracking
+from evileye.object_multi_camera_tracker.embedding_gallery import EmbeddingGallery
+from evileye.object_tracker.trackers.basetrack import TrackState
+
+DIM = 8
+
+
+class FakeTrack:
+    """Single-camera track with a fixed appearance feature"""
+
+    def __init__(self, track_id, feature_axis, state=TrackState.Tracked):
+        feature = np.zeros(DIM, dtype=np.float32)
+        feature[feature_axis] = 1.0
+        self.track_id = track_id
+        self.state = state
+        self.smooth_feat = [feature]
+        self.curr_feat = [feature]
+        self.tracklet_len = 10
+
+
+def make_tracker(gallery_archive_frames=3):
+    gallery = EmbeddingGallery(max_size=100, max_age_secs=None)
+    return MultiCameraTracker(2, [None], gallery=gallery, gallery_archive_frames=gallery_archive_frames)
+
+
+def global_ids(mct_tracks):
+    return {t.global_track_id for t in mct_tracks}
+
+
+def test_track_unmatched_for_one_frame_is_not_archived():
+    tracker = make_tracker()
+    first = tracker.update([[FakeTrack(1, 0)], []])
+    global_id = first[0].global_track_id
+    tracker.update([[FakeTrack(2, 1)], []])
+    assert global_id not in tracker.gallery
+    assert global_id in global_ids(tracker.mct_tracks)
+
+    # Новый трек того же объекта сопоставляется по признакам, история признаков глобального трека сохраняется
+    tracker.update([[FakeTrack(2, 1)], [FakeTrack(3, 0)]])
+    (global_track,) = [t for t in tracker.mct_tracks if t.global_track_id == global_id]
+    assert 3 in [t.track_id for t in global_track.sc_tracks.values()]
+    assert len(global_track.features[0]) == 2
+    assert global_track.frames_unmatched == 0
+
+
+def test_track_unmatched_for_archive_frames_is_reidentified():
+    tracker = make_tracker(gallery_archive_frames=2)
+    global_id = tracker.update([[FakeTrack(1, 0)], []])[0].global_track_id
+    tracker.update([[FakeTrack(2, 1)], []])
+    assert global_id not in tracker.gallery
+    tracker.update([[FakeTrack(2, 1)], []])
+    assert global_id in tracker.gallery
+    assert global_id not in global_ids(tracker.mct_tracks)
+
+    result = tracker.update([[FakeTrack(2, 1)], [FakeTrack(3, 0)]])
+    assert global_id in global_ids(result)
+    assert global_id not in tracker.gallery
+
+
+def test_track_with_removed_camera_tracks_is_archived():
+    tracker = make_tracker(gallery_archive_frames=100)
+    tracker.include_lost_tracks = True
+    global_id = tracker.update([[FakeTrack(1, 0)], []])[0].global_track_id
+    (global_track,) = tracker.mct_tracks
+    global_track.sc_tracks[0].state = TrackState.Removed
+    tracker.update([[FakeTrack(2, 1)], []])
+    assert global_id in tracker.gallery
+
+
+def test_gallery_size_defaults_are_equal():
+    assert EmbeddingGallery().max_size == ObjectMultiCameraTracking().reid_gallery['max_size']
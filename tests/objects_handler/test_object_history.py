@@ -0,0 +1,99 @@
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+from evileye.objects_handler.object_result import ObjectHistory, ObjectResultHistory
+
+
+def make_element(frame_id):
+    element = ObjectResultHistory()
+    element.frame_id = frame_id
+    element.time_stamp = datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=frame_id)
+    element.track = SimpleNamespace(bounding_box=[frame_id, 0, frame_id + 10, 20])
+    return element
+
+
+def append_frames(history, frame_ids):
+    for frame_id in frame_ids:
+        history = history.appended(make_element(frame_id))
+    return history
+
+
+def assert_view(history, frame_ids):
+    assert len(history) == len(frame_ids)
+    assert [element.frame_id for element in history] == list(frame_ids)
+    assert history.frame_ids.tolist() == list(frame_ids)
+    assert history.boxes[:, 0].tolist() == list(frame_ids)
+
+
+def test_empty_history():
+    history = ObjectHistory(5)
+    assert not history
+    assert len(history) == 0
+    assert history.frame_ids.shape == (0,)
+    assert history.bottom_centers().shape == (0, 2)
+    assert history.find_frame(1) == -1
+
+
+def test_bounded_to_max_len():
+    history = append_frames(ObjectHistory(3), range(10))
+    assert_view(history, [7, 8, 9])
+    assert history[0].frame_id == 7
+    assert history[-1].frame_id == 9
+    assert history.find_frame(8) == 1
+    assert history.find_frame(6) == -1
+    np.testing.assert_allclose(history.time_stamps[1:] - history.time_stamps[:-1], [1.0, 1.0])
+
+
+def test_older_views_not_mutated_by_newer_appends():
+    max_len = 4
+    views = [ObjectHistory(max_len)]
+    for frame_id in range(20):
+        views.append(views[-1].appended(make_element(frame_id)))
+    # Каждая опубликованная ранее история видит те же элементы, что и в момент создания
+    for num_appended, view in enumerate(views):
+        assert_view(view, list(range(max(0, num_appended - max_len), num_appended)))
+
+
+def test_append_twice_to_same_view():
+    base = append_frames(ObjectHistory(4), range(3))
+    first = base.appended(make_element(100))
+    second = base.appended(make_element(200))
+    assert_view(base, [0, 1, 2])
+    assert_view(first, [0, 1, 2, 100])
+    assert_view(second, [0, 1, 2, 200])
+    assert_view(first.appended(make_element(101)), [1, 2, 100, 101])
+    assert_view(first, [0, 1, 2, 100])
+    assert_view(second, [0, 1, 2, 200])
+
+
+def test_compaction_at_storage_boundary():
+    max_len = 3
+    history = ObjectHistory(max_len)
+    views = []
+    # Хранилище рассчитано на 2 * max_len строк, добавления переходят через его границу несколько раз
+    for frame_id in range(4 * max_len + 1):
+        history = history.appended(make_element(frame_id))
+        views.append(history)
+        if frame_id == 2 * max_len - 1:
+            assert history._stop == 2 * max_len
+    storages = {id(view._storage) for view in views}
+    assert len(storages) > 1
+    for frame_id, view in enumerate(views):
+        assert_view(view, list(range(max(0, frame_id + 1 - max_len), frame_id + 1)))
+
+
+def test_append_to_view_at_boundary_after_newer_append():
+    max_len = 3
+    full = append_frames(ObjectHistory(max_len), range(2 * max_len))
+    newer = full.appended(make_element(100))
+    branch = full.appended(make_element(200))
+    assert_view(full, [3, 4, 5])
+    assert_view(newer, [4, 5, 100])
+    assert_view(branch, [4, 5, 200])
+
+
+def test_bottom_centers():
+    history = append_frames(ObjectHistory(5), [0, 10])
+    np.testing.assert_allclose(history.bottom_centers(), [[5.0, 20.0], [15.0, 20.0]])
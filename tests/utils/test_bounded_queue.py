@@ -0,0 +1,205 @@
+import os
+import struct
+import threading
+import time
+from queue import Empty, Full
+
+import pytest
+
+from evileye.utils.bounded_queue import BoundedQueue, OverflowPolicy, create_queue
+
+
+def drain(queue):
+    items = []
+    while True:
+        try:
+            items.append(queue.get_nowait())
+        except Empty:
+            return items
+
+
+def start_thread(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+@pytest.fixture
+def spill_path(tmp_path):
+    return str(tmp_path / 'queues' / 'test.journal')
+
+
+def test_block_policy_waits_for_space():
+    queue = BoundedQueue(2, OverflowPolicy.Block)
+    queue.put(1)
+    queue.put(2)
+    with pytest.raises(Full):
+        queue.put(3, block=False)
+    with pytest.raises(Full):
+        queue.put(3, timeout=0.01)
+
+    producer = start_thread(lambda: queue.put(3))
+    time.sleep(0.05)
+    assert producer.is_alive()
+    assert queue.get() == 1
+    producer.join(1.0)
+    assert not producer.is_alive()
+    assert drain(queue) == [2, 3]
+    # Неблокирующая попытка не считается ожиданием
+    assert queue.get_debug_info()['blocked'] == 2
+
+
+def test_close_unblocks_producer():
+    dropped = []
+    queue = BoundedQueue(1, 'block', on_drop=dropped.append)
+    queue.put(1)
+    producer = start_thread(lambda: queue.put(2))
+    time.sleep(0.05)
+    assert producer.is_alive()
+    queue.close()
+    producer.join(1.0)
+    assert not producer.is_alive()
+    assert dropped == [2]
+    # После закрытия заполненная очередь не блокирует производителей
+    queue.put(3)
+    assert dropped == [2, 3]
+    assert drain(queue) == [1]
+
+
+def test_drop_oldest_calls_on_drop():
+    dropped = []
+    queue = BoundedQueue(3, 'drop_oldest', on_drop=dropped.append)
+    for item in range(5):
+        queue.put(item)
+    assert dropped == [0, 1]
+    assert drain(queue) == [2, 3, 4]
+    debug_info = queue.get_debug_info()
+    assert debug_info['dropped'] == 2
+    assert debug_info['max_size_reached'] == 3
+
+
+def test_spill_preserves_order(spill_path):
+    queue = BoundedQueue(2, 'spill', spill_path)
+    for item in range(5):
+        queue.put(item)
+    assert queue.qsize() == 5
+    assert os.path.getsize(spill_path) > 0
+    assert queue.get() == 0
+    # Новые элементы попадают в журнал, пока он не разобран, порядок сохраняется
+    queue.put(5)
+    assert drain(queue) == [1, 2, 3, 4, 5]
+    assert os.path.getsize(spill_path) == 0
+    debug_info = queue.get_debug_info()
+    assert (debug_info['spilled'], debug_info['replayed'], debug_info['pending_spilled']) == (4, 4, 0)
+
+
+def test_spill_blocking_get_replays_journal(spill_path):
+    queue = BoundedQueue(1, 'spill', spill_path)
+    for item in range(3):
+        queue.put(item)
+    assert [queue.get(timeout=1.0) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(Empty):
+        queue.get(timeout=0.01)
+
+
+def test_replay_after_reopen(spill_path):
+    queue = BoundedQueue(2, 'spill', spill_path)
+    for item in range(6):
+        queue.put({'item': item})
+    assert queue.get() == {'item': 0}
+    assert queue.get() == {'item': 1}
+    queue.close()
+
+    # Элементы, оставшиеся в памяти закрытой очереди, не сохраняются, журнал переносится в новую очередь
+    reopened = BoundedQueue(2, 'spill', spill_path)
+    assert reopened.qsize() == 3
+    assert drain(reopened) == [{'item': 3}, {'item': 4}, {'item': 5}]
+    assert os.path.getsize(spill_path) == 0
+    reopened.close()
+
+    assert BoundedQueue(2, 'spill', spill_path).qsize() == 0
+
+
+def test_partial_record_is_truncated(spill_path):
+    queue = BoundedQueue(1, 'spill', spill_path)
+    for item in range(3):
+        queue.put(item)
+    queue.close()
+    valid_size = os.path.getsize(spill_path)
+    with open(spill_path, 'ab') as file:
+        file.write(struct.pack('<I', 100) + b'partial')
+
+    reopened = BoundedQueue(1, 'spill', spill_path)
+    assert reopened.qsize() == 2
+    assert os.path.getsize(spill_path) == valid_size
+    assert drain(reopened) == [1, 2]
+
+
+def test_corrupt_record_does_not_break_blocking_get(spill_path):
+    queue = BoundedQueue(1, 'spill', spill_path)
+    for item in ('first', 'second', 'third'):
+        queue.put(item)
+    queue.close()
+    with open(spill_path, 'r+b') as file:
+        size, = struct.unpack('<I', file.read(4))
+        file.write(b'\x00' * size)
+
+    reopened = BoundedQueue(1, 'spill', spill_path)
+    assert reopened.qsize() == 2
+    results = []
+    consumer = start_thread(lambda: [results.append(reopened.get()) for _ in range(2)])
+    time.sleep(0.05)
+    assert results == ['third']
+    reopened.put('fourth')
+    consumer.join(1.0)
+    assert not consumer.is_alive()
+    assert results == ['third', 'fourth']
+    assert reopened.get_debug_info()['dropped'] == 1
+
+
+def test_unfinished_tasks_are_consistent(spill_path):
+    queue = BoundedQueue(1, 'spill', spill_path)
+    queue.put('first')
+    queue.put(lambda: None)  # Не сериализуется и отбрасывается
+    queue.put('second')
+    assert queue.get_debug_info()['dropped'] == 1
+    for _ in range(2):
+        queue.get()
+        queue.task_done()
+    joined = start_thread(queue.join)
+    joined.join(1.0)
+    assert not joined.is_alive()
+
+    queue.put('third')
+    queue.put('fourth')
+    queue.close()
+    queue.get()
+    queue.task_done()
+    joined = start_thread(queue.join)
+    joined.join(1.0)
+    assert not joined.is_alive()
+
+
+def test_journal_read_error_discards_pending(spill_path):
+    queue = BoundedQueue(1, 'spill', spill_path)
+    for item in range(3):
+        queue.put(item)
+    queue._spill_file.truncate(0)
+    assert queue.get() == 0
+    with pytest.raises(Empty):
+        queue.get(timeout=0.01)
+    assert queue.qsize() == 0
+    assert queue.unfinished_tasks == 1
+    assert queue.get_debug_info()['dropped'] == 2
+
+
+def test_spill_requires_path():
+    with pytest.raises(ValueError):
+        BoundedQueue(1, 'spill')
+
+
+def test_create_queue_journal_path(tmp_path):
+    queue = create_queue('stage', 4, 'spill', str(tmp_path))
+    assert queue.spill_path == os.path.join(str(tmp_path), 'stage.journal')
+    queue.put(1)
+    queue.close()
@@ -0,0 +1,61 @@
+import numpy as np
+
+from evileye.utils.frame_cache import FrameCache
+
+
+class Image:
+    def __init__(self, frame_id, source_id=0):
+        self.image = np.zeros((10, 20, 3), dtype=np.uint8)
+        self.source_id = source_id
+        self.frame_id = frame_id
+
+
+def test_frame_is_kept_until_all_references_are_released():
+    cache = FrameCache(4)
+    image = Image(1)
+    first = cache.acquire(image)
+    second = cache.acquire_cached(0, 1)
+    assert (first.width, first.height) == (20, 10)
+    assert cache.get(second) is image
+    cache.release(first)
+    assert cache.get(second) is image
+    cache.release(second)
+    assert cache.get(first) is None
+    assert cache.acquire_cached(0, 1) is None
+
+
+def test_oldest_frame_is_evicted():
+    cache = FrameCache(2)
+    refs = [cache.acquire(Image(frame_id)) for frame_id in range(3)]
+    assert cache.get(refs[0]) is None
+    assert cache.get(refs[2]) is not None
+    assert cache.get_debug_info()['evicted'] == 1
+
+
+def test_stale_release_does_not_free_new_entry():
+    cache = FrameCache(1)
+    stale = cache.acquire(Image(1))
+    cache.acquire(Image(2))  # Вытесняет кадр 1, на который еще есть ссылка
+    cache.release(cache.acquire_cached(0, 2))
+    image = Image(1)
+    fresh = cache.acquire(image)
+    assert fresh.generation != stale.generation
+    assert cache.get(stale) is None
+
+    cache.release(stale)
+    assert cache.get(fresh) is image
+    assert cache.get_debug_info()['stale_releases'] == 1
+    cache.release(fresh)
+    assert cache.get_debug_info()['size'] == 0
+
+
+def test_history_frame():
+    cache = FrameCache(4)
+    obj = type('Obj', (), {})()
+    obj.last_image = Image(2)
+    element = type('Element', (), {'source_id': 0, 'frame_id': 2})()
+    assert cache.acquire_history_frame(obj, element).frame_id == 2
+    element.frame_id = 1
+    assert cache.acquire_history_frame(obj, element) is None
+    held = cache.acquire(Image(1))
+    assert cache.acquire_history_frame(obj, element).generation == held.generation